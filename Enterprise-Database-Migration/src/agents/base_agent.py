@@ -3,17 +3,70 @@ Base Agent - Foundation class for all migration agents.
 Provides LLM integration, tool binding, and common utilities.
 """
 
+import logging
 import os
+import re
+import sys
+import threading
 from typing import Any, Sequence
 
-from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
 from langchain_core.tools import BaseTool
 from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.utils.function_calling import convert_to_openai_tool
 from langchain_groq import ChatGroq
 
 from src.config import get_settings, LLMConfig
 from src.tools.token_tracker import get_token_tracker
 from src.tools.api_key_manager import get_api_key_manager
+from src.tools.llm_cache import LLMCache, get_llm_cache
+
+
+class _StdoutHandler(logging.StreamHandler):
+    """Stream handler that writes to the current sys.stdout.
+    
+    Looking the stream up on every emit keeps agent logs visible to
+    redirect_stdout (the Streamlit app collects agent output that way).
+    """
+    
+    @property
+    def stream(self):
+        return sys.stdout
+    
+    @stream.setter
+    def stream(self, value):
+        pass  # Always follow sys.stdout
+
+
+# Shared agent logger; handler and level are configured once at import time
+_logger = logging.getLogger("migration")
+if not _logger.handlers:
+    _handler = _StdoutHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    _logger.addHandler(_handler)
+    _logger.setLevel(get_settings().app.log_level.upper())
+    _logger.propagate = False
+
+_LOG_LEVELS = {
+    "debug": logging.DEBUG,
+    "info": logging.INFO,
+    "success": logging.INFO,
+    "warning": logging.WARNING,
+    "error": logging.ERROR,
+}
+
+_LOG_PREFIXES = {
+    "info": "ℹ️",
+    "success": "✅",
+    "warning": "⚠️",
+    "error": "❌",
+}
+
+# Guards every agent's LLM pool and current-LLM fields; agents call the LLM from worker threads
+_llm_lock = threading.Lock()
+
+# Error text that indicates a provider rate limit
+_RATE_LIMIT_RE = re.compile(r"rate[_\- ]?limit|429|too many requests|quota exceeded", re.IGNORECASE)
 
 
 def get_langsmith_callbacks() -> list[BaseCallbackHandler]:
@@ -44,23 +97,29 @@ class BaseAgent:
         use_complex_model: bool = False,
         tools: list[BaseTool] | None = None,
         system_prompt: str | None = None,
+        enable_cache: bool = True,
     ):
         self.name = name
         self.description = description
-        self.tools = tools or []
+        # Deterministic tool order keeps the bound request prefix stable
+        self.tools = sorted(tools or [], key=lambda t: t.name)
         self.system_prompt = system_prompt or self._default_system_prompt()
+        self._system_message: SystemMessage | None = None
         
         settings = get_settings()
         self.llm_config = settings.llm
         self.use_complex_model = use_complex_model
+        self.enable_cache = enable_cache and self.llm_config.cache_enabled
         
         self._llm: ChatGroq | None = None
         self._llm_with_tools: ChatGroq | None = None
+        # LLM instances (plain, tool-bound) per (api_key, model) so key rotation reuses them
+        self._llm_pool: dict[tuple[str, str], tuple[ChatGroq, ChatGroq]] = {}
     
     def _default_system_prompt(self) -> str:
         """Default system prompt for the agent."""
-        return f"""You are {self.name}, an AI agent specialized in database migration.
-Your role: {self.description}
+        # Static guidelines first, agent-specific details last (prefix-cache friendly)
+        return f"""You are an AI agent specialized in database migration.
 
 Guidelines:
 - Be precise and accurate in your analysis
@@ -68,8 +127,18 @@ Guidelines:
 - If you encounter an error, provide clear details for debugging
 - Use the provided tools to accomplish your tasks
 - Return structured data when possible
+
+Agent: {self.name}
+Your role: {self.description}
 """
     
+    @property
+    def system_message(self) -> SystemMessage:
+        """Get the system message, reusing the same object across calls."""
+        if self._system_message is None or self._system_message.content != self.system_prompt:
+            self._system_message = SystemMessage(content=self.system_prompt)
+        return self._system_message
+    
     @property
     def model_name(self) -> str:
         """Get the appropriate model name based on complexity."""
@@ -84,42 +153,105 @@ Guidelines:
             self._create_llm()
         return self._llm
     
-    def _create_llm(self):
-        """Create LLM instance with current API key from manager."""
-        key_manager = get_api_key_manager()
-        self._llm = ChatGroq(
-            api_key=key_manager.current_key,
-            model=self.model_name,
-            temperature=self.llm_config.temperature,
-            max_tokens=self.llm_config.max_tokens,
-        )
-        # Reset tools binding when LLM changes
-        self._llm_with_tools = None
+    def _create_llm(self) -> tuple[str, ChatGroq]:
+        """
+        Switch to the pooled LLM for the current API key, creating it if needed.
+        Returns (api_key, tool-bound LLM) as one consistent pair.
+        """
+        with _llm_lock:
+            api_key = get_api_key_manager().current_key
+            pool_key = (api_key, self.model_name)
+            
+            if pool_key not in self._llm_pool:
+                llm = ChatGroq(
+                    api_key=api_key,
+                    model=self.model_name,
+                    temperature=self.llm_config.temperature,
+                    max_tokens=self.llm_config.max_tokens,
+                )
+                llm_with_tools = llm.bind_tools(self.tools) if self.tools else llm
+                self._llm_pool[pool_key] = (llm, llm_with_tools)
+            
+            self._llm, self._llm_with_tools = self._llm_pool[pool_key]
+            return api_key, self._llm_with_tools
     
-    def _rotate_api_key_and_retry(self) -> bool:
-        """Rotate to next API key and recreate LLM. Returns True if successful."""
+    def _rotate_api_key_and_retry(self, failed_key: str | None = None) -> bool:
+        """Rotate away from the key that failed and recreate LLM. Returns True if successful."""
         key_manager = get_api_key_manager()
-        if key_manager.rotate_key("rate_limited"):
+        if key_manager.rotate_key("rate_limited", failed_key):
             self._create_llm()
             return True
         return False
     
     @property
     def llm_with_tools(self) -> ChatGroq:
-        """Get LLM with tools bound."""
+        """Get the pooled LLM with tools bound for the current API key."""
         if self._llm_with_tools is None:
-            if self.tools:
-                self._llm_with_tools = self.llm.bind_tools(self.tools)
-            else:
-                self._llm_with_tools = self.llm
+            self._create_llm()
         return self._llm_with_tools
     
-    def invoke(self, messages: list[BaseMessage]) -> BaseMessage:
-        """Invoke the LLM with messages and track token usage."""
-        full_messages = [SystemMessage(content=self.system_prompt)] + messages
-        response = self.llm_with_tools.invoke(full_messages)
+    def _cache_key(self, messages: list[BaseMessage]) -> str:
+        """Build the response cache key for a request."""
+        return LLMCache.make_key(
+            model=self.model_name,
+            temperature=self.llm_config.temperature,
+            max_tokens=self.llm_config.max_tokens,
+            system_prompt=self.system_prompt,
+            messages=[(m.type, m.content) for m in messages],
+            tool_schemas=[convert_to_openai_tool(t) for t in self.tools],
+        )
+    
+    @property
+    def cache_active(self) -> bool:
+        """Whether responses are cached: sampled (temperature > 0) answers are never replayed."""
+        return self.enable_cache and self.llm_config.temperature <= 0
+    
+    def _load_cached(
+        self, messages: list[BaseMessage], lookup: bool = True
+    ) -> tuple[str | None, BaseMessage | None]:
+        """Look up a cached response. Returns (cache_key, cached_message).
         
-        # Track token usage from response metadata
+        With lookup=False only the key is computed, so a fresh response replaces the cached one.
+        """
+        if not self.cache_active:
+            return None, None
+        cache_key = self._cache_key(messages)
+        if not lookup:
+            return cache_key, None
+        try:
+            cached = get_llm_cache().get(cache_key)
+            if cached is not None:
+                return cache_key, AIMessage(**cached)
+        except Exception as e:
+            # Don't fail on cache errors; treat as a miss
+            self.log(f"Response cache read failed: {e}", "warning")
+        return cache_key, None
+    
+    def _store_cached(self, cache_key: str | None, response: BaseMessage):
+        """Store a response in the cache."""
+        if cache_key is None:
+            return
+        try:
+            get_llm_cache().set(cache_key, {
+                "content": response.content,
+                "additional_kwargs": response.additional_kwargs,
+                "tool_calls": getattr(response, "tool_calls", []),
+            })
+        except Exception as e:
+            # Don't fail on cache errors
+            self.log(f"Response cache write failed: {e}", "warning")
+    
+    def discard_cached(self, messages: list[BaseMessage]):
+        """Drop the cached response to `messages`, e.g. when it failed validation."""
+        if not self.cache_active:
+            return
+        try:
+            get_llm_cache().delete(self._cache_key(messages))
+        except Exception as e:
+            self.log(f"Could not discard cached response: {e}", "warning")
+    
+    def _track_usage(self, response: BaseMessage):
+        """Track token usage from response metadata."""
         try:
             if hasattr(response, 'response_metadata'):
                 metadata = response.response_metadata
@@ -135,9 +267,29 @@ Guidelines:
                     )
         except Exception:
             pass  # Don't fail on tracking errors
+    
+    def invoke(
+        self, messages: list[BaseMessage], llm: ChatGroq | None = None, use_cache: bool = True
+    ) -> BaseMessage:
+        """Invoke the LLM (tool-bound unless `llm` is given) with messages and track token usage.
+        
+        With use_cache=False a cached response is not reused; the fresh one replaces it.
+        """
+        cache_key, cached = self._load_cached(messages, lookup=use_cache)
+        if cached is not None:
+            return cached
+        
+        full_messages = [self.system_message] + messages
+        response = (llm or self.llm_with_tools).invoke(full_messages)
         
+        self._store_cached(cache_key, response)
+        self._track_usage(response)
         return response
     
+    def _is_rate_limit_error(self, error: Exception) -> bool:
+        """Check if an exception is a rate limit error."""
+        return bool(_RATE_LIMIT_RE.search(str(error)))
+    
     def invoke_with_retry(
         self, 
         messages: list[BaseMessage], 
@@ -148,21 +300,17 @@ Guidelines:
         last_error = None
         
         for attempt in range(max_retries):
+            # Remember which key this attempt uses so a rate limit rotates away from it only
+            api_key, llm = self._create_llm()
             try:
-                return self.invoke(messages)
+                # Retries always go to the model so a bad cached answer isn't replayed
+                return self.invoke(messages, llm, use_cache=attempt == 0)
             except Exception as e:
                 last_error = e
-                error_str = str(e).lower()
-                
-                # Check if this is a rate limit error
-                is_rate_limit = any(x in error_str for x in [
-                    "rate_limit", "rate limit", "429", "too many requests",
-                    "quota exceeded", "rate-limit"
-                ])
                 
-                if is_rate_limit:
+                if self._is_rate_limit_error(e):
                     self.log(f"Rate limited on attempt {attempt + 1}, rotating API key...", "warning")
-                    if self._rotate_api_key_and_retry():
+                    if self._rotate_api_key_and_retry(api_key):
                         # Successfully rotated, retry without adding error context
                         continue
                     else:
@@ -196,15 +344,18 @@ Guidelines:
             return "\n".join(text_parts)
         return str(message.content)
     
-    def log(self, message: str, level: str = "info"):
-        """Log a message (placeholder for proper logging)."""
-        prefix = {
-            "info": "ℹ️",
-            "success": "✅",
-            "warning": "⚠️",
-            "error": "❌",
-        }.get(level, "•")
-        print(f"{prefix} [{self.name}] {message}")
+    def log(self, message: str, level: str = "info", *args):
+        """
+        Log a message through the shared migration logger.
+        Extra args are %-formatted into the message only if the level is enabled.
+        """
+        level_no = _LOG_LEVELS.get(level, logging.INFO)
+        if not _logger.isEnabledFor(level_no):
+            return
+        if args:
+            message = message % args
+        prefix = _LOG_PREFIXES.get(level, "•")
+        _logger.log(level_no, "%s [%s] %s", prefix, self.name, message)
 
 
 class AgentResponse:
@@ -3,12 +3,32 @@ Blueprint Agent - Generates per-table blueprint JSON files containing complete c
 Each blueprint includes table schema, indexes, FKs, related views, triggers, and procedures.
 """
 
-import json
+import shutil
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+import orjson
+
 from src.agents.base_agent import BaseAgent
-from src.state import MigrationState, MigrationPhase
+from src.state import MigrationPhase, MigrationState
 from src.tools.artifact_manager import get_artifact_manager
+from src.tools.table_references import TableReferenceFinder
+
+
+def _get(obj, key, default=None):
+    """Get a field from a dict or an attribute from an object."""
+    if type(obj) is dict:
+        return obj.get(key, default)
+    return getattr(obj, key, default)
+
+
+def _to_dict(obj) -> dict:
+    """Convert a schema object (dict, Pydantic model or plain object) to a dict."""
+    if isinstance(obj, dict):
+        return obj
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump()
+    return obj.__dict__
 
 
 class BlueprintAgent(BaseAgent):
@@ -49,34 +69,53 @@ class BlueprintAgent(BaseAgent):
         procs_by_table = self._map_procedures_to_tables(schema.procedures, schema.tables)
         
         # Load dependency graph
-        dep_graph = self._load_dependency_graph()
+        dep_graph = self._load_dependency_graph(state)
         
         # Detect circular dependencies from the graph
         circular_pairs = self._detect_circular_fks(schema.tables)
         if circular_pairs:
             self.log(f"⚠️ Detected circular FKs: {circular_pairs}", "warning")
         
+        # Normalize tables to plain dicts once so the hot path uses direct key access
+        norm_tables = [self._normalize_table(t) for t in schema.tables]
+        
+        # Reverse FK index: table -> tables that reference it
+        depended_by_map: dict[str, list[str]] = {}
+        for table in norm_tables:
+            for fk in table["foreign_keys"]:
+                referred = fk.get("referred_table")
+                if referred != table["name"]:
+                    depended_by_map.setdefault(referred, []).append(table["name"])
+        
         # Generate blueprint for each table
-        for table in schema.tables:
-            self.log(f"Creating blueprint: {table.name}")
-            
-            blueprint = self._create_table_blueprint(
-                table=table,
-                all_tables=schema.tables,
-                views=views_by_table.get(table.name, []),
-                triggers=triggers_by_table.get(table.name, []),
-                procedures=procs_by_table.get(table.name, []),
-                dep_graph=dep_graph,
-                circular_pairs=circular_pairs  # Pass circular info
-            )
-            
-            # Save blueprint to file
-            blueprint_path = self.blueprints_dir / f"{table.name}.blueprint.json"
-            with open(blueprint_path, 'w') as f:
-                json.dump(blueprint, f, indent=2, default=str)
-            
-            blueprints[table.name] = str(blueprint_path)
-            self.log(f"  ✓ Saved {blueprint_path.name}")
+        results = self._create_blueprints(
+            tables=norm_tables,
+            all_table_names=[t["name"] for t in norm_tables],
+            depended_by_map=depended_by_map,
+            views_by_table=views_by_table,
+            triggers_by_table=triggers_by_table,
+            procs_by_table=procs_by_table,
+            dep_graph=dep_graph,
+            circular_pairs=circular_pairs,  # Pass circular info
+        )
+        pending = []
+        for table_name, result in results:
+            if isinstance(result, Exception):
+                self.log(f"  ✗ Could not create blueprint for {table_name}: {result}", "error")
+                state.errors.append({
+                    "phase": MigrationPhase.DEPENDENCY_ANALYSIS,
+                    "object_name": table_name,
+                    "error_type": "blueprint_error",
+                    "error_message": str(result),
+                })
+                continue
+            pending.append(result)
+            blueprints[table_name] = str(result[0])
+        
+        # Write all blueprint files in parallel; log afterwards to avoid interleaving
+        self._write_blueprints(pending)
+        for path, _ in pending:
+            self.log(f"  ✓ Saved {path.name}")
         
         # Save blueprint index with circular dependency info
         index = {
@@ -86,8 +125,7 @@ class BlueprintAgent(BaseAgent):
             "circular_dependencies": list(circular_pairs)  # Store for sandbox
         }
         index_path = self.blueprints_dir / "_index.json"
-        with open(index_path, 'w') as f:
-            json.dump(index, f, indent=2)
+        index_path.write_bytes(orjson.dumps(index, option=orjson.OPT_INDENT_2))
         
         # Update state
         state.current_phase = MigrationPhase.DEPENDENCY_ANALYSIS
@@ -96,119 +134,138 @@ class BlueprintAgent(BaseAgent):
         self.log(f"Generated {len(blueprints)} blueprints", "success")
         return state
     
+    def _create_blueprints(
+        self,
+        tables,
+        depended_by_map: dict,
+        views_by_table: dict,
+        triggers_by_table: dict,
+        procs_by_table: dict,
+        all_table_names: list[str],
+        dep_graph: dict,
+        circular_pairs: set,
+    ) -> list[tuple[str, tuple[Path, bytes] | Exception]]:
+        """Create and serialize a blueprint for each table.
+        
+        A table whose blueprint can't be built gets its exception instead of (path, data).
+        """
+        results = []
+        for table in tables:
+            table_name = table["name"]
+            self.log(f"Creating blueprint: {table_name}", "debug")
+            try:
+                blueprint = self._create_table_blueprint(
+                    table=table,
+                    depended_by=depended_by_map.get(table_name, []),
+                    views=views_by_table.get(table_name, []),
+                    triggers=triggers_by_table.get(table_name, []),
+                    procedures=procs_by_table.get(table_name, []),
+                    all_table_names=all_table_names,
+                    dep_graph=dep_graph,
+                    circular_pairs=circular_pairs,
+                )
+                data = self._serialize_blueprint(blueprint)
+            except Exception as e:
+                results.append((table_name, e))
+                continue
+            
+            blueprint_path = self.blueprints_dir / f"{table_name}.blueprint.json"
+            results.append((table_name, (blueprint_path, data)))
+        return results
+    
+    def _serialize_blueprint(self, blueprint: dict) -> bytes:
+        """Serialize a blueprint to indented JSON bytes."""
+        return orjson.dumps(blueprint, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS, default=str)
+    
+    def _write_blueprints(self, items: list[tuple[Path, bytes]]):
+        """Write blueprint files concurrently."""
+        if not items:
+            return
+        with ThreadPoolExecutor(max_workers=min(32, len(items))) as executor:
+            list(executor.map(lambda item: item[0].write_bytes(item[1]), items))
+    
     def _detect_circular_fks(self, tables) -> set:
         """Detect circular foreign key relationships between tables."""
-        # Build a map of table -> tables it references via FK
-        fk_graph = {}
+        # Edge set of table -> table it references via FK (self-references excluded)
+        edges = set()
         for table in tables:
-            fk_graph[table.name] = set()
             for fk in table.foreign_keys:
-                referred = self._get_attr(fk, 'referred_table')
+                referred = _get(fk, 'referred_table')
                 if referred and referred != table.name:
-                    fk_graph[table.name].add(referred)
-        
-        # Find circular pairs (A->B and B->A)
-        circular_pairs = set()
-        for table_a, refs in fk_graph.items():
-            for table_b in refs:
-                if table_b in fk_graph and table_a in fk_graph.get(table_b, set()):
-                    # Found circular: A->B and B->A
-                    pair = tuple(sorted([table_a, table_b]))
-                    circular_pairs.add(pair)
+                    edges.add((table.name, referred))
         
-        return circular_pairs
+        # Circular pairs are edges present in both directions (A->B and B->A)
+        mutual = edges & {(b, a) for a, b in edges}
+        return {tuple(sorted(pair)) for pair in mutual}
     
-    def _get_attr(self, obj, key, default=None):
-        """Helper to get attribute from object or dict."""
-        if hasattr(obj, key):
-            return getattr(obj, key)
-        elif isinstance(obj, dict):
-            return obj.get(key, default)
-        return default
+    def _normalize_table(self, table) -> dict:
+        """Normalize a table and its columns, FKs and indexes to plain dicts."""
+        # One model_dump converts the nested models too; only plain objects need the per-item pass
+        data = dict(_to_dict(table))
+        for key in ("columns", "foreign_keys", "indexes", "constraints"):
+            data[key] = [_to_dict(item) for item in data.get(key) or []]
+        return data
     
-    def _create_table_blueprint(self, table, all_tables, views, triggers, procedures, dep_graph, circular_pairs=None) -> dict:
-        """Create a comprehensive blueprint for a single table."""
+    def _create_table_blueprint(
+        self, table, all_table_names, depended_by, views, triggers, procedures, dep_graph, circular_pairs=None
+    ) -> dict:
+        """Create a comprehensive blueprint for a single (normalized) table."""
         
-        circular_pairs = circular_pairs or set()
+        table_name = table["name"]
         
-        # Build table list for reference
-        all_table_names = [t.name for t in all_tables]
+        # Unordered pairs so circular lookups need no sorting
+        circular_set = {frozenset(pair) for pair in circular_pairs or ()}
         
-        # Helper to get attribute from object or dict
-        def get_attr(obj, key, default=None):
-            if hasattr(obj, key):
-                return getattr(obj, key)
-            elif isinstance(obj, dict):
-                return obj.get(key, default)
-            return default
-        
-        # Check if this table is part of a circular dependency
-        def is_circular_fk(table_name, ref_table):
-            pair = tuple(sorted([table_name, ref_table]))
-            return pair in circular_pairs
-        
-        # Find FK dependencies
+        # Build foreign keys list WITH circular flag, and FK dependencies, in one pass
         depends_on = []
-        for fk in table.foreign_keys:
-            referred = get_attr(fk, 'referred_table')
-            if referred and referred != table.name:
-                depends_on.append(referred)
-        
-        # Find tables that depend on this table
-        depended_by = []
-        for other_table in all_tables:
-            if other_table.name == table.name:
-                continue
-            for fk in other_table.foreign_keys:
-                if get_attr(fk, 'referred_table') == table.name:
-                    depended_by.append(other_table.name)
-        
-        # Build column list
-        columns = []
-        for col in table.columns:
-            columns.append({
-                "name": get_attr(col, 'name'),
-                "mysql_type": get_attr(col, 'type'),
-                "nullable": get_attr(col, 'nullable', True),
-                "default": get_attr(col, 'default'),
-                "autoincrement": get_attr(col, 'autoincrement', False)
-            })
-        
-        # Build indexes list
-        indexes = []
-        for idx in table.indexes:
-            indexes.append({
-                "name": get_attr(idx, 'name'),
-                "columns": get_attr(idx, 'columns', []),
-                "unique": get_attr(idx, 'unique', False)
-            })
-        
-        # Build foreign keys list WITH circular flag
         outgoing_fks = []
         deferred_fks = []
-        for fk in table.foreign_keys:
-            ref_table = get_attr(fk, 'referred_table')
+        for fk in table["foreign_keys"]:
+            ref_table = fk.get("referred_table")
             fk_data = {
-                "name": get_attr(fk, 'name'),
-                "columns": get_attr(fk, 'columns', []),
+                "name": fk.get("name"),
+                "columns": fk.get("columns", []),
                 "references_table": ref_table,
-                "references_columns": get_attr(fk, 'referred_columns', []),
-                "is_deferred": is_circular_fk(table.name, ref_table)  # Mark circular!
+                "references_columns": fk.get("referred_columns", []),
+                "is_deferred": frozenset((table_name, ref_table)) in circular_set  # Mark circular!
             }
             outgoing_fks.append(fk_data)
             
             # Also collect deferred FKs separately for easy access
             if fk_data["is_deferred"]:
                 deferred_fks.append(fk_data)
+            
+            if ref_table and ref_table != table_name:
+                depends_on.append(ref_table)
+        
+        # Build column list
+        columns = []
+        for col in table["columns"]:
+            columns.append({
+                "name": col.get("name"),
+                "mysql_type": col.get("type"),
+                "nullable": col.get("nullable", True),
+                "default": col.get("default"),
+                "autoincrement": col.get("autoincrement", False)
+            })
+        
+        # Build indexes list
+        indexes = []
+        for idx in table["indexes"]:
+            indexes.append({
+                "name": idx.get("name"),
+                "columns": idx.get("columns", []),
+                "unique": idx.get("unique", False)
+            })
         
         blueprint = {
-            "table_name": table.name,
+            "table_name": table_name,
             "all_tables_in_database": all_table_names,
             
             "schema": {
                 "columns": columns,
-                "primary_key": table.primary_key,
-                "row_count": table.row_count
+                "primary_key": table.get("primary_key", []),
+                "row_count": table.get("row_count")
             },
             
             "indexes": indexes,
@@ -222,11 +279,11 @@ class BlueprintAgent(BaseAgent):
                 "deferred": deferred_fks  # FKs that need ALTER TABLE (circular deps)
             },
             
-            "constraints": [c.model_dump() if hasattr(c, 'model_dump') else c for c in table.constraints],
+            "constraints": table.get("constraints", []),
             
             "dependencies": {
-                "depends_on": list(set(depends_on)),
-                "depended_by": list(set(depended_by)),
+                "depends_on": list(dict.fromkeys(depends_on)),
+                "depended_by": list(dict.fromkeys(depended_by)),
                 "has_circular_fk": len(deferred_fks) > 0  # Flag for easy checking
             },
             
@@ -259,8 +316,8 @@ class BlueprintAgent(BaseAgent):
             
             "conversion_hints": {
                 "use_singular_table_names": True,
-                "index_naming": f"idx_{table.name}_{{column_name}}",
-                "fk_naming": f"fk_{table.name}_{{referenced_table}}"
+                "index_naming": f"idx_{table_name}_{{column_name}}",
+                "fk_naming": f"fk_{table_name}_{{referenced_table}}"
             }
         }
         
@@ -268,18 +325,16 @@ class BlueprintAgent(BaseAgent):
     
     def _map_views_to_tables(self, views, tables) -> dict:
         """Map views to tables they reference."""
-        table_names = {t.name for t in tables}
-        views_by_table = {name: [] for name in table_names}
+        finder = TableReferenceFinder(t.name for t in tables)
+        views_by_table = {t.name: [] for t in tables}
         
         for view in views:
-            definition = view.definition.lower() if view.definition else ""
             # Check which tables are referenced in the view
-            for table_name in table_names:
-                if table_name.lower() in definition or f'"{table_name}"' in definition.lower():
-                    views_by_table[table_name].append({
-                        "name": view.name,
-                        "definition": view.definition
-                    })
+            for table_name in finder.find(view.definition):
+                views_by_table[table_name].append({
+                    "name": view.name,
+                    "definition": view.definition
+                })
         
         return views_by_table
     
@@ -302,28 +357,27 @@ class BlueprintAgent(BaseAgent):
     
     def _map_procedures_to_tables(self, procedures, tables) -> dict:
         """Map procedures to tables they likely use."""
-        table_names = {t.name for t in tables}
-        procs_by_table = {name: [] for name in table_names}
+        finder = TableReferenceFinder(t.name for t in tables)
+        procs_by_table = {t.name: [] for t in tables}
         
         for proc in procedures:
-            source = proc.source_code.lower() if proc.source_code else ""
-            for table_name in table_names:
-                if table_name.lower() in source:
-                    procs_by_table[table_name].append({
-                        "name": proc.name,
-                        "type": proc.type,
-                        "source": proc.source_code
-                    })
+            for table_name in finder.find(proc.source_code):
+                procs_by_table[table_name].append({
+                    "name": proc.name,
+                    "type": proc.type,
+                    "source": proc.source_code
+                })
         
         return procs_by_table
     
-    def _load_dependency_graph(self) -> dict:
-        """Load dependency graph from artifacts."""
+    def _load_dependency_graph(self, state: MigrationState) -> dict:
+        """Get the dependency graph from state, or from artifacts when state has none."""
+        if state.dependency_graph is not None:
+            return state.dependency_graph.model_dump(mode="json")
         try:
             dep_path = self.artifact_manager.artifacts_dir / "dependency_graph.json"
             if dep_path.exists():
-                with open(dep_path) as f:
-                    return json.load(f)
+                return orjson.loads(dep_path.read_bytes())
         except Exception as e:
             self.log(f"Could not load dependency graph: {e}", "warning")
         return {"nodes": [], "edges": [], "migration_order": []}
@@ -331,9 +385,11 @@ class BlueprintAgent(BaseAgent):
     def _clear_blueprints_dir(self):
         """Clear the blueprints directory."""
         try:
-            for item in self.blueprints_dir.iterdir():
-                if item.is_file():
-                    item.unlink()
+            try:
+                shutil.rmtree(self.blueprints_dir)
+            except FileNotFoundError:
+                pass
+            self.blueprints_dir.mkdir(parents=True, exist_ok=True)
             self.log("Cleared old blueprints directory")
         except Exception as e:
             self.log(f"Could not clear blueprints directory: {e}", "warning")
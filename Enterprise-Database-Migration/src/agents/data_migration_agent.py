@@ -1,133 +1,36 @@
 """
-<<<<<<< HEAD
-Data Migration Agent - Orchestrates data transfer from MySQL to PostgreSQL.
-Uses streaming batch approach with progress tracking and error handling.
-"""
-
-import json
-from pathlib import Path
-
-from src.agents.base_agent import BaseAgent
-from src.state import MigrationPhase
-from src.tools.data_migrator import DataMigrator, DataMigrationResult
-
-
-def data_migration_node(state: dict) -> dict:
-    """
-    LangGraph node for data migration.
-    Transfers data from MySQL to PostgreSQL after schema migration.
-    
-    Args:
-        state: Current migration state
-        
-    Returns:
-        Updated state with data migration results
-    """
-    print("\n" + "=" * 60)
-    print("📦 DATA MIGRATION AGENT")
-    print("=" * 60)
-    
-    # Check if schema migration was successful
-    sandbox_results = state.get("sandbox_results", [])
-    validation_passed = state.get("validation_passed", False)
-    
-    if not validation_passed:
-        print("⚠️ Skipping data migration - validation not passed")
-        return {
-            "current_phase": MigrationPhase.DATA_MIGRATION.value,
-            "data_migration_complete": False,
-            "data_migration_results": [],
-            "tables_migrated": [],
-        }
-    
-    # Get dependency graph for table ordering
-    dependency_graph = state.get("dependency_graph")
-    
-    # Initialize migrator
-    migrator = DataMigrator(batch_size=1000)
-    
-    try:
-        # Run full migration
-        result: DataMigrationResult = migrator.run_full_migration(
-            dependency_graph=dependency_graph,
-            continue_on_error=True
-        )
-        
-        # Convert results to serializable format
-        table_results = []
-        tables_migrated = []
-        
-        for tr in result.table_results:
-            table_results.append({
-                "table_name": tr.table_name,
-                "rows_migrated": tr.rows_migrated,
-                "duration_ms": tr.duration_ms,
-                "success": tr.success,
-                "errors": tr.errors
-            })
-            if tr.success:
-                tables_migrated.append(tr.table_name)
-        
-        # Create summary for state
-        summary = {
-            "total_rows": result.total_rows,
-            "tables_migrated_count": result.tables_migrated,
-            "tables_failed_count": result.tables_failed,
-            "total_duration_ms": result.total_duration_ms,
-            "success": result.success,
-            "errors": result.errors
-        }
-        
-        # Save results to artifact file for UI
-        artifacts_dir = Path("./artifacts")
-        artifacts_dir.mkdir(exist_ok=True)
-        try:
-            with open(artifacts_dir / "data_migration_results.json", "w") as f:
-                json.dump({
-                    "summary": summary,
-                    "table_results": table_results
-                }, f, indent=2)
-            print(f"💾 Saved data migration results to artifacts/data_migration_results.json")
-        except Exception as save_err:
-            print(f"⚠️ Could not save data migration results: {save_err}")
-        
-        print(f"\n✅ Data migration {'completed successfully' if result.success else 'completed with errors'}")
-        
-        return {
-            "current_phase": MigrationPhase.DATA_MIGRATION.value,
-            "data_migration_complete": result.success,
-            "data_migration_results": table_results,
-            "data_migration_summary": summary,
-            "tables_migrated": tables_migrated,
-        }
-        
-    except Exception as e:
-        print(f"❌ Data migration failed: {e}")
-        return {
-            "current_phase": MigrationPhase.DATA_MIGRATION.value,
-            "data_migration_complete": False,
-            "data_migration_results": [],
-            "tables_migrated": [],
-            "errors": [{"phase": "data_migration", "error": str(e)}]
-        }
-    finally:
-        migrator.close()
-=======
 Data Migration Agent - Streams data from MySQL to PostgreSQL using batch processing.
 Uses the sandbox database by default for safe testing before production deployment.
 """
 
+import io
+import queue
 import struct
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
 
-from sqlalchemy import create_engine, text
-from sqlalchemy.engine import Engine
+from psycopg2.extras import execute_values
+from sqlalchemy import bindparam, create_engine, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import DBAPIError
+
+try:
+    import numpy as np
+except ImportError:  # Optional: POINT columns fall back to per-row decoding
+    np = None
 
 from src.agents.base_agent import BaseAgent
-from src.state import MigrationState, MigrationPhase, MigrationStatus
-from src.tools.artifact_manager import get_artifact_manager
 from src.config import get_settings
+from src.state import MigrationPhase, MigrationState
+from src.tools.artifact_manager import get_artifact_manager
+
+# Reads the X and Y doubles of a POINT from a buffer at a given offset
+_unpack_point_xy = struct.Struct("<dd").unpack_from
+
+# PostgreSQL POINT text; %-formatting with repr is cheaper per row than an f-string
+_POINT_TEXT = "(%r, %r)"
 
 
 def convert_wkb_to_point(wkb_bytes) -> str | None:
@@ -139,23 +42,40 @@ def convert_wkb_to_point(wkb_bytes) -> str | None:
         return None
     
     try:
-        # Handle bytes or memoryview
-        if isinstance(wkb_bytes, memoryview):
-            wkb_bytes = bytes(wkb_bytes)
-        
-        if len(wkb_bytes) < 21:  # Minimum size for POINT with SRID
+        # len() and unpack_from work on bytes, bytearray and memoryview without copying
+        if len(wkb_bytes) < 25:  # SRID + WKB header + two doubles
             return None
         
         # Skip SRID (4 bytes) + byte order (1 byte) + type (4 bytes) = 9 bytes
-        # Then read X and Y as doubles (8 bytes each)
-        x = struct.unpack('<d', wkb_bytes[9:17])[0]
-        y = struct.unpack('<d', wkb_bytes[17:25])[0]
-        
-        # PostgreSQL POINT format: (x, y)
-        return f"({x}, {y})"
-    except Exception as e:
+        # Then read X and Y as doubles (8 bytes each) in one call, without slicing
+        x, y = _unpack_point_xy(wkb_bytes, 9)
+    except (struct.error, TypeError):
         # If parsing fails, return NULL - this is safer than failing
         return None
+    
+    # PostgreSQL POINT format: (x, y)
+    return _POINT_TEXT % (x, y)
+
+
+def convert_wkb_points(values: list) -> list[str | None]:
+    """
+    Convert a column of MySQL POINT values in one vectorized pass.
+    The 16 X/Y bytes of every value are gathered into one buffer and decoded with
+    a single NumPy read; NULL or truncated values map to None.
+    """
+    if np is None:
+        return [convert_wkb_to_point(v) for v in values]
+    
+    valid = [i for i, v in enumerate(values) if v is not None and len(v) >= 25]
+    points: list[str | None] = [None] * len(values)
+    if not valid:
+        return points
+    
+    xy_bytes = b"".join([values[i][9:25] for i in valid])
+    xy = np.frombuffer(xy_bytes, dtype="<f8").reshape(-1, 2).tolist()
+    for i, (x, y) in zip(valid, xy):
+        points[i] = _POINT_TEXT % (x, y)
+    return points
 
 
 # Type converters for MySQL → PostgreSQL
@@ -164,11 +84,12 @@ TYPE_CONVERTERS = {
     "tinyint(1)": lambda v: bool(v) if v is not None else None,
     "bit(1)": lambda v: bool(v) if v is not None else None,
     
-    # Binary data (MySQL BLOB → PostgreSQL BYTEA)
-    "blob": lambda v: bytes(v) if v is not None else None,
-    "tinyblob": lambda v: bytes(v) if v is not None else None,
-    "mediumblob": lambda v: bytes(v) if v is not None else None,
-    "longblob": lambda v: bytes(v) if v is not None else None,
+    # Binary data (MySQL BLOB → PostgreSQL BYTEA): passed through without a copy;
+    # pymysql returns bytes, and both COPY and psycopg2 accept any bytes-like value
+    "blob": None,
+    "tinyblob": None,
+    "mediumblob": None,
+    "longblob": None,
     
     # SET type (MySQL SET → PostgreSQL TEXT[])
     "set": lambda v: v.split(",") if v else [],
@@ -181,47 +102,119 @@ TYPE_CONVERTERS = {
     # Default: pass through (Python handles most conversions)
 }
 
-# Columns that require special handling (table.column -> converter)
-SPECIAL_COLUMN_HANDLERS = {
-    "address.location": convert_wkb_to_point,
-    "staff.picture": lambda v: bytes(v) if v is not None else None,  # BLOB
-}
+# Queue sentinel marking the end of a table's source stream
+_END_OF_STREAM = object()
 
->>>>>>> 5b7a1235ba7ce790739964ce89fbce20f3df9c2b
+# Bounds for adaptive rows-per-batch sizing
+MIN_BATCH_SIZE = 50
+MAX_BATCH_SIZE = 50_000
 
+# Tables counted per UNION ALL query when validating row counts
+ROW_COUNT_CHUNK_SIZE = 50
 
-class DataMigrationAgent(BaseAgent):
+# Serial columns of the migrated tables, with their owned sequences
+_SERIAL_COLUMNS_SQL = """
+    SELECT table_name, column_name,
+           pg_get_serial_sequence(quote_ident(table_name), column_name) AS seq_name
+    FROM information_schema.columns
+    WHERE table_name = ANY(:tables)
+    AND column_default LIKE 'nextval%'
+"""
+
+# Prefix of the warning RESET_SEQUENCES_SQL raises for a sequence it could not reset
+SEQUENCE_RESET_FAILED = "Could not reset sequence"
+
+# Reset every serial sequence to its column's max value in a single DO block.
+# Each setval has its own exception block, so one bad table only raises a warning.
+RESET_SEQUENCES_SQL = f"""
+DO $$
+DECLARE r record;
+BEGIN
+    FOR r IN {_SERIAL_COLUMNS_SQL}
+    LOOP
+        IF r.seq_name IS NOT NULL THEN
+            BEGIN
+                EXECUTE format(
+                    'SELECT setval(%L, COALESCE((SELECT MAX(%I) FROM %I), 1))',
+                    r.seq_name, r.column_name, r.table_name
+                );
+            EXCEPTION WHEN others THEN
+                RAISE WARNING '{SEQUENCE_RESET_FAILED} % (%.%): %',
+                    r.seq_name, r.table_name, r.column_name, SQLERRM;
+            END;
+        END IF;
+    END LOOP;
+END $$;
+"""
+
+COUNT_SEQUENCES_SQL = f"SELECT COUNT(seq_name) FROM ({_SERIAL_COLUMNS_SQL}) AS serial_columns"
+
+# Characters that must be backslash-escaped in PostgreSQL COPY text format
+_COPY_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+
+def to_copy_field(value: Any) -> str:
+    """Encode a converted value as a field in PostgreSQL COPY text format."""
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        # bytea hex input (\x...), with the backslash escaped for COPY
+        return "\\\\x" + value.hex()
+    if isinstance(value, list):
+        # SET values become a TEXT[] literal
+        value = "{" + ",".join(
+            '"' + str(v).replace("\\", "\\\\").replace('"', '\\"') + '"' for v in value
+        ) + "}"
+    return str(value).translate(_COPY_ESCAPES)
+
+
+class CopyRowStream(io.TextIOBase):
     """
-<<<<<<< HEAD
-    Agent for orchestrating data migration from MySQL to PostgreSQL.
-    
-    This agent:
-    1. Uses the DataMigrator tool for streaming batch transfer
-    2. Tracks progress per table
-    3. Handles errors gracefully
-    4. Reports statistics
+    Readable text stream that encodes rows in COPY text format on demand.
+    copy_expert() pulls fixed-size chunks, so only one chunk of encoded text is
+    held in memory instead of a second full copy of the batch.
     """
     
-    def __init__(self):
-        super().__init__(
-            name="DataMigrationAgent",
-            description="Transfers data from MySQL to PostgreSQL using streaming batches",
-            use_complex_model=False,  # Doesn't need LLM for data transfer
-        )
-        self.migrator = DataMigrator()
+    def __init__(self, rows):
+        self._lines = ("\t".join([to_copy_field(v) for v in row]) + "\n" for row in rows)
+        self._pending = ""
+        self._pos = 0
     
-    def run(self, state: dict) -> dict:
-        """
-        Execute data migration.
+    def readable(self) -> bool:
+        return True
+    
+    def read(self, size: int | None = -1) -> str:
+        if size is None or size < 0:
+            data = self._pending[self._pos:] + "".join(self._lines)
+            self._pending, self._pos = "", 0
+            return data
         
-        Args:
-            state: Current migration state
-            
-        Returns:
-            Updated state with migration results
-        """
-        return data_migration_node(state)
-=======
+        # Refill only when the unread text is shorter than the request
+        if len(self._pending) - self._pos < size:
+            parts = [self._pending[self._pos:]]
+            length = len(parts[0])
+            for line in self._lines:
+                parts.append(line)
+                length += len(line)
+                if length >= size:
+                    break
+            self._pending, self._pos = "".join(parts), 0
+        
+        data = self._pending[self._pos:self._pos + size]
+        self._pos += len(data)
+        return data
+
+
+# Columns that require special handling ((table, column) -> converter)
+SPECIAL_COLUMN_HANDLERS = {
+    ("address", "location"): convert_wkb_to_point,
+}
+
+
+class DataMigrationAgent(BaseAgent):
+    """
     Agent responsible for migrating data from MySQL to PostgreSQL.
     Uses streaming batch approach to be memory-efficient.
     
@@ -256,25 +249,45 @@ class DataMigrationAgent(BaseAgent):
             self.target_name = "target"
         
         # Configuration
-        self.batch_size = 1000
+        self.batch_size = 1000  # Default rows per batch when the row width is unknown
+        self.batch_target_bytes = 8 * 1024 * 1024  # Per-batch memory budget
+        self.use_copy = True  # COPY FROM STDIN; False falls back to INSERT
+        self.pipeline_depth = 4  # Source batches buffered ahead of the target load
+        self.max_workers = 8  # Tables migrated concurrently within a dependency layer
         
         # Column type cache (table -> column -> type)
         self._column_types: dict[str, dict[str, str]] = {}
+        
+        # Per-table converter lists aligned with column order (None = pass-through)
+        self._converters: dict[str, list] = {}
+        
+        # Per-table rows per batch, sized from the average row width
+        self._batch_sizes: dict[str, int] = {}
     
     @property
     def source_engine(self) -> Engine:
         """Get or create source MySQL engine."""
         if self._source_engine is None:
-            self._source_engine = create_engine(self.source_conn_str)
+            self._source_engine = self._create_engine(self.source_conn_str)
         return self._source_engine
     
     @property
     def target_engine(self) -> Engine:
         """Get or create target PostgreSQL engine."""
         if self._target_engine is None:
-            self._target_engine = create_engine(self.target_conn_str)
+            self._target_engine = self._create_engine(self.target_conn_str)
         return self._target_engine
     
+    def _create_engine(self, conn_str: str) -> Engine:
+        """Create an engine with a pool sized for max_workers concurrent tables."""
+        return create_engine(
+            conn_str,
+            pool_size=self.max_workers,
+            max_overflow=self.max_workers,
+            pool_pre_ping=True,  # Drop connections that went stale during long tables
+            pool_recycle=3600,
+        )
+    
     def run(self, state: MigrationState) -> MigrationState:
         """Execute data migration from MySQL to PostgreSQL."""
         self.log(f"Starting data migration to {self.target_name}...")
@@ -291,19 +304,31 @@ class DataMigrationAgent(BaseAgent):
             self.log("Disabling FK constraints...")
             self._disable_fk_constraints()
             
-            # Phase 2: Migrate data table by table
+            # Phase 2: Migrate data layer by layer; tables within a layer run in parallel
             migration_results = []
             total_rows = 0
             
-            for table_name in table_order:
-                result = self._migrate_table(table_name)
-                migration_results.append(result)
-                total_rows += result.get("rows_migrated", 0)
+            source_columns = self._get_source_columns(state, table_order)
+            self._batch_sizes = self._get_batch_sizes(table_order)
+            layers = self._compute_layers(table_order, self._get_table_edges(state))
+            self.log(f"Grouped tables into {len(layers)} dependency layers")
+            
+            for layer in layers:
+                layer_columns = [source_columns.get(name, []) for name in layer]
+                with ThreadPoolExecutor(max_workers=min(self.max_workers, len(layer))) as executor:
+                    layer_results = list(executor.map(self._migrate_table, layer, layer_columns))
                 
-                if result["success"]:
-                    self.log(f"  ✓ {table_name}: {result['rows_migrated']:,} rows ({result['time_ms']:.1f}ms)")
-                else:
-                    self.log(f"  ✗ {table_name}: {result['error']}", "warning")
+                for table_name, result in zip(layer, layer_results):
+                    migration_results.append(result)
+                    total_rows += result.get("rows_migrated", 0)
+                    
+                    if result["success"]:
+                        self.log(
+                            "  ✓ %s: %s rows (%.1fms)", "info",
+                            table_name, format(result["rows_migrated"], ","), result["time_ms"],
+                        )
+                    else:
+                        self.log("  ✗ %s: %s", "warning", table_name, result["error"])
             
             # Phase 3: Re-enable FK constraints
             self.log("Re-enabling FK constraints...")
@@ -374,6 +399,54 @@ class DataMigrationAgent(BaseAgent):
         
         return []
     
+    def _get_table_edges(self, state: MigrationState) -> list[tuple[str, str]]:
+        """Get (table, referenced_table) FK pairs from the dependency graph or schema."""
+        if state.dependency_graph and state.dependency_graph.edges:
+            return [
+                (edge.from_id.replace("table:", ""), edge.to_id.replace("table:", ""))
+                for edge in state.dependency_graph.edges
+                if edge.from_id.startswith("table:") and edge.to_id.startswith("table:")
+            ]
+        
+        if state.schema_metadata:
+            return [
+                (table.name, fk.get("referred_table"))
+                for table in state.schema_metadata.tables
+                for fk in table.foreign_keys
+            ]
+        
+        return []
+    
+    def _compute_layers(self, table_order: list[str], edges: list[tuple[str, str]]) -> list[list[str]]:
+        """
+        Group tables into layers using Kahn's algorithm.
+        A table only depends on tables in earlier layers, so each layer can be
+        migrated concurrently. Tables in FK cycles go last, one per layer.
+        """
+        position = {name: i for i, name in enumerate(table_order)}
+        referenced_by: dict[str, list[str]] = {name: [] for name in table_order}
+        in_degree = dict.fromkeys(table_order, 0)
+        
+        for table, referenced in set(edges):
+            if table != referenced and table in position and referenced in position:
+                referenced_by[referenced].append(table)
+                in_degree[table] += 1
+        
+        layers = []
+        layer = [name for name in table_order if in_degree[name] == 0]
+        while layer:
+            layers.append(layer)
+            next_layer = []
+            for name in layer:
+                for dependent in referenced_by[name]:
+                    in_degree[dependent] -= 1
+                    if in_degree[dependent] == 0:
+                        next_layer.append(dependent)
+            layer = sorted(next_layer, key=position.__getitem__)
+        
+        layers.extend([name] for name in table_order if in_degree[name] > 0)
+        return layers
+    
     def _cache_column_types(self, state: MigrationState):
         """Cache column types for type conversion during migration."""
         if state.schema_metadata:
@@ -384,6 +457,55 @@ class DataMigrationAgent(BaseAgent):
                     col_type = col.get("type", "").lower()
                     self._column_types[table.name][col_name] = col_type
     
+    def _get_source_columns(self, state: MigrationState, table_order: list[str]) -> dict[str, list[str]]:
+        """Get ordered column names per table, querying MySQL once for any not in schema metadata."""
+        source_columns: dict[str, list[str]] = {}
+        if state.schema_metadata:
+            for table in state.schema_metadata.tables:
+                names = [col.get("name") for col in table.columns]
+                if names:
+                    source_columns[table.name] = names
+        
+        missing = [name for name in table_order if name not in source_columns]
+        if missing:
+            col_query = text("""
+                SELECT TABLE_NAME, COLUMN_NAME
+                FROM information_schema.COLUMNS
+                WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME IN :tables
+                ORDER BY TABLE_NAME, ORDINAL_POSITION
+            """).bindparams(bindparam("tables", expanding=True))
+            with self.source_engine.connect() as src_conn:
+                for table_name, column_name in src_conn.execute(col_query, {"tables": missing}):
+                    source_columns.setdefault(table_name, []).append(column_name)
+        
+        return source_columns
+    
+    def _get_batch_sizes(self, table_order: list[str]) -> dict[str, int]:
+        """Size batches per table from MySQL's AVG_ROW_LENGTH so each holds ~batch_target_bytes."""
+        batch_sizes: dict[str, int] = {}
+        if not table_order:
+            return batch_sizes
+        
+        size_query = text("""
+            SELECT TABLE_NAME, AVG_ROW_LENGTH
+            FROM information_schema.TABLES
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME IN :tables
+        """).bindparams(bindparam("tables", expanding=True))
+        try:
+            with self.source_engine.connect() as src_conn:
+                for table_name, avg_row_length in src_conn.execute(size_query, {"tables": table_order}):
+                    if avg_row_length:
+                        batch_size = self.batch_target_bytes // avg_row_length
+                        batch_sizes[table_name] = max(MIN_BATCH_SIZE, min(MAX_BATCH_SIZE, batch_size))
+                        self.log(
+                            "  %s: %s rows/batch (avg row %d bytes)", "debug",
+                            table_name, format(batch_sizes[table_name], ","), avg_row_length,
+                        )
+        except Exception as e:
+            self.log(f"Could not compute batch sizes, using {self.batch_size}: {e}", "warning")
+        
+        return batch_sizes
+    
     def _disable_fk_constraints(self):
         """Disable foreign key constraint checking in PostgreSQL."""
         with self.target_engine.connect() as conn:
@@ -396,7 +518,7 @@ class DataMigrationAgent(BaseAgent):
             conn.execute(text("SET session_replication_role = 'origin'"))
             conn.commit()
     
-    def _migrate_table(self, table_name: str) -> dict:
+    def _migrate_table(self, table_name: str, columns: list[str]) -> dict:
         """Migrate a single table using batch streaming."""
         result = {
             "table": table_name,
@@ -409,51 +531,47 @@ class DataMigrationAgent(BaseAgent):
         start_time = time.time()
         
         try:
-            # Get column names from source
-            with self.source_engine.connect() as src_conn:
-                col_query = text(f"""
-                    SELECT COLUMN_NAME 
-                    FROM information_schema.COLUMNS 
-                    WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table
-                    ORDER BY ORDINAL_POSITION
-                """)
-                col_result = src_conn.execute(col_query, {"table": table_name})
-                columns = [row[0] for row in col_result]
-            
             if not columns:
                 result["error"] = "No columns found"
                 return result
             
-            # Clear existing data in target
-            # IMPORTANT: Use DELETE instead of TRUNCATE CASCADE to avoid
-            # cascading deletes that wipe out previously migrated tables.
-            # With session_replication_role='replica', FK constraints are disabled,
-            # so DELETE won't fail on FK violations.
-            with self.target_engine.connect() as tgt_conn:
-                tgt_conn.execute(text(f'DELETE FROM "{table_name}"'))
-                tgt_conn.commit()
+            # Resolve value converters once per table instead of per cell
+            self._converters[table_name] = self._build_converters(table_name, columns)
             
             # Stream data in batches
-            offset = 0
             total_rows = 0
             
             # Build column list for SELECT (MySQL uses backticks)
             mysql_cols = ", ".join([f"`{c}`" for c in columns])
             
-            while True:
-                # Fetch batch from MySQL
-                with self.source_engine.connect() as src_conn:
-                    query = text(f"SELECT {mysql_cols} FROM `{table_name}` LIMIT :limit OFFSET :offset")
-                    rows = src_conn.execute(query, {"limit": self.batch_size, "offset": offset}).fetchall()
-                
-                if not rows:
-                    break
+            query = text(f"SELECT {mysql_cols} FROM `{table_name}`")
+            
+            # One target connection and transaction per table: no per-batch connect
+            # or commit, and a failure rolls back the whole table instead of
+            # leaving it partially loaded
+            with self.target_engine.begin() as tgt_conn:
+                # session_replication_role is per session, so set it on this connection
+                tgt_conn.execute(text("SET LOCAL session_replication_role = 'replica'"))
+                # Don't wait for the WAL flush on commit; a failed run is simply re-run
+                tgt_conn.execute(text("SET LOCAL synchronous_commit = off"))
                 
-                # Transform and insert into PostgreSQL
-                self._insert_batch(table_name, columns, rows)
+                # Clear existing data in target
+                self._clear_target_table(table_name, tgt_conn)
                 
-                total_rows += len(rows)
-                offset += self.batch_size
+                # Pipeline: a producer thread reads MySQL while this thread loads PostgreSQL
+                batches: queue.Queue = queue.Queue(maxsize=self.pipeline_depth)
+                stop = threading.Event()
+                with ThreadPoolExecutor(max_workers=1) as executor:
+                    batch_size = self._batch_sizes.get(table_name, self.batch_size)
+                    producer = executor.submit(self._produce_batches, query, batch_size, batches, stop)
+                    try:
+                        while (rows := batches.get()) is not _END_OF_STREAM:
+                            # Transform and insert into PostgreSQL
+                            self._insert_batch(table_name, columns, rows, tgt_conn)
+                            total_rows += len(rows)
+                    finally:
+                        stop.set()
+                    producer.result()  # Re-raise source read errors
             
             result["success"] = True
             result["rows_migrated"] = total_rows
@@ -464,108 +582,196 @@ class DataMigrationAgent(BaseAgent):
         result["time_ms"] = (time.time() - start_time) * 1000
         return result
     
-    def _insert_batch(self, table_name: str, columns: list[str], rows: list):
+    def _clear_target_table(self, table_name: str, tgt_conn: Connection):
+        """Empty a target table before loading it."""
+        # IMPORTANT: Never use TRUNCATE CASCADE - it would wipe out previously
+        # migrated tables. Plain TRUNCATE skips the per-row WAL writes of DELETE,
+        # but PostgreSQL refuses it for tables referenced by an FK (and it may be
+        # blocked by permissions), so fall back to DELETE in that case.
+        # With session_replication_role='replica', FK constraints are disabled,
+        # so DELETE won't fail on FK violations.
+        try:
+            # Savepoint so a rejected TRUNCATE doesn't abort the table's transaction
+            with tgt_conn.begin_nested():
+                tgt_conn.execute(text(f'TRUNCATE TABLE "{table_name}" RESTART IDENTITY'))
+        except DBAPIError:
+            tgt_conn.execute(text(f'DELETE FROM "{table_name}"'))
+    
+    def _produce_batches(self, query, batch_size: int, batches: queue.Queue, stop: threading.Event):
+        """Stream source rows into the queue, ending with _END_OF_STREAM."""
+        try:
+            # Single pass over a server-side cursor (pymysql SSCursor) instead of
+            # LIMIT/OFFSET pages, which rescan the skipped rows on every batch
+            with self.source_engine.connect() as src_conn:
+                stream = src_conn.execution_options(stream_results=True).execute(query)
+                for rows in stream.partitions(batch_size):
+                    if not self._put_batch(batches, rows, stop):
+                        return
+        finally:
+            self._put_batch(batches, _END_OF_STREAM, stop)
+    
+    @staticmethod
+    def _put_batch(batches: queue.Queue, item, stop: threading.Event) -> bool:
+        """Put an item on the queue, giving up once the consumer has stopped."""
+        while not stop.is_set():
+            try:
+                batches.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    def _insert_batch(self, table_name: str, columns: list[str], rows: list, tgt_conn: Connection):
         """Insert a batch of rows into PostgreSQL."""
         if not rows:
             return
         
-        # Build INSERT statement
+        converters = self._converters.get(table_name)
+        if converters is None:
+            converters = self._build_converters(table_name, columns)
+        
+        if any(converters):
+            transformed_rows = self._transform_rows(converters, rows)
+        else:
+            # Fast path: no column needs conversion, so source rows load as-is
+            transformed_rows = rows
+        
+        if self.use_copy:
+            self._copy_rows(table_name, columns, transformed_rows, tgt_conn)
+        else:
+            self._insert_rows(table_name, columns, transformed_rows, tgt_conn)
+    
+    def _transform_rows(self, converters: list, rows: list) -> list[list]:
+        """Apply per-column converters to a batch of rows."""
+        # POINT columns are decoded column-wise below, so skip them per row
+        point_indexes = [i for i, conv in enumerate(converters) if conv is convert_wkb_to_point]
+        row_converters = [None if conv is convert_wkb_to_point else conv for conv in converters]
+        
+        transformed_rows = [
+            [conv(value) if conv else value for conv, value in zip(row_converters, row)]
+            for row in rows
+        ]
+        
+        # Decode POINT columns for the whole batch at once
+        for i in point_indexes:
+            for values, point in zip(transformed_rows, convert_wkb_points([row[i] for row in rows])):
+                values[i] = point
+        
+        return transformed_rows
+    
+    def _build_converters(self, table_name: str, columns: list[str]) -> list:
+        """Build the per-column converter list for a table (None means pass-through)."""
+        column_types = self._column_types.get(table_name, {})
+        converters = []
+        for col in columns:
+            # 1. Check for special column handler (table, column)
+            converter = SPECIAL_COLUMN_HANDLERS.get((table_name, col))
+            if converter is None:
+                # 2. Check for type-based conversion
+                converter = TYPE_CONVERTERS.get(column_types.get(col, ""))
+            converters.append(converter)
+        return converters
+    
+    def _copy_rows(self, table_name: str, columns: list[str], rows: list, tgt_conn: Connection):
+        """Bulk load rows with COPY FROM STDIN, bypassing per-row INSERT parsing."""
         pg_cols = ", ".join([f'"{c}"' for c in columns])
-        placeholders = ", ".join([f":{c}" for c in columns])
-        insert_sql = f'INSERT INTO "{table_name}" ({pg_cols}) VALUES ({placeholders})'
-        
-        # Transform rows
-        transformed_rows = []
-        for row in rows:
-            row_dict = {}
-            for i, col in enumerate(columns):
-                value = row[i]
-                
-                # 1. Check for special column handler (table.column)
-                special_key = f"{table_name}.{col}"
-                if special_key in SPECIAL_COLUMN_HANDLERS:
-                    value = SPECIAL_COLUMN_HANDLERS[special_key](value)
-                else:
-                    # 2. Check for type-based conversion
-                    col_type = self._column_types.get(table_name, {}).get(col, "")
-                    if col_type in TYPE_CONVERTERS:
-                        value = TYPE_CONVERTERS[col_type](value)
-                
-                row_dict[col] = value
-            transformed_rows.append(row_dict)
+        copy_sql = f'COPY "{table_name}" ({pg_cols}) FROM STDIN'
         
-        # Bulk insert
-        with self.target_engine.connect() as conn:
-            conn.execute(text(insert_sql), transformed_rows)
-            conn.commit()
+        # COPY runs on the DBAPI cursor of the table's connection, inside its transaction
+        with tgt_conn.connection.cursor() as cursor:
+            cursor.copy_expert(copy_sql, CopyRowStream(rows))
+    
+    def _insert_rows(self, table_name: str, columns: list[str], rows: list, tgt_conn: Connection):
+        """Insert rows with multi-row INSERT ... VALUES statements."""
+        pg_cols = ", ".join([f'"{c}"' for c in columns])
+        insert_sql = f'INSERT INTO "{table_name}" ({pg_cols}) VALUES %s'
+        
+        # Positional rows go straight to psycopg2; no per-row parameter dicts
+        with tgt_conn.connection.cursor() as cursor:
+            execute_values(cursor, insert_sql, rows, page_size=len(rows))
     
     def _reset_sequences(self, table_order: list[str]) -> int:
         """Reset PostgreSQL sequences to match max values."""
         sequences_reset = 0
         
-        with self.target_engine.connect() as conn:
-            for table_name in table_order:
-                try:
-                    # Find sequences for this table
-                    seq_query = text("""
-                        SELECT column_name, pg_get_serial_sequence(:table, column_name) as seq_name
-                        FROM information_schema.columns
-                        WHERE table_name = :table
-                        AND column_default LIKE 'nextval%'
-                    """)
-                    seq_result = conn.execute(seq_query, {"table": table_name})
-                    
-                    for row in seq_result:
-                        col_name = row[0]
-                        seq_name = row[1]
-                        
-                        if seq_name:
-                            # Reset sequence to max value
-                            reset_query = text(f"""
-                                SELECT setval('{seq_name}', COALESCE((SELECT MAX("{col_name}") FROM "{table_name}"), 1))
-                            """)
-                            conn.execute(reset_query)
-                            sequences_reset += 1
-                    
-                except Exception as e:
-                    self.log(f"  Warning: Could not reset sequence for {table_name}: {e}", "warning")
-            
-            conn.commit()
+        try:
+            with self.target_engine.connect() as conn:
+                # The whole per-sequence loop runs server-side in one round trip;
+                # sequences that failed come back as warnings in the connection's notices
+                notices = getattr(conn.connection.dbapi_connection, "notices", [])
+                seen = len(notices)
+                conn.execute(text(RESET_SEQUENCES_SQL), {"tables": list(table_order)})
+                failed = [n.strip() for n in notices[seen:] if SEQUENCE_RESET_FAILED in n]
+                for notice in failed:
+                    self.log(f"  {notice}", "warning")
+                
+                total = conn.execute(text(COUNT_SEQUENCES_SQL), {"tables": list(table_order)}).scalar() or 0
+                sequences_reset = total - len(failed)
+                conn.commit()
+        except Exception as e:
+            self.log(f"  Warning: Could not reset sequences: {e}", "warning")
         
         return sequences_reset
     
     def _validate_row_counts(self, table_order: list[str]) -> list[dict]:
         """Validate row counts match between source and target."""
-        results = []
+        # Count both databases concurrently
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            source_future = executor.submit(self._count_rows, self.source_engine, table_order, "`{}`")
+            target_future = executor.submit(self._count_rows, self.target_engine, table_order, '"{}"')
+            source_counts, source_errors = source_future.result()
+            target_counts, target_errors = target_future.result()
         
+        results = []
         for table_name in table_order:
             result = {
                 "table": table_name,
-                "source_count": 0,
-                "target_count": 0,
+                "source_count": source_counts.get(table_name, 0),
+                "target_count": target_counts.get(table_name, 0),
                 "match": False
             }
             
-            try:
-                # Get source count
-                with self.source_engine.connect() as conn:
-                    src_result = conn.execute(text(f"SELECT COUNT(*) FROM `{table_name}`"))
-                    result["source_count"] = src_result.scalar() or 0
-                
-                # Get target count
-                with self.target_engine.connect() as conn:
-                    tgt_result = conn.execute(text(f'SELECT COUNT(*) FROM "{table_name}"'))
-                    result["target_count"] = tgt_result.scalar() or 0
-                
+            error = source_errors.get(table_name) or target_errors.get(table_name)
+            if error:
+                result["error"] = error
+            else:
                 result["match"] = result["source_count"] == result["target_count"]
-                
-            except Exception as e:
-                result["error"] = str(e)
             
             results.append(result)
         
         return results
     
+    def _count_rows(self, engine: Engine, tables: list[str], quote: str) -> tuple[dict, dict]:
+        """
+        Count rows for many tables with UNION ALL queries (one round trip per chunk).
+        Falls back to per-table counts for a chunk that fails, so errors stay per table.
+        """
+        counts: dict[str, int] = {}
+        errors: dict[str, str] = {}
+        
+        with engine.connect() as conn:
+            for start in range(0, len(tables), ROW_COUNT_CHUNK_SIZE):
+                chunk = tables[start:start + ROW_COUNT_CHUNK_SIZE]
+                union_sql = " UNION ALL ".join(
+                    f"SELECT {i} AS idx, COUNT(*) AS cnt FROM {quote.format(name)}"
+                    for i, name in enumerate(chunk)
+                )
+                try:
+                    for idx, count in conn.execute(text(union_sql)):
+                        counts[chunk[idx]] = count or 0
+                    continue
+                except Exception:
+                    conn.rollback()
+                
+                for name in chunk:
+                    try:
+                        counts[name] = conn.execute(text(f"SELECT COUNT(*) FROM {quote.format(name)}")).scalar() or 0
+                    except Exception as e:
+                        conn.rollback()
+                        errors[name] = str(e)
+        
+        return counts, errors
+    
     def _close_connections(self):
         """Close database connections."""
         if self._source_engine:
@@ -587,4 +793,3 @@ def data_migration_node(state: dict) -> dict:
     
     updated_state = agent.run(migration_state)
     return updated_state.model_dump()
->>>>>>> 5b7a1235ba7ce790739964ce89fbce20f3df9c2b
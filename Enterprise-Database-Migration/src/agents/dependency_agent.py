@@ -2,6 +2,9 @@
 Dependency Agent - Analyzes object dependencies and determines migration order.
 """
 
+from array import array
+from collections import deque
+
 from src.agents.base_agent import BaseAgent
 from src.state import (
     MigrationState, 
@@ -11,6 +14,11 @@ from src.state import (
     DependencyEdge,
 )
 from src.tools.artifact_manager import get_artifact_manager
+from src.tools.graph_kernels import kahn_order_compiled
+from src.tools.table_references import TableReferenceFinder
+
+
+_COMPLEXITY_LEVELS = ("low", "medium", "high")
 
 
 class DependencyAgent(BaseAgent):
@@ -46,69 +54,64 @@ Output a dependency graph that ensures objects are migrated in correct order."""
         
         try:
             schema = state.schema_metadata
-            nodes: list[DependencyNode] = []
-            edges: list[DependencyEdge] = []
-            
-            # Create nodes for all objects
-            for table in schema.tables:
-                complexity = self._classify_complexity(table)
-                nodes.append(DependencyNode(
+            # Create nodes for all objects. Inputs are already validated schema
+            # metadata, so skip per-object Pydantic validation with model_construct.
+            make_node = DependencyNode.model_construct
+            nodes: list[DependencyNode] = [
+                make_node(
                     id=f"table:{table.name}",
                     name=table.name,
                     type="table",
-                    complexity=complexity,
-                ))
-            
-            for view in schema.views:
-                nodes.append(DependencyNode(
-                    id=f"view:{view.name}",
-                    name=view.name,
-                    type="view",
-                    complexity="medium",
-                ))
-            
-            for proc in schema.procedures:
-                nodes.append(DependencyNode(
+                    complexity=self._classify_complexity(table),
+                )
+                for table in schema.tables
+            ]
+            nodes += [
+                make_node(id=f"view:{view.name}", name=view.name, type="view", complexity="medium")
+                for view in schema.views
+            ]
+            nodes += [
+                make_node(
                     id=f"procedure:{proc.name}",
                     name=proc.name,
                     type=proc.type,
                     complexity="high" if len(proc.source_code) > 500 else "medium",
-                ))
+                )
+                for proc in schema.procedures
+            ]
+            nodes += [
+                make_node(id=f"trigger:{trigger.name}", name=trigger.name, type="trigger", complexity="medium")
+                for trigger in schema.triggers
+            ]
             
-            for trigger in schema.triggers:
-                nodes.append(DependencyNode(
-                    id=f"trigger:{trigger.name}",
-                    name=trigger.name,
-                    type="trigger",
-                    complexity="medium",
-                ))
+            # Collect edges as (from_id, to_id, edge_type) tuples; models are built at the end
+            # Foreign keys
+            raw_edges: list[tuple[str, str, str]] = [
+                (f"table:{table.name}", f"table:{fk['referred_table']}", "foreign_key")
+                for table in schema.tables
+                for fk in table.foreign_keys
+            ]
             
-            # Create edges for foreign keys
-            for table in schema.tables:
-                for fk in table.foreign_keys:
-                    edges.append(DependencyEdge(
-                        from_id=f"table:{table.name}",
-                        to_id=f"table:{fk['referred_table']}",
-                        edge_type="foreign_key",
-                    ))
+            # View dependencies (whole-word table name matches)
+            finder = TableReferenceFinder(table.name for table in schema.tables)
+            raw_edges += [
+                (f"view:{view.name}", f"table:{table_name}", "reference")
+                for view in schema.views
+                for table_name in finder.find(view.definition)
+            ]
             
-            # Create edges for view dependencies (simple parsing)
-            for view in schema.views:
-                for table in schema.tables:
-                    if table.name.lower() in view.definition.lower():
-                        edges.append(DependencyEdge(
-                            from_id=f"view:{view.name}",
-                            to_id=f"table:{table.name}",
-                            edge_type="reference",
-                        ))
+            # Trigger dependencies
+            raw_edges += [
+                (f"trigger:{trigger.name}", f"table:{trigger.table_name}", "reference")
+                for trigger in schema.triggers
+            ]
             
-            # Create edges for trigger dependencies
-            for trigger in schema.triggers:
-                edges.append(DependencyEdge(
-                    from_id=f"trigger:{trigger.name}",
-                    to_id=f"table:{trigger.table_name}",
-                    edge_type="reference",
-                ))
+            # Drop duplicate nodes (same id) and edges (e.g. two FKs between the same tables)
+            nodes = self._dedupe(nodes, lambda node: node.id)
+            edges: list[DependencyEdge] = [
+                DependencyEdge.model_construct(from_id=from_id, to_id=to_id, edge_type=edge_type)
+                for from_id, to_id, edge_type in dict.fromkeys(raw_edges)
+            ]
             
             # Determine migration order using topological sort
             migration_order = self._topological_sort(nodes, edges)
@@ -144,31 +147,31 @@ Output a dependency graph that ensures objects are migrated in correct order."""
     
     def _classify_complexity(self, table) -> str:
         """Classify migration complexity of a table."""
-        score = 0
-        
-        # More columns = more complex
-        if len(table.columns) > 20:
-            score += 2
-        elif len(table.columns) > 10:
-            score += 1
-        
-        # More foreign keys = more complex
-        if len(table.foreign_keys) > 3:
-            score += 2
-        elif len(table.foreign_keys) > 0:
-            score += 1
+        columns = len(table.columns)
+        fks = len(table.foreign_keys)
+        rows = table.row_count or 0
         
-        # Large tables = more complex
-        if table.row_count and table.row_count > 100000:
-            score += 2
-        elif table.row_count and table.row_count > 10000:
-            score += 1
-        
-        if score >= 4:
-            return "high"
-        elif score >= 2:
-            return "medium"
-        return "low"
+        # More columns, more foreign keys and larger tables are more complex:
+        # 2 points above the high threshold, 1 above the low one
+        score = (
+            (columns > 20) * 2 + (10 < columns <= 20)
+            + (fks > 3) * 2 + (0 < fks <= 3)
+            + (rows > 100000) * 2 + (10000 < rows <= 100000)
+        )
+        # 0-1 low, 2-3 medium, 4+ high
+        return _COMPLEXITY_LEVELS[min(score // 2, 2)]
+    
+    @staticmethod
+    def _dedupe(items: list, key) -> list:
+        """Keep the first item for each key, preserving order."""
+        seen = set()
+        unique = []
+        for item in items:
+            k = key(item)
+            if k not in seen:
+                seen.add(k)
+                unique.append(item)
+        return unique
     
     def _topological_sort(
         self, 
@@ -176,37 +179,70 @@ Output a dependency graph that ensures objects are migrated in correct order."""
         edges: list[DependencyEdge]
     ) -> list[str]:
         """Perform topological sort to determine migration order."""
-        # Build adjacency list
-        # This will create an empty list and a dictionary with all the nodes and their in-degrees
-        # This is used to determine the migration order
-        graph: dict[str, list[str]] = {node.id: [] for node in nodes}
-        in_degree: dict[str, int] = {node.id: 0 for node in nodes}
+        ids, offsets, adjacency, in_degree = self._build_csr(nodes, edges)
         
-        # This will check whether the node is present in the graph and if it is, it will add the edge to the graph
-        # and increment the in-degree of the from_id
-        for edge in edges:
-            if edge.from_id in graph and edge.to_id in graph:
-                graph[edge.to_id].append(edge.from_id)
-                in_degree[edge.from_id] += 1
+        # Numba-compiled Kahn loop when available
+        order = kahn_order_compiled(adjacency, offsets, in_degree)
+        if order is not None:
+            return [ids[i] for i in order]
         
-        # Find nodes with no dependencies
-        queue = [node_id for node_id, degree in in_degree.items() if degree == 0]
-        result = []
+        # Kahn's algorithm over integer indices: start with nodes that have no dependencies
+        queue = deque(i for i, degree in enumerate(in_degree) if degree == 0)
+        order = []
+        visited = bytearray(len(ids))
         
         while queue:
-            node_id = queue.pop(0)
-            result.append(node_id)
+            node = queue.popleft()
+            order.append(node)
+            visited[node] = 1
             
-            for dependent in graph.get(node_id, []):
+            for k in range(offsets[node], offsets[node + 1]):
+                dependent = adjacency[k]
                 in_degree[dependent] -= 1
                 if in_degree[dependent] == 0:
                     queue.append(dependent)
         
         # If not all nodes are processed, there's a cycle - add remaining
-        remaining = [n for n in in_degree if n not in result]
-        result.extend(remaining)
+        order.extend(i for i in range(len(ids)) if not visited[i])
+        
+        return [ids[i] for i in order]
+    
+    def _build_csr(self, nodes: list[DependencyNode], edges: list[DependencyEdge]):
+        """Index the graph as integer arrays for the sort.
+        
+        Returns ``(ids, offsets, adjacency, in_degree)``. The dependents of node
+        ``i`` are ``adjacency[offsets[i]:offsets[i + 1]]``, in edge order.
+        Edges that touch unknown nodes are ignored.
+        """
+        ids = list(dict.fromkeys(node.id for node in nodes))
+        index = {node_id: i for i, node_id in enumerate(ids)}
+        
+        # First pass: resolve edges to (dependency, dependent) indices and count
+        # the dependents of each node to size the offsets
+        pairs = []
+        out_degree = array("i", [0]) * len(ids)
+        in_degree = array("i", [0]) * len(ids)
+        for edge in edges:
+            dependency = index.get(edge.to_id)
+            dependent = index.get(edge.from_id)
+            if dependency is None or dependent is None:
+                continue
+            pairs.append((dependency, dependent))
+            out_degree[dependency] += 1
+            in_degree[dependent] += 1
+        
+        offsets = array("i", [0]) * (len(ids) + 1)
+        for i, degree in enumerate(out_degree):
+            offsets[i + 1] = offsets[i] + degree
+        
+        # Second pass: fill each node's slice of the flat adjacency array
+        adjacency = array("i", [0]) * len(pairs)
+        cursor = array("i", offsets[:-1])
+        for dependency, dependent in pairs:
+            adjacency[cursor[dependency]] = dependent
+            cursor[dependency] += 1
         
-        return result
+        return ids, offsets, adjacency, in_degree
 
 
 def dependency_node(state: dict) -> dict:
@@ -214,7 +250,7 @@ def dependency_node(state: dict) -> dict:
     agent = DependencyAgent()
     
     if isinstance(state, dict):
-        migration_state = MigrationState(**state)
+        migration_state = MigrationState.model_validate(state)
     else:
         migration_state = state
     
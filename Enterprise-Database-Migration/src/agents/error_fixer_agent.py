@@ -3,18 +3,41 @@ Error Fixer Agent - Analyzes sandbox errors and uses LLM to fix DDL.
 Uses dependency graph as context and handles circular dependencies.
 """
 
-import json
+import mmap
 import re
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
 from pathlib import Path
+from types import MappingProxyType
+
+import orjson
 from langchain_core.messages import HumanMessage, SystemMessage
 from langchain_groq import ChatGroq
 
 from src.agents.base_agent import BaseAgent
-from src.state import MigrationState, MigrationPhase, MigrationStatus, SandboxResult
+from src.state import MigrationState, MigrationPhase, MigrationStatus, SandboxResult, TransformedDDL
 from src.tools.artifact_manager import get_artifact_manager
 from src.config import get_settings
 
 
+# Opening ```/```sql fence at the start or closing ``` at the end of an LLM response
+_FENCE_RE = re.compile(r"\A\s*```(?:sql)?|```\s*\Z", re.IGNORECASE)
+
+# PostgreSQL errors with deterministic fixes (see ErrorFixerAgent._try_static_fix)
+_DUPLICATE_RELATION_RE = re.compile(r'relation "([^"]+)" already exists')
+_NO_BTREE_OPCLASS_RE = re.compile(r'data type (\w+) has no default operator class for access method "btree"')
+_MISSING_RELATION_RE = re.compile(r'relation "([^"]+)" does not exist')
+
+# CREATE INDEX without an access method: (prefix, table, column list, columns)
+_CREATE_INDEX_RE = re.compile(
+    r'(CREATE\s+(?:UNIQUE\s+)?INDEX\s+(?:"?\w+"?\s+)?ON\s+"?(\w+)"?\s*)(\(([^)]*)\))',
+    re.IGNORECASE,
+)
+_INDEX_PREFIX_RE = re.compile(r"^(?:idx_|fk_)+", re.IGNORECASE)
+_FK_ACTION = r"(?:NO\s+ACTION|SET\s+NULL|SET\s+DEFAULT|CASCADE|RESTRICT)"
+_CREATE_TABLE_RE = re.compile(r'CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?"?(\w+)"?', re.IGNORECASE)
+
 # System prompt for error analysis and fixing
 ERROR_FIXER_SYSTEM_PROMPT = """You are an expert PostgreSQL Database Engineer. Your job is to analyze SQL execution errors and fix them.
 
@@ -80,6 +103,15 @@ Just the raw SQL.
 """
 
 
+@lru_cache(maxsize=1)
+def _load_graph_file(path: Path, mtime_ns: int) -> Mapping:
+    """Parse a dependency graph file once per (path, mtime) as a read-only mapping."""
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        # Parse straight from the mapped pages, without copying them into a bytes object
+        with memoryview(mapped) as view:
+            return MappingProxyType(orjson.loads(view))
+
+
 class ErrorFixerAgent(BaseAgent):
     """
     Agent that analyzes sandbox errors and uses LLM to fix them.
@@ -92,7 +124,9 @@ class ErrorFixerAgent(BaseAgent):
             name="Error Fixer Agent",
             description="Analyzes sandbox errors and fixes SQL using LLM",
             use_complex_model=True,
-            system_prompt=ERROR_FIXER_SYSTEM_PROMPT
+            system_prompt=ERROR_FIXER_SYSTEM_PROMPT,
+            # Fixes are re-requested after they fail, so a cached answer would just fail again
+            enable_cache=False,
         )
         self.artifact_manager = get_artifact_manager()
         
@@ -107,18 +141,38 @@ class ErrorFixerAgent(BaseAgent):
         
         # Load dependency graph
         self.dependency_graph = self._load_dependency_graph()
+        self._index_fk_edges()
+        self._circular_nodes: frozenset[str] = frozenset()
+        self._ddl_by_name: dict = {}
+        self._proc_by_name: dict = {}
+        # FKs taken out by _drop_missing_fk: re-added after all tables, or dropped for good
+        self._deferred_fks: list[str] = []
+        self._dropped_fks: list[str] = []
     
-    def _load_dependency_graph(self) -> dict:
-        """Load dependency graph from artifacts."""
+    def _load_dependency_graph(self) -> Mapping:
+        """Load dependency graph from artifacts.
+        
+        The parsed graph is shared by later instances (one per error-fixer
+        retry) until the file's mtime changes.
+        """
         try:
             dep_path = self.artifact_manager.artifacts_dir / "dependency_graph.json"
             if dep_path.exists():
-                with open(dep_path) as f:
-                    return json.load(f)
+                return _load_graph_file(dep_path, dep_path.stat().st_mtime_ns)
         except Exception as e:
             self.log(f"Could not load dependency graph: {e}", "warning")
         return {"nodes": [], "edges": [], "migration_order": []}
     
+    def _index_fk_edges(self):
+        """Index FK edges by table in both directions for _get_fk_context."""
+        self._fk_out: dict[str, list[str]] = {}
+        self._fk_in: dict[str, list[str]] = {}
+        for edge in self.dependency_graph.get("edges", []):
+            if edge["edge_type"] == "foreign_key":
+                from_id, to_id = edge["from_id"], edge["to_id"]
+                self._fk_out.setdefault(from_id, []).append(to_id.replace("table:", ""))
+                self._fk_in.setdefault(to_id, []).append(from_id.replace("table:", ""))
+    
     def _get_circular_dependencies(self) -> list:
         """Find circular dependencies from the graph."""
         edges = self.dependency_graph.get("edges", [])
@@ -128,32 +182,19 @@ class ErrorFixerAgent(BaseAgent):
         edge_set = {(e["from_id"], e["to_id"]) for e in edges if e["edge_type"] == "foreign_key"}
         
         for from_id, to_id in edge_set:
-            if (to_id, from_id) in edge_set:
-                # Found circular dependency
-                pair = tuple(sorted([from_id, to_id]))
-                if pair not in circular_pairs:
-                    circular_pairs.append(pair)
+            # Report each A↔B pair once, as the sorted (A, B) tuple
+            if from_id < to_id and (to_id, from_id) in edge_set:
+                circular_pairs.append((from_id, to_id))
         
-        return circular_pairs
+        return sorted(circular_pairs)
     
     def _get_fk_context(self, table_name: str) -> str:
         """Get FK relationships for a table from dependency graph."""
-        edges = self.dependency_graph.get("edges", [])
         table_id = f"table:{table_name}"
         
-        # Find tables this table depends on (FK references)
-        depends_on = []
-        for edge in edges:
-            if edge["from_id"] == table_id and edge["edge_type"] == "foreign_key":
-                ref_table = edge["to_id"].replace("table:", "")
-                depends_on.append(ref_table)
-        
-        # Find tables that depend on this table
-        depended_by = []
-        for edge in edges:
-            if edge["to_id"] == table_id and edge["edge_type"] == "foreign_key":
-                from_table = edge["from_id"].replace("table:", "")
-                depended_by.append(from_table)
+        # Tables this table depends on (FK references) and tables that depend on it
+        depends_on = self._fk_out.get(table_id)
+        depended_by = self._fk_in.get(table_id)
         
         context = f"Table '{table_name}' FK dependencies:\n"
         context += f"  - References (FK to): {', '.join(depends_on) if depends_on else 'None'}\n"
@@ -184,48 +225,206 @@ class ErrorFixerAgent(BaseAgent):
         circular_deps = self._get_circular_dependencies()
         if circular_deps:
             self.log(f"Detected circular dependencies: {circular_deps}")
+        self._circular_nodes = frozenset(node_id for pair in circular_deps for node_id in pair)
         
-        fixes_applied = 0
+        # Index DDL and procedures by name (first definition wins, as in a scan)
+        self._ddl_by_name = {ddl.object_name: ddl for ddl in reversed(state.transformed_ddl)}
+        self._proc_by_name = {proc.name: proc for proc in reversed(state.converted_procedures)}
+        self._deferred_fks, self._dropped_fks = [], []
         
-        # All errors are now fixable - we send them all to LLM with context
+        # Deterministic rule-based fixes first; everything else goes to the LLM with context
+        fix_requests = []
+        static_fixes = 0
         for result in failed_results:
-            success = self._fix_error_with_context(result, state, circular_deps)
-            if success:
-                fixes_applied += 1
+            self.log(f"Fixing {result.object_type}: {result.object_name}")
+            ddl_obj, original_ddl = self._find_original_ddl(result)
+            if not original_ddl:
+                self.log(f"  ✗ Could not find original DDL for {result.object_name}", "warning")
+                continue
+            
+            static_fix = self._try_static_fix(result, original_ddl)
+            if static_fix is not None:
+                static_fixes += self._apply_fix(result, ddl_obj, original_ddl, static_fix)
+                continue
+            
+            messages = self._build_fix_messages(result, original_ddl)
+            fix_requests.append((result, ddl_obj, original_ddl, messages))
         
-        self.log(f"Applied {fixes_applied} fixes using LLM", "success")
+        self._record_removed_fks(state)
+        llm_fixes = self._run_fixes(fix_requests)
+        
+        self.log(f"Applied {static_fixes + llm_fixes} fixes ({static_fixes} rule-based, {llm_fixes} using LLM)", "success")
         
         # Update state
         state.current_phase = MigrationPhase.SCHEMA_TRANSFORMATION
         
         return state
     
-    def _fix_error_with_context(self, result: SandboxResult, state: MigrationState, circular_deps: list) -> bool:
-        """Fix error using LLM with dependency context."""
-        self.log(f"Fixing {result.object_type}: {result.object_name}")
+    def _run_fixes(self, fix_requests: list[tuple]) -> int:
+        """Send fix requests to the LLM concurrently and apply the responses.
         
-        # Find the original DDL
-        original_ddl = None
-        ddl_obj = None
+        LLM calls are I/O bound, so they run in a thread pool. Responses are
+        applied on this thread, one at a time, as they complete.
+        """
+        if not fix_requests:
+            return 0
         
-        for ddl in state.transformed_ddl:
-            if ddl.object_name == result.object_name:
-                original_ddl = ddl.target_ddl
-                ddl_obj = ddl
-                break
+        fixes_applied = 0
+        workers = min(self.llm_config.parallelism, len(fix_requests))
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            futures = {
+                executor.submit(self.invoke_with_retry, messages): (result, ddl_obj, original_ddl)
+                for result, ddl_obj, original_ddl, messages in fix_requests
+            }
+            for future in as_completed(futures):
+                result, ddl_obj, original_ddl = futures[future]
+                try:
+                    response = future.result()
+                    if self._apply_fix(result, ddl_obj, original_ddl, response.content):
+                        fixes_applied += 1
+                except Exception as e:
+                    self.log(f"  ✗ LLM error for {result.object_name}: {str(e)[:100]}", "warning")
+        
+        return fixes_applied
+    
+    def _find_original_ddl(self, result: SandboxResult) -> tuple:
+        """Find the DDL object and SQL for a failed result. Returns (obj, sql) or (None, None)."""
+        ddl_obj = self._ddl_by_name.get(result.object_name)
+        original_ddl = ddl_obj.target_ddl if ddl_obj else None
         
         if not original_ddl:
             # Check procedures
-            for proc in state.converted_procedures:
-                if proc.name == result.object_name:
-                    original_ddl = proc.target_code
-                    ddl_obj = proc
-                    break
-        
-        if not original_ddl:
-            self.log(f"  ✗ Could not find original DDL for {result.object_name}", "warning")
-            return False
+            ddl_obj = self._proc_by_name.get(result.object_name)
+            original_ddl = ddl_obj.target_code if ddl_obj else None
         
+        return ddl_obj, original_ddl
+    
+    def _try_static_fix(self, result: SandboxResult, original_ddl: str) -> str | None:
+        """Fix well-understood errors with a regex rewrite instead of an LLM call.
+        
+        Returns the fixed SQL, or None if no rule applies.
+        """
+        error_text = result.errors[0] if result.errors else ""
+        rules = (
+            (_DUPLICATE_RELATION_RE, self._rename_duplicate_index),
+            (_NO_BTREE_OPCLASS_RE, self._use_gist_index),
+            (_MISSING_RELATION_RE, self._drop_missing_fk),
+        )
+        for error_re, rule in rules:
+            match = error_re.search(error_text)
+            if match:
+                fixed_ddl = rule(original_ddl, match.group(1))
+                if fixed_ddl is not None and fixed_ddl != original_ddl:
+                    self.log(f"  Rule-based fix: {rule.__doc__.splitlines()[0]}")
+                    return fixed_ddl
+                return None
+        return None
+    
+    def _rename_duplicate_index(self, ddl: str, index_name: str) -> str | None:
+        """Prefix a duplicate index name with its table name."""
+        index_re = re.compile(
+            rf'(CREATE\s+(?:UNIQUE\s+)?INDEX\s+)"?{re.escape(index_name)}"?(\s+ON\s+"?(\w+)"?)',
+            re.IGNORECASE,
+        )
+        match = index_re.search(ddl)
+        if match is None:
+            return None  # Not an index (e.g. a table that already exists)
+        
+        table = match.group(3)
+        suffix = _INDEX_PREFIX_RE.sub("", index_name)  # idx_fk_customer_id -> customer_id
+        new_name = f"idx_{suffix}" if suffix.startswith(f"{table}_") else f"idx_{table}_{suffix}"
+        if new_name == index_name or f'"{new_name}"' in ddl:
+            return None
+        return f'{ddl[:match.start()]}{match.group(1)}"{new_name}"{match.group(2)}{ddl[match.end():]}'
+    
+    def _use_gist_index(self, ddl: str, type_name: str) -> str | None:
+        """Use GIST for indexes on geometric (e.g. POINT) columns."""
+        # Columns of the failing type, from the table DDLs in this run
+        column_re = re.compile(rf'"?(\w+)"?\s+{re.escape(type_name)}\b', re.IGNORECASE)
+        typed_columns = {
+            (ddl_obj.object_name, column)
+            for ddl_obj in self._ddl_by_name.values() if ddl_obj.object_type == "table"
+            for column in column_re.findall(ddl_obj.target_ddl)
+        }
+        single_index = len(_CREATE_INDEX_RE.findall(ddl)) == 1
+        
+        def add_gist(match: re.Match) -> str:
+            table = match.group(2)
+            columns = [c.strip().strip('"') for c in match.group(4).split(",")]
+            if single_index or any((table, c) in typed_columns for c in columns):
+                return f"{match.group(1)}USING GIST {match.group(3)}"
+            return match.group(0)
+        
+        return _CREATE_INDEX_RE.sub(add_gist, ddl)
+    
+    def _drop_missing_fk(self, ddl: str, missing_table: str) -> str | None:
+        """Defer FK constraints that reference a missing table."""
+        table = re.escape(missing_table)
+        references = rf'REFERENCES\s+"?{table}"?\s*\([^)]*\)(?:\s+ON\s+(?:DELETE|UPDATE)\s+{_FK_ACTION})*'
+        # ALTER TABLE ... ADD CONSTRAINT ... FOREIGN KEY ... REFERENCES missing (...);
+        # These already run after all tables, so the referenced table is really missing.
+        alter_re = re.compile(rf'ALTER\s+TABLE\s[^;]*?{references}\s*;\s*', re.IGNORECASE)
+        # , [CONSTRAINT name] FOREIGN KEY (...) REFERENCES missing (...) inside CREATE TABLE
+        constraint_re = re.compile(
+            rf',\s*((?:CONSTRAINT\s+"?\w+"?\s+)?FOREIGN\s+KEY\s*\([^)]*\)\s*{references})', re.IGNORECASE
+        )
+        # Inline column REFERENCES missing (...)
+        inline_re = re.compile(rf'\s+{references}', re.IGNORECASE)
+        
+        create_table = _CREATE_TABLE_RE.search(ddl)
+        deferred, dropped = [], []
+        fixed_ddl = ddl
+        for match in alter_re.finditer(fixed_ddl):
+            dropped.append(match.group(0).strip())
+        fixed_ddl = alter_re.sub("", fixed_ddl)
+        for match in constraint_re.finditer(fixed_ddl):
+            if create_table:
+                deferred.append(f'ALTER TABLE "{create_table.group(1)}" ADD {match.group(1)};')
+            else:
+                dropped.append(match.group(1))
+        fixed_ddl = constraint_re.sub("", fixed_ddl)
+        for match in inline_re.finditer(fixed_ddl):
+            dropped.append(match.group(0).strip())
+        fixed_ddl = inline_re.sub("", fixed_ddl)
+        
+        if fixed_ddl == ddl:
+            return None
+        self._deferred_fks.extend(deferred)
+        self._dropped_fks.extend(dropped)
+        return fixed_ddl
+    
+    def _record_removed_fks(self, state: MigrationState):
+        """Re-add deferred FKs after all tables exist, and report the ones dropped for good."""
+        if self._deferred_fks:
+            constraints = next((d for d in state.transformed_ddl if d.object_type == "constraint"), None)
+            if constraints is None:
+                constraints = TransformedDDL(
+                    object_name="_deferred_fks",
+                    object_type="constraint",
+                    source_ddl="FKs deferred by the error fixer",
+                    target_ddl="",
+                    type_mappings=[{"method": "generated"}],
+                )
+                state.transformed_ddl.append(constraints)
+            constraints.target_ddl = "\n\n".join(filter(None, [constraints.target_ddl, *self._deferred_fks]))
+            constraints.file_path = str(self.artifact_manager.save_sql(
+                constraints.target_ddl,
+                "deferred_fks.sql",
+                subdir="ddl",
+                header_comment="Deferred Foreign Keys (circular dependencies)",
+            ))
+            self.log(f"  Deferred {len(self._deferred_fks)} FK constraints until all tables exist")
+        
+        for fk in self._dropped_fks:
+            self.log(f"  ⚠ Dropped FK constraint: {fk}", "warning")
+            state.errors.append({
+                "phase": MigrationPhase.SCHEMA_TRANSFORMATION,
+                "error_type": "dropped_foreign_key",
+                "error_message": f"Dropped FK constraint referencing a missing table: {fk}",
+            })
+    
+    def _build_fix_messages(self, result: SandboxResult, original_ddl: str) -> list:
+        """Build the LLM messages asking for a fix of a failed object."""
         error_text = result.errors[0] if result.errors else "Unknown error"
         
         # Get FK context for tables
@@ -234,11 +433,7 @@ class ErrorFixerAgent(BaseAgent):
             fk_context = self._get_fk_context(result.object_name)
         
         # Check if this is part of a circular dependency
-        is_circular = False
-        for pair in circular_deps:
-            if f"table:{result.object_name}" in pair:
-                is_circular = True
-                break
+        is_circular = f"table:{result.object_name}" in self._circular_nodes
         
         circular_note = ""
         if is_circular:
@@ -271,67 +466,51 @@ Instructions:
 
 Return ONLY the corrected SQL statement."""
 
-        messages = [
+        return [
             SystemMessage(content=ERROR_FIXER_SYSTEM_PROMPT),
             HumanMessage(content=prompt)
         ]
+    
+    def _apply_fix(self, result: SandboxResult, ddl_obj, original_ddl: str, response_text: str) -> bool:
+        """Apply an LLM fix to the DDL object and save it. Returns True if changed."""
+        fixed_ddl = self._clean_sql(response_text)
         
-        try:
-            # Use invoke_with_retry for automatic API key rotation on rate limits
-            # Token tracking is handled automatically by invoke_with_retry
-            response = self.invoke_with_retry(messages)
-            
-            fixed_ddl = self._clean_sql(response.content)
-            
-            # Check if LLM actually changed something
-            if fixed_ddl != original_ddl:
-                # Update the DDL in state
-                if hasattr(ddl_obj, 'target_ddl'):
-                    ddl_obj.target_ddl = fixed_ddl
-                elif hasattr(ddl_obj, 'target_code'):
-                    ddl_obj.target_code = fixed_ddl
-                
-                # Save updated DDL
-                if result.object_type == "table":
-                    self.artifact_manager.save_table_ddl(result.object_name, fixed_ddl)
-                elif result.object_type == "view":
-                    self.artifact_manager.save_sql(
-                        fixed_ddl,
-                        f"{result.object_name}.sql",
-                        subdir="ddl/views",
-                        header_comment=f"Fixed view: {result.object_name}"
-                    )
-                elif result.object_type in ["procedure", "function", "trigger"]:
-                    self.artifact_manager.save_sql(
-                        fixed_ddl,
-                        f"{result.object_name}.sql",
-                        subdir="procedures",
-                        header_comment=f"Fixed {result.object_type}: {result.object_name}"
-                    )
-                
-                self.log(f"  ✓ Fixed {result.object_name}")
-                return True
-            else:
-                self.log(f"  - No changes made for {result.object_name}")
-                return False
-                
-        except Exception as e:
-            self.log(f"  ✗ LLM error: {str(e)[:100]}", "warning")
+        # Check if LLM actually changed something
+        if fixed_ddl == original_ddl:
+            self.log(f"  - No changes made for {result.object_name}")
             return False
+        
+        # Update the DDL in state
+        if hasattr(ddl_obj, 'target_ddl'):
+            ddl_obj.target_ddl = fixed_ddl
+        elif hasattr(ddl_obj, 'target_code'):
+            ddl_obj.target_code = fixed_ddl
+        
+        # Save updated DDL
+        if result.object_type == "table":
+            self.artifact_manager.save_table_ddl(result.object_name, fixed_ddl)
+        elif result.object_type == "view":
+            self.artifact_manager.save_sql(
+                fixed_ddl,
+                f"{result.object_name}.sql",
+                subdir="ddl/views",
+                header_comment=f"Fixed view: {result.object_name}"
+            )
+        elif result.object_type in ["procedure", "function", "trigger"]:
+            self.artifact_manager.save_sql(
+                fixed_ddl,
+                f"{result.object_name}.sql",
+                subdir="procedures",
+                header_comment=f"Fixed {result.object_type}: {result.object_name}"
+            )
+        
+        self.log(f"  ✓ Fixed {result.object_name}")
+        return True
     
     def _clean_sql(self, sql: str) -> str:
         """Clean up LLM output."""
-        sql = sql.strip()
-        
-        # Remove markdown code blocks
-        if sql.startswith("```sql"):
-            sql = sql[6:]
-        elif sql.startswith("```"):
-            sql = sql[3:]
-        if sql.endswith("```"):
-            sql = sql[:-3]
-        
-        sql = sql.strip()
+        # Remove markdown code fences (both ends in one pass)
+        sql = _FENCE_RE.sub("", sql).strip()
         
         # Ensure ends with semicolon
         if sql and not sql.endswith(";"):
@@ -345,7 +524,7 @@ def error_fixer_node(state: dict) -> dict:
     agent = ErrorFixerAgent()
     
     if isinstance(state, dict):
-        migration_state = MigrationState(**state)
+        migration_state = MigrationState.model_validate(state)
     else:
         migration_state = state
     
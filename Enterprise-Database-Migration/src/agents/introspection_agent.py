@@ -87,10 +87,13 @@ Provide clear summaries of what you find and flag any potential issues."""
     
     def _generate_summary(self, schema: SchemaMetadata) -> str:
         """Generate a summary of the extracted schema."""
-        total_rows = sum(t.row_count or 0 for t in schema.tables)
-        total_columns = sum(len(t.columns) for t in schema.tables)
-        total_indexes = sum(len(t.indexes) for t in schema.tables)
-        total_fks = sum(len(t.foreign_keys) for t in schema.tables)
+        # Single pass over the tables for all totals
+        total_rows = total_columns = total_indexes = total_fks = 0
+        for t in schema.tables:
+            total_rows += t.row_count or 0
+            total_columns += len(t.columns)
+            total_indexes += len(t.indexes)
+            total_fks += len(t.foreign_keys)
         
         return f"""
 Schema Extraction Complete:
@@ -110,7 +113,7 @@ def introspection_node(state: dict) -> dict:
     
     # Convert dict to MigrationState if needed
     if isinstance(state, dict):
-        migration_state = MigrationState(**state)
+        migration_state = MigrationState.model_validate(state)
     else:
         migration_state = state
     
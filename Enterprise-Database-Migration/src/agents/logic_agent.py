@@ -2,13 +2,102 @@
 Logic Agent - Converts MySQL stored procedures/functions to PostgreSQL PL/pgSQL.
 """
 
+import json
+import re
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
 from langchain_core.messages import HumanMessage
+from pydantic import TypeAdapter
 
 from src.agents.base_agent import BaseAgent
 from src.state import MigrationState, MigrationPhase, MigrationStatus, ConvertedProcedure
 from src.tools.artifact_manager import get_artifact_manager
 
 
+# Static instruction blocks sent ahead of each object's source. Keep these free of
+# per-object values so the request prefix stays identical and cacheable.
+PROCEDURE_CONVERSION_RULES = """## CRITICAL PostgreSQL 16 Rules:
+
+### OUT Parameter Handling (CRITICAL!)
+PostgreSQL does NOT support OUT parameters with RETURNS void.
+
+❌ WRONG:
+CREATE FUNCTION my_func(IN p_id INT, OUT p_count INT) RETURNS void AS $$
+
+✅ CORRECT - For single OUT value, use RETURNS:
+CREATE FUNCTION film_in_stock(p_film_id INT, p_store_id INT)
+RETURNS INTEGER AS $$
+DECLARE
+    v_count INTEGER;
+BEGIN
+    SELECT COUNT(*) INTO v_count FROM inventory WHERE ...;
+    RETURN v_count;
+END;
+$$ LANGUAGE plpgsql;
+
+✅ CORRECT - For SETOF with table columns:
+CREATE FUNCTION rewards_report(min_purchases SMALLINT, min_amount NUMERIC)
+RETURNS TABLE(
+    customer_id SMALLINT,
+    store_id SMALLINT,
+    first_name VARCHAR,
+    last_name VARCHAR,
+    email VARCHAR
+) AS $$
+BEGIN
+    RETURN QUERY SELECT c.customer_id, c.store_id, ... FROM customer c WHERE ...;
+END;
+$$ LANGUAGE plpgsql;
+
+### Other Rules:
+1. Use CREATE OR REPLACE FUNCTION
+2. Use $$ delimiters
+3. DECLARE section before BEGIN
+4. Table names are SINGULAR: payment, rental, customer, inventory"""
+
+# Static request lines that lead each per-object message; the object's fields follow
+PROCEDURE_REQUEST = (
+    "Convert the MySQL routine below to PostgreSQL 16 PL/pgSQL. "
+    "Return ONLY the PostgreSQL code, no explanations or markdown."
+)
+
+BATCH_OUTPUT_FORMAT = """Each routine below is delimited by a ===PROC i=== marker. Convert every one
+of them and return ONLY a JSON array with one object per routine, no markdown:
+[{"index": 1, "pg_code": "CREATE OR REPLACE FUNCTION ...", "notes": "..."}]"""
+
+TRIGGER_CONVERSION_RULES = """Requirements for MySQL trigger conversion:
+1. Create a trigger function first
+2. Then create the trigger that calls this function
+3. PostgreSQL triggers return TRIGGER type
+4. Use NEW/OLD records appropriately"""
+
+TRIGGER_REQUEST = (
+    "Convert the MySQL trigger below to PostgreSQL. "
+    "Return ONLY the PostgreSQL code (function + trigger), no explanations."
+)
+
+# Short routines are packed into one request; the source budget leaves room in
+# max_tokens for the converted bodies of the whole batch.
+_BATCH_SOURCE_CHARS = 6000
+_BATCH_MAX_PROCS = 8
+
+_CONVERSIONS_ADAPTER = TypeAdapter(list[ConvertedProcedure])
+
+
+# Markdown code fence around a whole response; the closing fence is optional
+# because truncated responses may lack it.
+_FENCE_RE = re.compile(r"\A```[^\n]*\n(.*?)(?:\n```)?\Z", re.DOTALL)
+
+
+def _strip_fence(text: str) -> str:
+    """Return the response body without a surrounding markdown code fence."""
+    text = text.strip()
+    match = _FENCE_RE.match(text)
+    return match.group(1) if match else text
+
+
 class LogicAgent(BaseAgent):
     """
     Agent responsible for converting stored procedures and functions.
@@ -190,67 +279,78 @@ Always return valid PostgreSQL 16 PL/pgSQL code without markdown formatting."""
             schema = state.schema_metadata
             converted_procs: list[ConvertedProcedure] = []
             
-            for proc in schema.procedures:
-                self.log(f"Converting {proc.type}: {proc.name}")
+            # LLM calls are I/O bound, so conversions run in a thread pool. Results
+            # are consumed in submission order, keeping logs and artifacts ordered
+            # and artifact writes on this thread.
+            objects = len(schema.procedures) + len(schema.triggers)
+            workers = max(1, min(self.llm_config.parallelism, objects))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                batch_futures = [
+                    (batch, executor.submit(self._convert_procedure_batch, batch))
+                    for batch in self._batch_procedures(schema.procedures)
+                ]
+                proc_futures = [
+                    (proc, future, index)
+                    for batch, future in batch_futures
+                    for index, proc in enumerate(batch)
+                ]
+                trigger_futures = [
+                    (trigger, executor.submit(self._convert_trigger, trigger))
+                    for trigger in schema.triggers
+                ]
                 
-                # Use LLM for conversion
-                pg_code, notes = self._convert_procedure(proc)
+                for proc, future, index in proc_futures:
+                    self.log(f"Converting {proc.type}: {proc.name}")
+                    
+                    pg_code, notes = future.result()[index]
+                    
+                    # Save SQL artifact
+                    file_path = self.artifact_manager.save_procedure_sql(proc.name, pg_code)
+                    
+                    converted = ConvertedProcedure(
+                        name=proc.name,
+                        procedure_type=proc.type,
+                        source_code=proc.source_code,
+                        target_code=pg_code,
+                        conversion_notes=notes,
+                        file_path=str(file_path),
+                        status=MigrationStatus.PENDING,
+                    )
+                    converted_procs.append(converted)
+                    
+                    self.log(f"  ✓ Saved to {file_path}")
                 
-                # Save SQL artifact
-                file_path = self.artifact_manager.save_procedure_sql(proc.name, pg_code)
-                
-                converted = ConvertedProcedure(
-                    name=proc.name,
-                    procedure_type=proc.type,
-                    source_code=proc.source_code,
-                    target_code=pg_code,
-                    conversion_notes=notes,
-                    file_path=str(file_path),
-                    status=MigrationStatus.PENDING,
-                )
-                converted_procs.append(converted)
-                
-                self.log(f"  ✓ Saved to {file_path}")
-            
-            # Convert triggers
-            for trigger in schema.triggers:
-                self.log(f"Converting trigger: {trigger.name}")
-                
-                pg_code, notes = self._convert_trigger(trigger)
-                
-                file_path = self.artifact_manager.save_sql(
-                    pg_code,
-                    f"trigger_{trigger.name}.sql",
-                    subdir="procedures",
-                    header_comment=f"Trigger: {trigger.name} on {trigger.table_name}"
-                )
-                
-                converted = ConvertedProcedure(
-                    name=trigger.name,
-                    procedure_type="trigger",
-                    source_code=trigger.source_code,
-                    target_code=pg_code,
-                    conversion_notes=notes,
-                    file_path=str(file_path),
-                    status=MigrationStatus.PENDING,
-                )
-                converted_procs.append(converted)
+                # Convert triggers
+                for trigger, future in trigger_futures:
+                    self.log(f"Converting trigger: {trigger.name}")
+                    
+                    pg_code, notes = future.result()
+                    
+                    file_path = self.artifact_manager.save_sql(
+                        pg_code,
+                        f"trigger_{trigger.name}.sql",
+                        subdir="procedures",
+                        header_comment=f"Trigger: {trigger.name} on {trigger.table_name}"
+                    )
+                    
+                    converted = ConvertedProcedure(
+                        name=trigger.name,
+                        procedure_type="trigger",
+                        source_code=trigger.source_code,
+                        target_code=pg_code,
+                        conversion_notes=notes,
+                        file_path=str(file_path),
+                        status=MigrationStatus.PENDING,
+                    )
+                    converted_procs.append(converted)
             
             # Save summary
-            proc_summary = {
-                "procedures": len([p for p in converted_procs if p.procedure_type == "procedure"]),
-                "functions": len([p for p in converted_procs if p.procedure_type == "function"]),
-                "triggers": len([p for p in converted_procs if p.procedure_type == "trigger"]),
-                "conversions": [p.model_dump() for p in converted_procs],
-            }
-            self.artifact_manager.save_json(proc_summary, "converted_procedures.json")
+            summary_path = self._save_summary(converted_procs)
             
             # Update state
             state.converted_procedures = converted_procs
             state.current_phase = MigrationPhase.LOGIC_CONVERSION
-            state.artifact_paths["converted_procedures"] = str(
-                self.artifact_manager.artifacts_dir / "converted_procedures.json"
-            )
+            state.artifact_paths["converted_procedures"] = str(summary_path)
             
             self.log(f"Converted {len(converted_procs)} objects", "success")
             
@@ -264,138 +364,143 @@ Always return valid PostgreSQL 16 PL/pgSQL code without markdown formatting."""
         
         return state
     
+    def _save_summary(self, converted_procs: list[ConvertedProcedure]) -> Path:
+        """Save converted_procedures.json through the artifact manager."""
+        counts = Counter(p.procedure_type for p in converted_procs)
+        proc_summary = {
+            "procedures": counts["procedure"],
+            "functions": counts["function"],
+            "triggers": counts["trigger"],
+            # One adapter call dumps every conversion to JSON-ready dicts
+            "conversions": _CONVERSIONS_ADAPTER.dump_python(converted_procs, mode="json"),
+        }
+        return self.artifact_manager.save_json(proc_summary, "converted_procedures.json")
+    
+    def _batch_procedures(self, procs) -> list[list]:
+        """Group procedures, in order, into batches that fit the source budget."""
+        batches: list[list] = []
+        current: list = []
+        size = 0
+        for proc in procs:
+            length = len(proc.source_code)
+            if current and (size + length > _BATCH_SOURCE_CHARS or len(current) == _BATCH_MAX_PROCS):
+                batches.append(current)
+                current, size = [], 0
+            current.append(proc)
+            size += length
+        if current:
+            batches.append(current)
+        return batches
+    
     def _convert_procedure(self, proc) -> tuple[str, str]:
         """Convert a MySQL procedure/function to PL/pgSQL."""
-        prompt = f"""Convert this MySQL {proc.type} to PostgreSQL 16 PL/pgSQL:
-
-```sql
-{proc.source_code}
-```
-
-## CRITICAL PostgreSQL 16 Rules:
-
-### Parameters: {proc.parameters}
-### Return type hint: {proc.return_type or 'void'}
-
-### OUT Parameter Handling (CRITICAL!)
-PostgreSQL does NOT support OUT parameters with RETURNS void.
-
-❌ WRONG:
-CREATE FUNCTION my_func(IN p_id INT, OUT p_count INT) RETURNS void AS $$
-
-✅ CORRECT - For single OUT value, use RETURNS:
-CREATE FUNCTION film_in_stock(p_film_id INT, p_store_id INT)
-RETURNS INTEGER AS $$
-DECLARE
-    v_count INTEGER;
-BEGIN
-    SELECT COUNT(*) INTO v_count FROM inventory WHERE ...;
-    RETURN v_count;
-END;
-$$ LANGUAGE plpgsql;
-
-✅ CORRECT - For SETOF with table columns:
-CREATE FUNCTION rewards_report(min_purchases SMALLINT, min_amount NUMERIC)
-RETURNS TABLE(
-    customer_id SMALLINT,
-    store_id SMALLINT,
-    first_name VARCHAR,
-    last_name VARCHAR,
-    email VARCHAR
-) AS $$
-BEGIN
-    RETURN QUERY SELECT c.customer_id, c.store_id, ... FROM customer c WHERE ...;
-END;
-$$ LANGUAGE plpgsql;
-
-### Other Rules:
-1. Use CREATE OR REPLACE FUNCTION
-2. Use $$ delimiters
-3. DECLARE section before BEGIN
-4. Table names are SINGULAR: payment, rental, customer, inventory
-
-Return ONLY the PostgreSQL code, no explanations or markdown."""
-
         # Use invoke_with_retry for automatic API key rotation on rate limits
-        response = self.invoke_with_retry([HumanMessage(content=prompt)])
-        pg_code = self.extract_text_content(response).strip()
-        
-        # Clean up any markdown code blocks
-        if pg_code.startswith("```"):
-            lines = pg_code.split("\n")
-            pg_code = "\n".join(lines[1:-1] if lines[-1] == "```" else lines[1:])
+        messages = self._procedure_messages(proc)
+        response = self.invoke_with_retry(messages)
+        pg_code = _strip_fence(self.extract_text_content(response))
+        if not pg_code:
+            self.discard_cached(messages)
         
         return pg_code, f"Converted {proc.type} to PL/pgSQL function"
     
+    def _convert_procedure_batch(self, procs: list) -> list[tuple[str, str]]:
+        """Convert several procedures with one LLM call.
+        
+        Cached procedures are not resent. Any procedure missing from the batch
+        response is converted on its own.
+        """
+        if len(procs) == 1:
+            return [self._convert_procedure(procs[0])]
+        
+        # Procedures answered by the response cache on their own are left out of the batch
+        pending = [proc for proc in procs if self._load_cached(self._procedure_messages(proc))[1] is None]
+        
+        batched = self._request_batch_conversion(pending) if len(pending) > 1 else {}
+        return [batched.get(id(proc)) or self._convert_procedure(proc) for proc in procs]
+    
+    def _request_batch_conversion(self, procs: list) -> dict[int, tuple[str, str]]:
+        """Ask the LLM to convert several procedures, keyed by id(proc).
+        
+        Returns an empty dict if the request fails or the response isn't valid JSON.
+        """
+        sections = "\n\n".join(
+            f"===PROC {i}===\n{self._describe_procedure(proc)}" for i, proc in enumerate(procs, 1)
+        )
+        
+        messages = [
+            self._cacheable_message(PROCEDURE_CONVERSION_RULES),
+            HumanMessage(content=f"{BATCH_OUTPUT_FORMAT}\n\n{sections}"),
+        ]
+        try:
+            response = self.invoke_with_retry(messages)
+            text = self.extract_text_content(response)
+            items = json.loads(text[text.index("["):text.rindex("]") + 1])
+        except Exception as e:
+            self.discard_cached(messages)
+            self.log(f"Batch conversion of {len(procs)} routines failed: {str(e)[:100]}", "warning")
+            return {}
+        
+        converted = {}
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            index = item.get("index")
+            pg_code = str(item.get("pg_code") or "").strip()
+            if isinstance(index, int) and 1 <= index <= len(procs) and pg_code:
+                proc = procs[index - 1]
+                notes = item.get("notes") or f"Converted {proc.type} to PL/pgSQL function"
+                converted[id(proc)] = (pg_code, str(notes))
+        return converted
+    
+    def _procedure_messages(self, proc) -> list[HumanMessage]:
+        """Build the single-procedure conversion request."""
+        return [
+            self._cacheable_message(PROCEDURE_CONVERSION_RULES),
+            HumanMessage(content=f"{PROCEDURE_REQUEST}\n\n{self._describe_procedure(proc)}"),
+        ]
+    
     def _convert_trigger(self, trigger) -> tuple[str, str]:
         """Convert a MySQL trigger to PostgreSQL."""
-        prompt = f"""Convert this MySQL trigger to PostgreSQL:
+        prompt = f"""{TRIGGER_REQUEST}
 
-Trigger: {trigger.name}
-Table: {trigger.table_name}
-Timing: {trigger.timing}
-Event: {trigger.event}
-Body:
+## Trigger: {trigger.name}
+## Table: {trigger.table_name}
+## Timing: {trigger.timing}
+## Event: {trigger.event}
+## Body:
 ```sql
 {trigger.source_code}
-```
-
-Requirements:
-1. Create a trigger function first
-2. Then create the trigger that calls this function
-3. PostgreSQL triggers return TRIGGER type
-4. Use NEW/OLD records appropriately
-
-Return ONLY the PostgreSQL code (function + trigger), no explanations."""
+```"""
 
         # Use invoke_with_retry for automatic API key rotation on rate limits
-        response = self.invoke_with_retry([HumanMessage(content=prompt)])
-        pg_code = self.extract_text_content(response).strip()
-        
-        if pg_code.startswith("```"):
-            lines = pg_code.split("\n")
-            pg_code = "\n".join(lines[1:-1] if lines[-1] == "```" else lines[1:])
+        messages = [self._cacheable_message(TRIGGER_CONVERSION_RULES), HumanMessage(content=prompt)]
+        response = self.invoke_with_retry(messages)
+        pg_code = _strip_fence(self.extract_text_content(response))
+        if not pg_code:
+            self.discard_cached(messages)
         
         return pg_code, f"Converted trigger to PL/pgSQL"
     
-    def _generate_fallback(self, proc) -> str:
-        """Generate fallback function template."""
-        params = ", ".join([
-            f"{p.get('name', 'param')} {p.get('type', 'TEXT')}"
-            for p in proc.parameters
-        ]) if proc.parameters else ""
-        
-        return f"""-- TODO: Manual conversion required
-CREATE OR REPLACE FUNCTION {proc.name}({params})
-RETURNS {proc.return_type or 'void'}
-LANGUAGE plpgsql
-AS $$
-BEGIN
-    -- Original MySQL code:
-    -- {proc.source_code[:200]}...
-    RAISE NOTICE 'Function {proc.name} needs manual conversion';
-END;
-$$;
-"""
+    @staticmethod
+    def _describe_procedure(proc) -> str:
+        """Render a procedure's variable fields, placed after all static prompt text."""
+        parameters = json.dumps(proc.parameters, sort_keys=True, default=str)
+        return f"""## Type: {proc.type}
+## Source:
+```sql
+{proc.source_code}
+```
+## Params: {parameters}
+## Return: {proc.return_type or 'void'}"""
     
-    def _generate_trigger_fallback(self, trigger) -> str:
-        """Generate fallback trigger template."""
-        return f"""-- TODO: Manual conversion required
-CREATE OR REPLACE FUNCTION {trigger.name}_func()
-RETURNS TRIGGER
-LANGUAGE plpgsql
-AS $$
-BEGIN
-    -- Original trigger code needs manual conversion
-    RETURN NEW;
-END;
-$$;
-
-CREATE TRIGGER {trigger.name}
-    {trigger.timing} {trigger.event} ON "{trigger.table_name}"
-    FOR EACH ROW
-    EXECUTE FUNCTION {trigger.name}_func();
-"""
+    def _cacheable_message(self, content: str) -> HumanMessage:
+        """Wrap a static instruction block as a message marked for prompt caching.
+        
+        The block must be byte-identical across calls. Providers with automatic
+        prefix caching (Groq, OpenAI) reuse it because it precedes the per-object
+        message; ``cache_control`` marks it explicitly for providers that need it.
+        """
+        return HumanMessage(content=content, additional_kwargs={"cache_control": {"type": "ephemeral"}})
 
 
 def logic_node(state: dict) -> dict:
@@ -403,7 +508,7 @@ def logic_node(state: dict) -> dict:
     agent = LogicAgent()
     
     if isinstance(state, dict):
-        migration_state = MigrationState(**state)
+        migration_state = MigrationState.model_validate(state)
     else:
         migration_state = state
     
@@ -3,17 +3,62 @@ Production Deploy Agent - Deploys validated schema and data from sandbox to prod
 Only runs after successful sandbox validation (Phase 2 of migration).
 """
 
+import re
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-
-from sqlalchemy import create_engine, text
-from sqlalchemy.engine import Engine
+from typing import TYPE_CHECKING
 
 from src.agents.base_agent import BaseAgent
 from src.state import MigrationState, MigrationPhase, MigrationStatus
 from src.tools.artifact_manager import get_artifact_manager
 from src.config import get_settings
 
+if TYPE_CHECKING:
+    from sqlalchemy.engine import Engine
+
+
+# Tokens that can contain semicolons, plus the statement separator itself
+_SQL_TOKEN_RE = re.compile(
+    r"""
+    '(?:[^']|'')*'                                  # string literal
+    | "(?:[^"]|"")*"                                # quoted identifier
+    | --[^\n]*                                      # line comment
+    | /\*.*?\*/                                     # block comment
+    | \$(?P<tag>(?:[A-Za-z_]\w*)?)\$.*?\$(?P=tag)\$  # dollar-quoted body
+    | ;
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+
+# Opening of an index column list, where the GIST access method is inserted
+_GIST_RE = re.compile(r'\("')
+
+# Table an index or trigger is created ON, or an ALTER TABLE targets
+# (last match skips function bodies)
+_TARGET_TABLE_RE = re.compile(r'\b(?:ON|ALTER\s+TABLE(?:\s+ONLY)?)\s+("[^"]+"|[\w.]+)', re.IGNORECASE)
+
+# FK constraint added by ALTER TABLE, to be added NOT VALID and validated later
+_ADD_FK_RE = re.compile(
+    r'\AALTER\s+TABLE\s+(?:ONLY\s+)?(?P<table>"[^"]+"|[\w.]+)\s+'
+    r'ADD\s+CONSTRAINT\s+(?P<name>"[^"]+"|\w+)\s+FOREIGN\s+KEY\b',
+    re.IGNORECASE,
+)
+
+
+# SQLSTATEs meaning the object is already there: duplicate_table (also indexes),
+# duplicate_object (constraints, triggers), duplicate_schema, duplicate_function
+_ALREADY_EXISTS_STATES = frozenset({"42P07", "42710", "42P06", "42723"})
+
+# undefined_object, raised for "data type point has no default operator class"
+_UNDEFINED_OBJECT = "42704"
+
+
+def _sqlstate(error: Exception) -> str | None:
+    """Return the PostgreSQL SQLSTATE of a DBAPI error wrapped by SQLAlchemy, if any."""
+    orig = getattr(error, "orig", None)
+    return getattr(orig, "pgcode", None) or getattr(orig, "sqlstate", None)
+
 
 class ProductionDeployAgent(BaseAgent):
     """
@@ -42,25 +87,35 @@ class ProductionDeployAgent(BaseAgent):
         settings = get_settings()
         
         # Source: MySQL (for data)
-        self._source_engine: Engine | None = None
+        self._source_engine: "Engine | None" = None
         self.source_conn_str = settings.db.source_connection_string
         
         # Target: Production PostgreSQL
-        self._target_engine: Engine | None = None
+        self._target_engine: "Engine | None" = None
         self.target_conn_str = settings.db.target_connection_string
         
         self.batch_size = 1000
+        self.max_workers = max(1, settings.db.deploy_parallelism)  # Connections deploying indexes/triggers concurrently
+        self.maintenance_work_mem = "256MB"  # Per deploy connection, for index builds
     
     @property
-    def source_engine(self) -> Engine:
+    def source_engine(self) -> "Engine":
         if self._source_engine is None:
+            from sqlalchemy import create_engine  # Deferred: sqlalchemy is slow to import
             self._source_engine = create_engine(self.source_conn_str)
         return self._source_engine
     
     @property
-    def target_engine(self) -> Engine:
+    def target_engine(self) -> "Engine":
         if self._target_engine is None:
-            self._target_engine = create_engine(self.target_conn_str)
+            from sqlalchemy import create_engine
+            self._target_engine = create_engine(
+                self.target_conn_str,
+                pool_size=self.max_workers,
+                max_overflow=0,
+                pool_pre_ping=True,  # The first connection idles through the data load
+                pool_recycle=3600,
+            )
         return self._target_engine
     
     def run(self, state: MigrationState) -> MigrationState:
@@ -78,23 +133,33 @@ class ProductionDeployAgent(BaseAgent):
             return state
         
         try:
-            # Phase 1: Deploy schema to production
-            self.log("📋 Phase 1: Deploying schema to production...")
-            schema_result = self._deploy_schema(state)
+            # Phase 1: Deploy tables to production
+            self.log("📋 Phase 1: Deploying tables to production...")
+            schema_result = self._deploy_schema(state, stage="tables")
             
             if not schema_result["success"]:
                 raise Exception(f"Schema deployment failed: {schema_result['error']}")
             
             self.log(f"  ✓ Deployed {schema_result['objects_deployed']} objects")
             
-            # Phase 2: Migrate data to production
+            # Phase 2: Migrate data to production (COPY into tables without secondary indexes)
             self.log("📦 Phase 2: Migrating data to production...")
             data_result = self._deploy_data(state)
             
             self.log(f"  ✓ Migrated {data_result['total_rows']:,} rows in {data_result['tables_migrated']} tables")
             
-            # Phase 3: Final validation
-            self.log("✅ Phase 3: Validating deployment...")
+            # Phase 3: Build indexes, FKs and dependent objects over the loaded data
+            self.log("🔗 Phase 3: Deploying indexes, constraints and dependent objects...")
+            self._prewarm_pool()
+            dependents_result = self._deploy_schema(state, stage="dependents")
+            
+            if not dependents_result["success"]:
+                raise Exception(f"Schema deployment failed: {dependents_result['error']}")
+            
+            self.log(f"  ✓ Deployed {dependents_result['objects_deployed']} objects")
+            
+            # Phase 4: Final validation
+            self.log("✅ Phase 4: Validating deployment...")
             validation_result = self._validate_deployment(state)
             
             passed = len([r for r in validation_result if r["match"]])
@@ -110,6 +175,7 @@ class ProductionDeployAgent(BaseAgent):
             deployment_summary = {
                 "status": "success" if passed == total else "partial",
                 "schema_deployed": schema_result,
+                "dependents_deployed": dependents_result,
                 "data_deployed": data_result,
                 "validation": validation_result,
             }
@@ -131,8 +197,13 @@ class ProductionDeployAgent(BaseAgent):
         
         return state
     
-    def _deploy_schema(self, state: MigrationState) -> dict:
-        """Apply DDL to production target using state (like SandboxAgent)."""
+    def _deploy_schema(self, state: MigrationState, stage: str) -> dict:
+        """Apply DDL to production target using state (like SandboxAgent).
+        
+        stage="tables" resets the target and creates tables before the data load;
+        stage="dependents" creates indexes, FKs, views, triggers and procedures
+        afterwards, so bulk loading doesn't maintain indexes or fire triggers.
+        """
         result = {
             "success": False,
             "objects_deployed": 0,
@@ -141,137 +212,231 @@ class ProductionDeployAgent(BaseAgent):
         }
         
         try:
-            # Optional: Reset production (clean deploy)
-            # Uncomment the lines below to reset production before deploy
-            self.log("  Resetting production target...")
-            self._reset_target()
-            
-            # Separate DDL by type (same approach as SandboxAgent)
-            tables = [d for d in state.transformed_ddl if d.object_type == "table"]
-            indexes = [d for d in state.transformed_ddl if d.object_type == "index"]
-            views = [d for d in state.transformed_ddl if d.object_type == "view"]
-            constraints = [d for d in state.transformed_ddl if d.object_type == "constraint"]
-            triggers = [d for d in state.transformed_ddl if d.object_type == "trigger"]
+            # Separate DDL by type in a single pass
+            by_type = {"table": [], "index": [], "view": [], "constraint": [], "trigger": []}
+            for ddl in state.transformed_ddl:
+                bucket = by_type.get(ddl.object_type)
+                if bucket is not None:
+                    bucket.append(ddl)
+            tables, indexes, views, constraints, triggers = by_type.values()
             
-            self.log(f"  Found: {len(tables)} tables, {len(indexes)} indexes, {len(views)} views, {len(constraints)} FKs, {len(triggers)} triggers")
-            
-            # 1. Deploy tables first
-            self.log(f"  Deploying {len(tables)} tables...")
-            for ddl in tables:
-                try:
-                    with self.target_engine.connect() as conn:
-                        conn.execute(text(ddl.target_ddl))
-                        conn.commit()
-                        result["objects_deployed"] += 1
-                except Exception as e:
-                    if "already exists" not in str(e).lower():
-                        result["errors"].append(f"table:{ddl.object_name}: {str(e)[:80]}")
+            # Each category runs in one transaction on one connection; see _deploy_category.
+            if stage == "tables":
+                # Optional: Reset production (clean deploy)
+                # Uncomment the lines below to reset production before deploy
+                self.log("  Resetting production target...")
+                self._reset_target()
+                
+                self.log(f"  Found: {len(tables)} tables, {len(indexes)} indexes, {len(views)} views, {len(constraints)} FKs, {len(triggers)} triggers")
+                
+                # 1. Deploy tables first
+                self.log(f"  Deploying {len(tables)} tables...")
+                self._deploy_category(result, [(f"table:{d.object_name}", d.target_ddl) for d in tables])
+                
+                if result["objects_deployed"] == 0:
+                    result["error"] = "No DDL found in state.transformed_ddl"
+                    return result
+                return self._finish_stage(result)
             
             # 2. Deploy indexes after tables
             # Note: indexes may be stored as ONE object with concatenated DDL
-            total_indexes = 0
-            for ddl in indexes:
-                # Split by semicolon to get individual statements
-                for stmt in ddl.target_ddl.split(";"):
-                    stmt = stmt.strip()
-                    if stmt and not stmt.startswith("--"):
-                        total_indexes += 1
-                        try:
-                            with self.target_engine.connect() as conn:
-                                conn.execute(text(stmt))
-                                conn.commit()
-                                result["objects_deployed"] += 1
-                        except Exception as e:
-                            error_str = str(e).lower()
-                            if "already exists" in error_str:
-                                pass  # Skip - already exists
-                            elif "no default operator class" in error_str or "point" in error_str:
-                                # POINT type needs GIST index, not B-tree
-                                # Retry with GIST access method
-                                # Syntax: CREATE INDEX "name" ON "table" USING GIST ("column")
-                                import re
-                                try:
-                                    # Insert USING GIST before the column list (before the opening parenthesis)
-                                    gist_stmt = re.sub(r'\)\s*$', ')', re.sub(r'\("', 'USING GIST ("', stmt, count=1))
-                                    with self.target_engine.connect() as gist_conn:
-                                        gist_conn.execute(text(gist_stmt))
-                                        gist_conn.commit()
-                                        result["objects_deployed"] += 1
-                                        self.log(f"    Fixed POINT index with GIST method")
-                                except Exception as gist_e:
-                                    result["errors"].append(f"index(gist): {str(gist_e)[:80]}")
-                            else:
-                                result["errors"].append(f"index: {str(e)[:80]}")
-            self.log(f"  Deployed {total_indexes} index statements")
+            index_stmts = [("index", stmt) for d in indexes for stmt in self._split_statements(d.target_ddl)]
+            self._deploy_parallel(result, index_stmts, gist_fallback=True)
+            self.log(f"  Deployed {len(index_stmts)} index statements")
             
             # 3. Deploy deferred FK constraints
             # Note: FKs may also be stored as ONE object with concatenated DDL
-            total_fks = 0
-            for ddl in constraints:
-                # Split by semicolon to get individual statements
-                for stmt in ddl.target_ddl.split(";"):
-                    stmt = stmt.strip()
-                    if stmt and not stmt.startswith("--"):
-                        total_fks += 1
-                        try:
-                            with self.target_engine.connect() as conn:
-                                conn.execute(text(stmt))
-                                conn.commit()
-                                result["objects_deployed"] += 1
-                        except Exception as e:
-                            if "already exists" not in str(e).lower():
-                                result["errors"].append(f"fk: {str(e)[:80]}")
-            self.log(f"  Deployed {total_fks} FK constraint statements")
+            # FKs are added NOT VALID (no table scan, brief lock) and validated afterwards;
+            # VALIDATE only takes SHARE UPDATE EXCLUSIVE, so tables validate in parallel.
+            fk_stmts, validate_stmts = [], []
+            for d in constraints:
+                for stmt in self._split_statements(d.target_ddl):
+                    stmt, validate = self._add_fk_not_valid(stmt)
+                    fk_stmts.append(("fk", stmt))
+                    if validate:
+                        validate_stmts.append(("fk(validate)", validate))
+            self._deploy_category(result, fk_stmts)
+            
+            validation = {"objects_deployed": 0, "errors": []}
+            self._deploy_parallel(validation, validate_stmts)
+            result["errors"].extend(validation["errors"])
+            self.log(f"  Deployed {len(fk_stmts)} FK constraint statements ({validation['objects_deployed']} validated)")
             
             # 4. Deploy views
             self.log(f"  Deploying {len(views)} views...")
-            for ddl in views:
-                try:
-                    with self.target_engine.connect() as conn:
-                        conn.execute(text(ddl.target_ddl))
-                        conn.commit()
-                        result["objects_deployed"] += 1
-                except Exception as e:
-                    if "already exists" not in str(e).lower():
-                        result["errors"].append(f"view:{ddl.object_name}: {str(e)[:80]}")
+            self._deploy_category(result, [(f"view:{d.object_name}", d.target_ddl) for d in views])
             
             # 5. Deploy triggers (MISSING FROM OLD CODE!)
             self.log(f"  Deploying {len(triggers)} triggers...")
-            for ddl in triggers:
-                try:
-                    with self.target_engine.connect() as conn:
-                        conn.execute(text(ddl.target_ddl))
-                        conn.commit()
-                        result["objects_deployed"] += 1
-                except Exception as e:
-                    if "already exists" not in str(e).lower():
-                        result["errors"].append(f"trigger:{ddl.object_name}: {str(e)[:80]}")
+            self._deploy_parallel(result, [(f"trigger:{d.object_name}", d.target_ddl) for d in triggers])
             
             # 6. Deploy procedures/functions
             self.log(f"  Deploying {len(state.converted_procedures)} procedures/functions...")
-            for proc in state.converted_procedures:
-                try:
-                    with self.target_engine.connect() as conn:
-                        conn.execute(text(proc.target_code))
-                        conn.commit()
-                        result["objects_deployed"] += 1
-                except Exception as e:
-                    if "already exists" not in str(e).lower():
-                        result["errors"].append(f"proc:{proc.name}: {str(e)[:80]}")
+            self._deploy_category(
+                result, [(f"proc:{p.name}", p.target_code) for p in state.converted_procedures]
+            )
             
-            # Determine success
-            if result["objects_deployed"] == 0:
-                result["error"] = "No DDL found in state.transformed_ddl"
-            elif len(result["errors"]) > 0:
-                result["error"] = f"{len(result['errors'])} errors during deployment: {result['errors'][:3]}"
-            else:
-                result["success"] = True
+            return self._finish_stage(result)
             
         except Exception as e:
             result["error"] = str(e)
         
         return result
     
+    @staticmethod
+    def _finish_stage(result: dict) -> dict:
+        """Determine success of a deployment stage from its errors."""
+        if len(result["errors"]) > 0:
+            result["error"] = f"{len(result['errors'])} errors during deployment: {result['errors'][:3]}"
+        else:
+            result["success"] = True
+        return result
+    
+    def _prewarm_pool(self):
+        """Open the target pool's connections concurrently before the parallel stages.
+        
+        Handshakes then overlap instead of each deploy worker paying one as it starts.
+        """
+        if self.max_workers <= 1:
+            return
+        
+        engine = self.target_engine
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(engine.connect) for _ in range(self.max_workers)]
+        
+        # Close only after all are open, so each checkout got its own connection
+        connections = []
+        for future in futures:
+            try:
+                connections.append(future.result())
+            except Exception as e:
+                self.log(f"  Could not prewarm target connection: {str(e)[:80]}", "warning")
+        for conn in connections:
+            conn.close()
+    
+    def _deploy_category(self, result: dict, statements: list[tuple[str, str]], gist_fallback: bool = False):
+        """Deploy one category of (label, statement) pairs in a single transaction.
+        
+        Each statement runs in its own SAVEPOINT, so a failure only rolls back that
+        statement and the rest of the category commits together at the end.
+        """
+        if not statements:
+            return
+        
+        with self.target_engine.begin() as conn:
+            # Send DDL to the driver as-is: with parameters (even none) psycopg2
+            # treats every % in a function body or LIKE pattern as a placeholder
+            conn.execution_options(no_parameters=True)
+            if conn.dialect.name == "postgresql":
+                # The deploy is re-runnable, so losing the last commits on a crash is fine
+                conn.exec_driver_sql("SET LOCAL synchronous_commit = off")
+                conn.exec_driver_sql(f"SET LOCAL maintenance_work_mem = '{self.maintenance_work_mem}'")
+            for label, stmt in statements:
+                try:
+                    with conn.begin_nested():
+                        conn.exec_driver_sql(stmt)
+                    result["objects_deployed"] += 1
+                except Exception as e:
+                    sqlstate = _sqlstate(e)
+                    if sqlstate is None:
+                        # Driver without SQLSTATEs: match the message instead
+                        error_str = str(e).lower()
+                        exists = "already exists" in error_str
+                        no_opclass = "no default operator class" in error_str or "point" in error_str
+                    else:
+                        exists = sqlstate in _ALREADY_EXISTS_STATES
+                        no_opclass = sqlstate == _UNDEFINED_OBJECT
+                    if exists:
+                        continue  # Skip - already exists
+                    if gist_fallback and no_opclass:
+                        # POINT type needs GIST index, not B-tree
+                        # Retry with GIST access method
+                        # Syntax: CREATE INDEX "name" ON "table" USING GIST ("column")
+                        # Insert USING GIST before the column list (before the opening parenthesis)
+                        gist_stmt = _GIST_RE.sub('USING GIST ("', stmt, count=1)
+                        try:
+                            with conn.begin_nested():
+                                conn.exec_driver_sql(gist_stmt)
+                            result["objects_deployed"] += 1
+                            self.log(f"    Fixed POINT index with GIST method")
+                        except Exception as gist_e:
+                            result["errors"].append(f"{label}(gist): {str(gist_e)[:80]}")
+                    else:
+                        result["errors"].append(f"{label}: {str(e)[:80]}")
+    
+    def _deploy_parallel(self, result: dict, statements: list[tuple[str, str]], gist_fallback: bool = False):
+        """Deploy single-table statements (indexes, triggers) across pooled connections.
+        
+        Each worker runs _deploy_category on its own share of the tables, so one
+        table's statements never wait on another worker's transaction. FKs lock
+        two tables each and stay serial.
+        """
+        groups = self._group_by_table(statements)
+        workers = min(self.max_workers, len(groups))
+        if workers <= 1:
+            self._deploy_category(result, statements, gist_fallback)
+            return
+        
+        shares: list[list[tuple[str, str]]] = [[] for _ in range(workers)]
+        for group in sorted(groups, key=len, reverse=True):
+            min(shares, key=len).extend(group)
+        
+        partials = [{"objects_deployed": 0, "errors": []} for _ in shares]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(
+                lambda partial, share: self._deploy_category(partial, share, gist_fallback), partials, shares
+            ))
+        
+        for partial in partials:
+            result["objects_deployed"] += partial["objects_deployed"]
+            result["errors"].extend(partial["errors"])
+    
+    @staticmethod
+    def _group_by_table(statements: list[tuple[str, str]]) -> list[list[tuple[str, str]]]:
+        """Group (label, statement) pairs by the table they create or alter, in order."""
+        groups: dict[str, list[tuple[str, str]]] = {}
+        for label, stmt in statements:
+            tables = _TARGET_TABLE_RE.findall(stmt)
+            key = tables[-1].strip('"').lower() if tables else stmt
+            groups.setdefault(key, []).append((label, stmt))
+        return list(groups.values())
+    
+    @staticmethod
+    def _add_fk_not_valid(stmt: str) -> tuple[str, str | None]:
+        """Rewrite an ADD FOREIGN KEY as NOT VALID; return it with its VALIDATE statement."""
+        match = _ADD_FK_RE.match(stmt)
+        if match is None or "NOT VALID" in stmt.upper():
+            return stmt, None
+        return (
+            f"{stmt} NOT VALID",
+            f"ALTER TABLE {match['table']} VALIDATE CONSTRAINT {match['name']}",
+        )
+    
+    @staticmethod
+    def _split_statements(sql: str) -> list[str]:
+        """Split concatenated DDL into individual statements with comments removed.
+        
+        Semicolons inside quotes, comments and dollar-quoted bodies don't split.
+        """
+        statements: list[str] = []
+        parts: list[str] = []
+        pos = 0
+        for match in _SQL_TOKEN_RE.finditer(sql):
+            token = match.group()
+            is_comment = token.startswith(("--", "/*"))
+            if token != ";" and not is_comment:
+                continue  # Quoted text is kept as-is
+            parts.append(sql[pos:match.start()])
+            pos = match.end()
+            if is_comment:
+                parts.append(" ")
+            else:
+                statements.append("".join(parts).strip())
+                parts = []
+        parts.append(sql[pos:])
+        statements.append("".join(parts).strip())
+        return [stmt for stmt in statements if stmt]
+    
     def _reset_target(self) -> dict:
         """Reset production target by dropping all objects (use with caution!)."""
         from src.tools.pg_executor import PostgreSQLExecutor
@@ -299,35 +464,55 @@ class ProductionDeployAgent(BaseAgent):
     
     def _validate_deployment(self, state: MigrationState) -> list[dict]:
         """Validate data in production target matches source."""
-        results = []
-        
         table_order = state.tables_migrated or []
+        if not table_order:
+            return []
+        
+        try:
+            source_counts = self._count_rows(self.source_engine, table_order)
+            target_counts = self._count_rows(self.target_engine, table_order)
+        except Exception:
+            # A missing table fails the whole query; count per table to isolate it
+            return [self._validate_table(table_name) for table_name in table_order]
         
-        for table_name in table_order:
-            result = {
+        return [
+            {
                 "table": table_name,
-                "source_count": 0,
-                "target_count": 0,
-                "match": False
+                "source_count": source_counts[table_name],
+                "target_count": target_counts[table_name],
+                "match": source_counts[table_name] == target_counts[table_name],
             }
-            
-            try:
-                with self.source_engine.connect() as conn:
-                    src = conn.execute(text(f"SELECT COUNT(*) FROM `{table_name}`"))
-                    result["source_count"] = src.scalar() or 0
-                
-                with self.target_engine.connect() as conn:
-                    tgt = conn.execute(text(f'SELECT COUNT(*) FROM "{table_name}"'))
-                    result["target_count"] = tgt.scalar() or 0
-                
-                result["match"] = result["source_count"] == result["target_count"]
-                
-            except Exception as e:
-                result["error"] = str(e)
-            
-            results.append(result)
+            for table_name in table_order
+        ]
+    
+    @staticmethod
+    def _count_rows(engine: "Engine", tables: list[str]) -> dict[str, int]:
+        """Count the rows of every table with a single UNION ALL query."""
+        quote = engine.dialect.identifier_preparer.quote_identifier
+        sql = " UNION ALL ".join(
+            f"SELECT {i} AS i, COUNT(*) AS c FROM {quote(table)}" for i, table in enumerate(tables)
+        )
+        with engine.connect() as conn:
+            conn.execution_options(no_parameters=True)  # Table names may contain %
+            return {tables[i]: count or 0 for i, count in conn.exec_driver_sql(sql)}
+    
+    def _validate_table(self, table_name: str) -> dict:
+        """Compare source and target row counts of one table."""
+        result = {
+            "table": table_name,
+            "source_count": 0,
+            "target_count": 0,
+            "match": False
+        }
         
-        return results
+        try:
+            result["source_count"] = self._count_rows(self.source_engine, [table_name])[table_name]
+            result["target_count"] = self._count_rows(self.target_engine, [table_name])[table_name]
+            result["match"] = result["source_count"] == result["target_count"]
+        except Exception as e:
+            result["error"] = str(e)
+        
+        return result
     
     def _close_connections(self):
         if self._source_engine:
@@ -341,7 +526,7 @@ def production_deploy_node(state: dict) -> dict:
     agent = ProductionDeployAgent()
     
     if isinstance(state, dict):
-        migration_state = MigrationState(**state)
+        migration_state = MigrationState.model_validate(state)
     else:
         migration_state = state
     
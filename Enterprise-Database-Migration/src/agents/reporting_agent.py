@@ -2,9 +2,9 @@
 Reporting Agent - Generates comprehensive final migration report.
 """
 
+import io
 import json
 from datetime import datetime
-from pathlib import Path
 
 from src.agents.base_agent import BaseAgent
 from src.state import MigrationState, MigrationPhase, MigrationStatus
@@ -32,13 +32,15 @@ migration reports that summarize the entire migration process."""
         self.log("Generating migration report...")
         
         try:
-            report = self._generate_report(state)
+            data_results = self._load_data_migration_results()
+            token_usage = self._load_token_usage()
+            report = self._generate_report(state, data_results, token_usage)
             
             # Save report
             artifact_path = self.artifact_manager.save_migration_report(report)
             
             # Also save as JSON summary
-            summary = self._generate_summary(state)
+            summary = self._generate_summary(state, data_results)
             self.artifact_manager.save_json(summary, "final_report.json")
             
             # Update state
@@ -62,30 +64,22 @@ migration reports that summarize the entire migration process."""
     def _load_data_migration_results(self) -> dict:
         """Load data migration results from artifact file."""
         try:
-            path = Path("./artifacts/data_migration_results.json")
-            if path.exists():
-                with open(path) as f:
-                    return json.load(f)
-        except Exception:
-            pass
-        return {}
+            with open("./artifacts/data_migration_results.json", "rb") as f:
+                return json.load(f)
+        except (OSError, ValueError):  # Missing, unreadable or not valid JSON
+            return {}
     
     def _load_token_usage(self) -> dict:
         """Load token usage from artifact file."""
         try:
-            path = Path("./artifacts/token_usage.json")
-            if path.exists():
-                with open(path) as f:
-                    return json.load(f)
-        except Exception:
-            pass
-        return {}
+            with open("./artifacts/token_usage.json", "rb") as f:
+                return json.load(f)
+        except (OSError, ValueError):  # Missing, unreadable or not valid JSON
+            return {}
     
-    def _generate_report(self, state: MigrationState) -> str:
+    def _generate_report(self, state: MigrationState, data_results: dict, token_usage: dict) -> str:
         """Generate markdown migration report."""
         schema = state.schema_metadata
-        data_results = self._load_data_migration_results()
-        token_usage = self._load_token_usage()
         
         # Calculate statistics
         tables_count = len(schema.tables) if schema else 0
@@ -96,17 +90,23 @@ migration reports that summarize the entire migration process."""
         tables_migrated = len(state.transformed_ddl) if state.transformed_ddl else 0
         procs_migrated = len(state.converted_procedures) if state.converted_procedures else 0
         
-        sandbox_passed = len([r for r in state.sandbox_results if r.executed]) if state.sandbox_results else 0
-        sandbox_total = len(state.sandbox_results) if state.sandbox_results else 0
+        # Partition results in one pass each; the sections below reuse the lists
+        passed_objects, failed_objects = [], []
+        for r in state.sandbox_results:
+            (passed_objects if r.executed else failed_objects).append(r)
+        sandbox_passed = len(passed_objects)
+        sandbox_total = sandbox_passed + len(failed_objects)
         
-        validation_passed = len([r for r in state.validation_results if r.status == "pass"]) if state.validation_results else 0
-        validation_total = len(state.validation_results) if state.validation_results else 0
+        failed_validations = [r for r in state.validation_results if r.status != "pass"]
+        validation_total = len(state.validation_results)
+        validation_passed = validation_total - len(failed_validations)
         
         # Data migration stats
         data_tables = data_results.get("tables_migrated", 0)
         data_rows = data_results.get("total_rows", 0)
         data_validation = data_results.get("validation", [])
-        data_passed = len([v for v in data_validation if v.get("match", False)])
+        data_passed = sum(1 for v in data_validation if v.get("match", False))
+        data_failed = len(data_validation) - data_passed
         
         duration = ""
         if state.completed_at and state.started_at:
@@ -116,11 +116,12 @@ migration reports that summarize the entire migration process."""
             duration = f"{minutes}m {seconds}s" if minutes > 0 else f"{seconds}s"
         
         # Overall status
-        overall_success = self._is_success(state) and data_passed == len(data_validation)
+        overall_success = self._is_success(state) and not data_failed
         status_emoji = "✅" if overall_success else "⚠️"
         status_text = "SUCCESS" if overall_success else "COMPLETED WITH ISSUES"
         
-        report = f"""# 📊 Database Migration Report
+        report = io.StringIO()
+        report.write(f"""# 📊 Database Migration Report
 
 > **Generated:** {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}  
 > **Duration:** {duration}  
@@ -150,55 +151,55 @@ This report documents the complete migration from **MySQL** to **PostgreSQL**.
 | Logic Conversion | {"✅ Complete" if procs_migrated > 0 else "⏭️ Skipped"} | {procs_migrated} procedures/functions |
 | Sandbox Testing | {"✅ Passed" if sandbox_passed == sandbox_total else "⚠️ Issues"} | {sandbox_passed}/{sandbox_total} tests passed |
 | Schema Validation | {"✅ Passed" if validation_passed == validation_total else "⚠️ Issues"} | {validation_passed}/{validation_total} checks |
-| Data Migration | {"✅ Complete" if data_passed == len(data_validation) else "⚠️ Issues"} | {data_rows:,} rows in {data_tables} tables |
-| Data Validation | {"✅ All Match" if data_passed == len(data_validation) else f"⚠️ {len(data_validation) - data_passed} mismatches"} | {data_passed}/{len(data_validation)} tables validated |
+| Data Migration | {"✅ Complete" if not data_failed else "⚠️ Issues"} | {data_rows:,} rows in {data_tables} tables |
+| Data Validation | {"✅ All Match" if not data_failed else f"⚠️ {data_failed} mismatches"} | {data_passed}/{len(data_validation)} tables validated |
 
 ---
 
 ## 🗄️ Schema Migration Details
 
 ### Tables Converted
-"""
+""")
         if state.transformed_ddl:
-            report += "\n| Table | Type | Status | Type Mappings |\n"
-            report += "|-------|------|--------|---------------|\n"
+            report.write("\n| Table | Type | Status | Type Mappings |\n")
+            report.write("|-------|------|--------|---------------|\n")
             for ddl in state.transformed_ddl:
                 status = "✅" if ddl.status == MigrationStatus.SUCCESS else "❌"
                 notes = ""
                 if ddl.type_mappings:
                     notes = "; ".join([f"{m.get('source','')}->{m.get('target','')}" for m in ddl.type_mappings[:3]])
-                report += f"| `{ddl.object_name}` | {ddl.object_type} | {status} | {notes[:50]} |\n"
+                report.write(f"| `{ddl.object_name}` | {ddl.object_type} | {status} | {notes[:50]} |\n")
         else:
-            report += "\n_No table transformation data recorded._\n"
+            report.write("\n_No table transformation data recorded._\n")
 
-        report += """
+        report.write("""
 ### Stored Procedures & Functions
-"""
+""")
         if state.converted_procedures:
-            report += "\n| Name | Type | Status | Notes |\n"
-            report += "|------|------|--------|-------|\n"
+            report.write("\n| Name | Type | Status | Notes |\n")
+            report.write("|------|------|--------|-------|\n")
             for proc in state.converted_procedures:
                 status = "✅" if proc.status == MigrationStatus.SUCCESS else "❌"
                 notes = proc.conversion_notes[:50] if proc.conversion_notes else "N/A"
-                report += f"| `{proc.name}` | {proc.procedure_type} | {status} | {notes} |\n"
+                report.write(f"| `{proc.name}` | {proc.procedure_type} | {status} | {notes} |\n")
         else:
-            report += "\n_No stored procedure conversion data recorded._\n"
+            report.write("\n_No stored procedure conversion data recorded._\n")
 
-        report += """
+        report.write("""
 
 ---
 
 ## 📦 Data Migration Details
 
-"""
+""")
         if data_results:
-            report += f"""**Target Database:** {data_results.get("target", "sandbox").upper()}
+            report.write(f"""**Target Database:** {data_results.get("target", "sandbox").upper()}
 
 ### Row Counts by Table
 
 | Table | Rows Migrated | Source | Target | Status |
 |-------|---------------|--------|--------|--------|
-"""
+""")
             migration_results = data_results.get("migration_results", [])
             validation_map = {v["table"]: v for v in data_validation}
             
@@ -210,108 +211,103 @@ This report documents the complete migration from **MySQL** to **PostgreSQL**.
                 tgt = val.get("target_count", 0)
                 match = val.get("match", False)
                 status = "✅" if match else "❌"
-                report += f"| `{table}` | {rows:,} | {src:,} | {tgt:,} | {status} |\n"
+                report.write(f"| `{table}` | {rows:,} | {src:,} | {tgt:,} | {status} |\n")
             
-            report += f"\n**Total Rows Migrated:** {data_rows:,}\n"
+            report.write(f"\n**Total Rows Migrated:** {data_rows:,}\n")
         else:
-            report += "_Data migration results not available._\n"
+            report.write("_Data migration results not available._\n")
 
-        report += """
+        report.write("""
 
 ---
 
 ## 🧪 Sandbox Testing Results
 
-"""
+""")
         if state.sandbox_results:
-            report += f"**Summary:** {sandbox_passed}/{sandbox_total} tests passed\n\n"
-            
-            # Group by object type
-            passed_objects = [r for r in state.sandbox_results if r.executed]
-            failed_objects = [r for r in state.sandbox_results if not r.executed]
+            report.write(f"**Summary:** {sandbox_passed}/{sandbox_total} tests passed\n\n")
             
             if failed_objects:
-                report += "### ❌ Failed Tests\n\n"
+                report.write("### ❌ Failed Tests\n\n")
                 for obj in failed_objects[:10]:
                     error_msg = obj.errors[0][:100] if obj.errors else 'Unknown error'
-                    report += f"- `{obj.object_name}` ({obj.object_type}): {error_msg}...\n"
+                    report.write(f"- `{obj.object_name}` ({obj.object_type}): {error_msg}...\n")
                 if len(failed_objects) > 10:
-                    report += f"- _...and {len(failed_objects) - 10} more_\n"
+                    report.write(f"- _...and {len(failed_objects) - 10} more_\n")
             
-            report += "\n### ✅ Passed Tests\n\n"
-            report += f"All {len(passed_objects)} objects executed successfully in sandbox.\n"
+            report.write("\n### ✅ Passed Tests\n\n")
+            report.write(f"All {len(passed_objects)} objects executed successfully in sandbox.\n")
         else:
-            report += "_No sandbox testing results available._\n"
+            report.write("_No sandbox testing results available._\n")
 
-        report += """
+        report.write("""
 
 ---
 
 ## ✅ Schema Validation Results
 
-"""
+""")
         if state.validation_results:
-            report += f"**Summary:** {validation_passed}/{validation_total} checks passed\n\n"
+            report.write(f"**Summary:** {validation_passed}/{validation_total} checks passed\n\n")
             
-            failed_validations = [r for r in state.validation_results if r.status != "pass"]
             if failed_validations:
-                report += "### Issues Found\n\n"
+                report.write("### Issues Found\n\n")
                 for val in failed_validations[:15]:
-                    report += f"- **{val.object_name}**: {val.details[:80] if val.details else 'Validation failed'}\n"
+                    report.write(f"- **{val.object_name}**: {val.details[:80] if val.details else 'Validation failed'}\n")
                 if len(failed_validations) > 15:
-                    report += f"- _...and {len(failed_validations) - 15} more_\n"
+                    report.write(f"- _...and {len(failed_validations) - 15} more_\n")
             else:
-                report += "✅ **All schema validation checks passed!**\n"
+                report.write("✅ **All schema validation checks passed!**\n")
         else:
-            report += "_No validation results available._\n"
+            report.write("_No validation results available._\n")
 
-        report += """
+        report.write("""
 
 ---
 
 ## 📈 Token Usage
 
-"""
+""")
         if token_usage:
             total_tokens = token_usage.get("total_tokens", 0)
             total_calls = token_usage.get("total_calls", 0)
             by_agent = token_usage.get("by_agent", {})
             by_model = token_usage.get("by_model", {})
             
-            report += f"**Total Tokens Used:** {total_tokens:,}\n"
-            report += f"**Total LLM Calls:** {total_calls}\n\n"
+            report.write(f"**Total Tokens Used:** {total_tokens:,}\n")
+            report.write(f"**Total LLM Calls:** {total_calls}\n\n")
             
             if by_agent:
-                report += "### Usage by Agent\n\n"
-                report += "| Agent | Tokens |\n|-------|--------|\n"
+                report.write("### Usage by Agent\n\n")
+                report.write("| Agent | Tokens |\n|-------|--------|\n")
                 for agent, tokens in sorted(by_agent.items(), key=lambda x: -x[1]):
-                    report += f"| {agent} | {tokens:,} |\n"
+                    report.write(f"| {agent} | {tokens:,} |\n")
             
             if by_model:
-                report += "\n### Usage by Model\n\n"
-                report += "| Model | Tokens |\n|-------|--------|\n"
+                report.write("\n### Usage by Model\n\n")
+                report.write("| Model | Tokens |\n|-------|--------|\n")
                 for model, tokens in sorted(by_model.items(), key=lambda x: -x[1]):
-                    report += f"| {model} | {tokens:,} |\n"
+                    report.write(f"| {model} | {tokens:,} |\n")
         else:
-            report += "_Token usage data not available._\n"
+            report.write("_Token usage data not available._\n")
 
-        report += """
+        report.write("""
 
 ---
 
 ## ⚠️ Errors & Warnings
 
-"""
+""")
         if state.errors:
-            report += "| Phase | Error |\n|-------|-------|\n"
+            report.write("| Phase | Error |\n|-------|-------|\n")
             for error in state.errors:
                 phase = str(error.get('phase', 'Unknown'))
                 msg = str(error.get('error_message', 'No message'))[:100]
-                report += f"| {phase} | {msg} |\n"
+                report.write(f"| {phase} | {msg} |\n")
         else:
-            report += "✅ **No errors reported during migration.**\n"
+            report.write("✅ **No errors reported during migration.**\n")
 
-        report += """
+        report.write("""
 
 ---
 
@@ -319,17 +315,17 @@ This report documents the complete migration from **MySQL** to **PostgreSQL**.
 
 | Artifact | Path |
 |----------|------|
-"""
+""")
         for name, path in state.artifact_paths.items():
-            report += f"| {name} | `{path}` |\n"
+            report.write(f"| {name} | `{path}` |\n")
         
-        report += """
+        report.write("""
 
 ---
 
 ## 📝 Recommendations
 
-"""
+""")
         recommendations = []
         
         if sandbox_total > 0 and sandbox_passed < sandbox_total:
@@ -338,8 +334,8 @@ This report documents the complete migration from **MySQL** to **PostgreSQL**.
         if validation_total > 0 and validation_passed < validation_total:
             recommendations.append(f"⚠️ **{validation_total - validation_passed} schema validation checks failed** - Investigate and resolve discrepancies")
         
-        if data_validation and data_passed < len(data_validation):
-            recommendations.append(f"⚠️ **{len(data_validation) - data_passed} tables have row count mismatches** - Verify data integrity")
+        if data_failed:
+            recommendations.append(f"⚠️ **{data_failed} tables have row count mismatches** - Verify data integrity")
         
         if not state.errors and sandbox_passed == sandbox_total and validation_passed == validation_total:
             recommendations.append("✅ Migration completed successfully with no issues!")
@@ -351,21 +347,19 @@ This report documents the complete migration from **MySQL** to **PostgreSQL**.
             recommendations.append(f"💰 Total LLM token usage: {token_usage.get('total_tokens', 0):,} tokens")
         
         for rec in recommendations:
-            report += f"- {rec}\n"
+            report.write(f"- {rec}\n")
         
-        report += """
+        report.write("""
 
 ---
 
 *Report generated by AI-Assisted Database Migration System*
-"""
+""")
         
-        return report
+        return report.getvalue()
     
-    def _generate_summary(self, state: MigrationState) -> dict:
+    def _generate_summary(self, state: MigrationState, data_results: dict) -> dict:
         """Generate JSON summary."""
-        data_results = self._load_data_migration_results()
-        
         return {
             "status": "success" if self._is_success(state) else "failed",
             "started_at": state.started_at.isoformat() if state.started_at else None,
@@ -3,11 +3,48 @@ Sandbox Agent - Tests DDL in isolated PostgreSQL sandbox before production.
 Executes DDL in proper dependency order to avoid FK constraint failures.
 """
 
+import re
+from concurrent.futures import ThreadPoolExecutor
+
 from src.agents.base_agent import BaseAgent
 from src.state import MigrationState, MigrationPhase, MigrationStatus, SandboxResult
 from src.tools.artifact_manager import get_artifact_manager
 from src.tools.pg_executor import SandboxExecutor
 
+_SAKILA_PREFIX = r'\bsakila\.(\w+)'
+_UNSIGNED = r' UNSIGNED| unsigned'
+_ENGINE_CLAUSE = r'(?i:\s*ENGINE\s*=\s*\w+)'
+_SAKILA_PREFIX_RE = re.compile(_SAKILA_PREFIX)
+_BACKTICK_TABLE = str.maketrans("`", '"')
+
+# One alternation per combination of the error-dependent fixes, keyed by
+# (strip_unsigned, strip_engine), so _attempt_fix rewrites the DDL in one scan
+_DDL_FIX_RES = {
+    (strip_unsigned, strip_engine): re.compile("|".join(
+        [_SAKILA_PREFIX]
+        + ([_UNSIGNED] if strip_unsigned else [])
+        + ([_ENGINE_CLAUSE] if strip_engine else [])
+    ))
+    for strip_unsigned in (False, True)
+    for strip_engine in (False, True)
+}
+
+# Known dependency order for Sakila, used when the dependency graph isn't available
+_PRIORITY_MAP = {name: i for i, name in enumerate([
+    # Level 0: No dependencies
+    "actor", "category", "country", "language", "film_text",
+    # Level 1: Depends on level 0
+    "city",
+    # Level 2: Depends on level 1
+    "address", "film",
+    # Level 3: Depends on level 2
+    "customer", "staff", "store", "film_actor", "film_category", "inventory",
+    # Level 4: Depends on level 3
+    "rental",
+    # Level 5: Depends on level 4
+    "payment",
+])}
+
 
 class SandboxAgent(BaseAgent):
     """
@@ -31,6 +68,7 @@ class SandboxAgent(BaseAgent):
         )
         self.artifact_manager = get_artifact_manager()
         self.executor = SandboxExecutor()
+        self.max_workers = 8  # Objects executed concurrently within a dependency level
     
     def run(self, state: MigrationState) -> MigrationState:
         """Test all DDL in sandbox with proper dependency ordering."""
@@ -59,22 +97,24 @@ class SandboxAgent(BaseAgent):
             # Sort tables by dependency order
             ordered_tables = self._sort_by_dependency(tables, dependency_order)
             
-            # 1. Execute tables first (in dependency order)
-            self.log(f"Executing {len(ordered_tables)} tables in dependency order...")
-            for ddl in ordered_tables:
-                result = self._execute_and_record(ddl, state, sandbox_results)
+            # 1. Execute tables first (in dependency order, each level concurrently)
+            levels = self._group_into_levels(ordered_tables, state)
+            self.log(f"Executing {len(ordered_tables)} tables in {len(levels)} dependency levels...")
+            for level in levels:
+                self._execute_level(level, state, sandbox_results)
             
-            # 2. Execute indexes AFTER all tables exist (but before FKs)
+            # 2. Execute indexes AFTER all tables exist (but before FKs); they don't depend on each other
             if indexes:
                 self.log(f"Executing {len(indexes)} index definitions...")
-                for ddl in indexes:
-                    result = self._execute_and_record(ddl, state, sandbox_results)
+                self._execute_level(indexes, state, sandbox_results, batched=True)
             
             # 3. Execute deferred FKs (circular dependencies) AFTER all tables exist
             if deferred_fks:
                 self.log(f"Executing {len(deferred_fks)} deferred FK constraints...")
-                for ddl in deferred_fks:
-                    result = self._execute_and_record(ddl, state, sandbox_results)
+                # One transaction for all of them; on failure each FK was already retried on its own
+                results = self.executor.execute_many_ddl([ddl.target_ddl for ddl in deferred_fks])
+                for ddl, result in zip(deferred_fks, results):
+                    self._execute_and_record(ddl, state, sandbox_results, result)
             
             # 4. Execute views (after all tables and FKs exist)
             self.log(f"Executing {len(views)} views...")
@@ -153,58 +193,98 @@ class SandboxAgent(BaseAgent):
         
         # Sort based on dependency order
         ordered = []
+        seen = set()
         for obj_id in dependency_order:
             # obj_id format is like "table:actor"
-            if ":" in obj_id:
-                obj_type, obj_name = obj_id.split(":", 1)
-                if obj_type == "table" and obj_name in ddl_by_name:
-                    ordered.append(ddl_by_name.pop(obj_name))
+            obj_type, sep, obj_name = obj_id.partition(":")
+            if not sep:
+                continue
+            if obj_type == "table" and obj_name in ddl_by_name and obj_name not in seen:
+                ordered.append(ddl_by_name[obj_name])
+                seen.add(obj_name)
         
         # Add any remaining tables (not in dependency order)
-        for ddl in ddl_by_name.values():
-            ordered.append(ddl)
+        ordered.extend(ddl for name, ddl in ddl_by_name.items() if name not in seen)
         
         return ordered
     
     def _simple_dependency_sort(self, tables: list) -> list:
         """Simple sort: tables without FK refs in DDL come first."""
-        # Define known dependency order for Sakila
-        # This is a fallback for when dependency graph isn't available
-        priority_order = [
-            # Level 0: No dependencies
-            "actor", "category", "country", "language", "film_text",
-            # Level 1: Depends on level 0
-            "city",
-            # Level 2: Depends on level 1
-            "address", "film",
-            # Level 3: Depends on level 2
-            "customer", "staff", "store", "film_actor", "film_category", "inventory",
-            # Level 4: Depends on level 3
-            "rental",
-            # Level 5: Depends on level 4
-            "payment",
-        ]
+        # Unknown tables go last
+        return sorted(tables, key=lambda ddl: _PRIORITY_MAP.get(ddl.object_name, 999))
+    
+    def _group_into_levels(self, tables: list, state: MigrationState) -> list[list]:
+        """Group dependency-ordered tables into levels that can be created concurrently.
+        
+        A table goes one level after the deepest table it references earlier in
+        the order, so its FK targets exist before its level starts. References to
+        later tables (deferred circular FKs) don't constrain it, as in the serial
+        order. Tables without FK metadata wait for every table before them.
+        """
+        references = {}
+        if state.schema_metadata:
+            references = {
+                table.name: {fk.get("referred_table") for fk in table.foreign_keys}
+                for table in state.schema_metadata.tables
+            }
+        
+        depth: dict[str, int] = {}
+        levels: list[list] = []
+        for ddl in tables:
+            refs = references.get(ddl.object_name)
+            if refs is None:
+                level = len(levels)
+            else:
+                level = max((depth[ref] + 1 for ref in refs if ref in depth), default=0)
+            depth[ddl.object_name] = level
+            if level == len(levels):
+                levels.append([])
+            levels[level].append(ddl)
         
-        def get_priority(ddl):
-            try:
-                return priority_order.index(ddl.object_name)
-            except ValueError:
-                return 999  # Unknown tables go last
+        return levels
+    
+    def _execute_level(self, level: list, state: MigrationState, sandbox_results: list, batched: bool = False):
+        """Execute independent DDL objects concurrently, recording results in order.
+        
+        By default each object runs as its own autocommitted statement: a CREATE
+        TABLE with inline FKs locks the tables it references, and holding those
+        locks for a whole batch would serialize (or deadlock) the workers. Objects
+        that fail are re-run serially, so their error (and any fix attempt) isn't
+        an artifact of running alongside the rest of the level.
+        
+        With batched=True (for statements that lock only their own table, like
+        indexes) the level is split into one contiguous batch per worker, each run
+        in a single transaction. A failed batch is already re-run statement by
+        statement by execute_many_ddl, so those results are recorded as they are.
+        """
+        if len(level) == 1:
+            self._execute_and_record(level[0], state, sandbox_results)
+            return
+        
+        workers = max(1, min(self.max_workers, len(level)))
+        statements = [ddl.target_ddl for ddl in level]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            if batched:
+                size = -(-len(level) // workers)
+                batches = [statements[i:i + size] for i in range(0, len(statements), size)]
+                results = [r for batch in executor.map(self.executor.execute_many_ddl, batches) for r in batch]
+            else:
+                results = list(executor.map(self.executor.execute_ddl, statements))
         
-        return sorted(tables, key=get_priority)
+        for ddl, result in zip(level, results):
+            self._execute_and_record(ddl, state, sandbox_results, result if batched or result["success"] else None)
     
     def _fix_view_schema_references(self, ddl: str) -> str:
         """Remove sakila. schema prefix from view definitions."""
         # Replace sakila.table_name with just table_name
-        import re
-        fixed = re.sub(r'\bsakila\.(\w+)', r'\1', ddl)
-        return fixed
+        return _SAKILA_PREFIX_RE.sub(r'\1', ddl)
     
-    def _execute_and_record(self, ddl, state, sandbox_results: list) -> dict:
-        """Execute DDL and record result."""
+    def _execute_and_record(self, ddl, state, sandbox_results: list, result: dict | None = None) -> dict:
+        """Execute DDL (unless its result is passed in) and record result."""
         self.log(f"Testing {ddl.object_type}: {ddl.object_name}")
         
-        result = self.executor.execute_ddl(ddl.target_ddl)
+        if result is None:
+            result = self.executor.execute_ddl(ddl.target_ddl)
         
         sandbox_result = SandboxResult(
             object_name=ddl.object_name,
@@ -247,30 +327,27 @@ class SandboxAgent(BaseAgent):
     
     def _attempt_fix(self, ddl: str, error: str) -> str:
         """Attempt to fix DDL based on error message."""
-        import re
         fixes_applied = []
-        fixed_ddl = ddl
+        error_lower = error.lower()
+        strip_unsigned = "unsigned" in error_lower or "UNSIGNED" in ddl
+        strip_engine = "engine" in error_lower or "ENGINE" in ddl
         
-        # Fix: Remove sakila. schema prefix
-        if "sakila." in fixed_ddl:
-            fixed_ddl = re.sub(r'\bsakila\.(\w+)', r'\1', fixed_ddl)
+        if "sakila." in ddl:
             fixes_applied.append("removed sakila. prefix")
-        
-        # Fix: Remove UNSIGNED if still present
-        if "unsigned" in error.lower() or "UNSIGNED" in ddl:
-            fixed_ddl = fixed_ddl.replace(" UNSIGNED", "").replace(" unsigned", "")
+        if strip_unsigned:
             fixes_applied.append("removed UNSIGNED")
-        
-        # Fix: Replace backticks with double quotes
-        if "`" in fixed_ddl:
-            fixed_ddl = fixed_ddl.replace("`", '"')
+        if "`" in ddl:
             fixes_applied.append("replaced backticks")
-        
-        # Fix: Remove ENGINE clause
-        if "engine" in error.lower() or "ENGINE" in ddl:
-            fixed_ddl = re.sub(r'\s*ENGINE\s*=\s*\w+', '', fixed_ddl, flags=re.IGNORECASE)
+        if strip_engine:
             fixes_applied.append("removed ENGINE")
         
+        # Backticks become double quotes first, then one pass strips sakila.
+        # prefixes (keeping the name) plus UNSIGNED and ENGINE clauses if enabled
+        fixed_ddl = ddl.translate(_BACKTICK_TABLE)
+        fixed_ddl = _DDL_FIX_RES[strip_unsigned, strip_engine].sub(
+            lambda m: m.group(1) or "", fixed_ddl
+        )
+        
         if fixes_applied:
             self.log(f"  Applied fixes: {', '.join(fixes_applied)}")
         
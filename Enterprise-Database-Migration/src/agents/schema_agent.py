@@ -301,7 +301,7 @@ class SchemaAgent(BaseAgent):
         try:
             blueprint_path = blueprints_dir / f"{table_name}.blueprint.json"
             if blueprint_path.exists():
-                with open(blueprint_path) as f:
+                with open(blueprint_path, encoding="utf-8") as f:
                     return json.load(f)
         except Exception as e:
             self.log(f"Could not load blueprint for {table_name}: {e}", "warning")
@@ -441,7 +441,7 @@ class SchemaAgent(BaseAgent):
         try:
             # Scan all blueprint files for ALL FKs (not just deferred)
             for blueprint_file in blueprints_dir.glob("*.blueprint.json"):
-                with open(blueprint_file) as f:
+                with open(blueprint_file, encoding="utf-8") as f:
                     blueprint = json.load(f)
                 
                 table_name = blueprint.get("table_name")
@@ -490,7 +490,7 @@ class SchemaAgent(BaseAgent):
         try:
             # Scan all blueprint files for ALL indexes
             for blueprint_file in blueprints_dir.glob("*.blueprint.json"):
-                with open(blueprint_file) as f:
+                with open(blueprint_file, encoding="utf-8") as f:
                     blueprint = json.load(f)
                 
                 table_name = blueprint.get("table_name")
@@ -43,6 +43,9 @@ class DatabaseConfig(BaseSettings):
     sandbox_db_user: str = "postgres"
     sandbox_db_password: str = "postgrespass"
     
+    # Connections deploying independent DDL (indexes, triggers, FK validation) at once
+    deploy_parallelism: int = 8
+    
     @property
     def source_connection_string(self) -> str:
         """Get SQLAlchemy connection string for source database."""
@@ -81,6 +84,11 @@ class LLMConfig(BaseSettings):
     temperature: float = 0.1
     max_tokens: int = 4096
     max_retries: int = 3
+    parallelism: int = 4  # Max concurrent LLM requests per agent
+    
+    # Response cache (0 disables expiry)
+    cache_enabled: bool = True
+    cache_ttl_seconds: int = 7 * 24 * 3600
 
 
 class AppConfig(BaseSettings):
@@ -4,6 +4,7 @@ Supports multiple Groq API keys for fallback during rate limiting.
 """
 
 import os
+import threading
 from typing import Optional
 
 
@@ -16,6 +17,8 @@ class APIKeyManager:
         self.keys: list[str] = []
         self.current_index: int = 0
         self.failed_keys: set[str] = set()
+        # Agents call the LLM from worker threads; rotation must be atomic
+        self._lock = threading.Lock()
         self._load_keys()
     
     def _load_keys(self):
@@ -43,34 +46,42 @@ class APIKeyManager:
             raise ValueError("No API keys available")
         return self.keys[self.current_index]
     
-    def rotate_key(self, reason: str = "rate_limited") -> bool:
+    def rotate_key(self, reason: str = "rate_limited", failed_key: str | None = None) -> bool:
         """
         Rotate to the next available API key.
-        Returns True if rotation succeeded, False if all keys exhausted.
+        Pass the key the failed request used as failed_key: if another thread
+        already rotated away from it, the current key is kept and nothing is
+        marked failed.
+        Returns True if a usable key is current, False if all keys exhausted.
         """
-        # Mark current key as failed
-        self.failed_keys.add(self.keys[self.current_index])
-        
-        # Try to find next working key
-        original_index = self.current_index
-        
-        for _ in range(len(self.keys)):
-            self.current_index = (self.current_index + 1) % len(self.keys)
-            
-            if self.keys[self.current_index] not in self.failed_keys:
-                print(f"🔄 Rotated to API key {self.current_index + 1}/{len(self.keys)} ({reason})")
+        with self._lock:
+            if failed_key is not None and failed_key != self.keys[self.current_index]:
                 return True
             
-            if self.current_index == original_index:
-                break
-        
-        print(f"⚠️ All {len(self.keys)} API keys exhausted!")
-        return False
+            # Mark current key as failed
+            self.failed_keys.add(self.keys[self.current_index])
+            
+            # Try to find next working key
+            original_index = self.current_index
+            
+            for _ in range(len(self.keys)):
+                self.current_index = (self.current_index + 1) % len(self.keys)
+                
+                if self.keys[self.current_index] not in self.failed_keys:
+                    print(f"🔄 Rotated to API key {self.current_index + 1}/{len(self.keys)} ({reason})")
+                    return True
+                
+                if self.current_index == original_index:
+                    break
+            
+            print(f"⚠️ All {len(self.keys)} API keys exhausted!")
+            return False
     
     def reset_failed_keys(self):
         """Reset the failed keys set (e.g., at start of new migration)."""
-        self.failed_keys.clear()
-        self.current_index = 0
+        with self._lock:
+            self.failed_keys.clear()
+            self.current_index = 0
     
     def get_key_status(self) -> dict:
         """Get status of all keys."""
@@ -84,13 +95,16 @@ class APIKeyManager:
 
 # Global singleton
 _key_manager: Optional[APIKeyManager] = None
+_key_manager_lock = threading.Lock()
 
 
 def get_api_key_manager() -> APIKeyManager:
     """Get or create the global API key manager."""
     global _key_manager
     if _key_manager is None:
-        _key_manager = APIKeyManager()
+        with _key_manager_lock:
+            if _key_manager is None:
+                _key_manager = APIKeyManager()
     return _key_manager
 
 
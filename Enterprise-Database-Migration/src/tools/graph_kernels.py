@@ -0,0 +1,80 @@
+"""
+Graph Kernels - Array-based graph algorithms used by the dependency analysis.
+Kept in their own module so Numba's on-disk cache (cache=True) is keyed to a
+stable file and survives across runs.
+"""
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    from numba import njit
+except ImportError:  # Optional: callers fall back to their pure-Python loops
+    njit = None
+
+
+def kahn_order(adjacency, offsets, in_degree):
+    """Kahn's algorithm over CSR int32 arrays, returning node indices in order.
+    
+    The dependents of node ``i`` are ``adjacency[offsets[i]:offsets[i + 1]]``.
+    The order array doubles as the FIFO queue. Nodes left in cycles are
+    appended at the end in index order. ``in_degree`` is consumed.
+    """
+    n = in_degree.shape[0]
+    order = np.empty(n, np.int32)
+    tail = 0
+    for i in range(n):
+        if in_degree[i] == 0:
+            order[tail] = i
+            tail += 1
+    
+    head = 0
+    while head < tail:
+        node = order[head]
+        head += 1
+        for k in range(offsets[node], offsets[node + 1]):
+            dependent = adjacency[k]
+            in_degree[dependent] -= 1
+            if in_degree[dependent] == 0:
+                order[tail] = dependent
+                tail += 1
+    
+    if tail < n:
+        queued = np.zeros(n, np.bool_)
+        for k in range(tail):
+            queued[order[k]] = True
+        for i in range(n):
+            if not queued[i]:
+                order[tail] = i
+                tail += 1
+    return order
+
+
+# Compiled eagerly at import for the one signature used, and cached to disk so
+# later processes skip compilation. Arguments must be writable int32 arrays.
+kahn_order_jit = None
+if njit is not None:
+    kahn_order_jit = njit(
+        "int32[:](int32[:], int32[:], int32[:])",
+        cache=True,
+        boundscheck=False,
+        error_model="numpy",
+    )(kahn_order)
+
+
+def kahn_order_compiled(adjacency, offsets, in_degree) -> list[int] | None:
+    """Run the compiled Kahn kernel on int sequences (e.g. ``array('i')``).
+    
+    Returns node indices in order, or None if Numba is not installed.
+    """
+    if kahn_order_jit is None:
+        return None
+    # Writable int32 copies to match the compiled signature
+    order = kahn_order_jit(
+        np.array(adjacency, dtype=np.int32),
+        np.array(offsets, dtype=np.int32),
+        np.array(in_degree, dtype=np.int32),
+    )
+    return order.tolist()
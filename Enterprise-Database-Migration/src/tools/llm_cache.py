@@ -0,0 +1,134 @@
+"""
+LLM Cache - Persistent response cache for LLM calls.
+Identical prompts (same model, parameters, messages and tools) return the stored
+response instead of hitting the API again.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+from src.config import get_settings
+
+
+def canonical_content(content: Any) -> Any:
+    """
+    Normalize message content for the cache key only (the request itself is sent unchanged).
+    Strips trailing whitespace and sorts keys of JSON bodies so equivalent requests share a key.
+    """
+    if not isinstance(content, str):
+        return content
+    normalized = content.rstrip()
+    if normalized[:1] in ("{", "["):
+        try:
+            normalized = json.dumps(json.loads(normalized), sort_keys=True, separators=(",", ":"))
+        except ValueError:
+            pass
+    return normalized
+
+
+class LLMCache:
+    """SQLite-backed cache of LLM responses keyed by a SHA256 of the request."""
+
+    def __init__(self, db_path: Path | None = None, ttl_seconds: int | None = None):
+        settings = get_settings()
+        self.db_path = db_path or settings.app.artifacts_dir / ".llm_cache.db"
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else settings.llm.cache_ttl_seconds
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                ttl REAL
+            )
+            """
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        system_prompt: str,
+        messages: list[tuple[str, Any]],
+        tool_schemas: list[dict] | None = None,
+    ) -> str:
+        """Build a deterministic cache key from the request parameters."""
+        payload = {
+            "model": model,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "system_prompt": system_prompt,
+            "messages": [(role, canonical_content(content)) for role, content in messages],
+            "tool_schemas": tool_schemas or [],
+        }
+        canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> dict | None:
+        """Get a cached response, or None if missing or expired."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at, ttl FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            response, created_at, ttl = row
+            if ttl is not None and time.time() - created_at > ttl:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+
+        return json.loads(response)
+
+    def set(self, key: str, response: dict):
+        """Store a response in the cache."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, response, created_at, ttl) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(response, default=str), time.time(), self.ttl_seconds or None),
+            )
+            self._conn.commit()
+
+    def delete(self, key: str):
+        """Remove one cached response."""
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def clear(self):
+        """Remove all cached responses."""
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+
+    def close(self):
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
+
+
+# Global singleton instance
+_llm_cache: LLMCache | None = None
+_llm_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> LLMCache:
+    """Get or create the global LLM cache instance."""
+    global _llm_cache
+    if _llm_cache is None:
+        with _llm_cache_lock:
+            if _llm_cache is None:
+                _llm_cache = LLMCache()
+    return _llm_cache
@@ -3,6 +3,7 @@ PostgreSQL Executor - Execute DDL and queries on PostgreSQL databases.
 Supports both target and sandbox databases.
 """
 
+import threading
 from typing import Any
 from contextlib import contextmanager
 
@@ -14,7 +15,11 @@ from src.config import get_settings
 
 
 class PostgreSQLExecutor:
-    """Executes SQL on PostgreSQL databases with transaction support."""
+    """
+    Executes SQL on PostgreSQL databases with transaction support.
+    Each call checks out its own pooled connection, so one executor can be
+    shared by several threads.
+    """
     
     def __init__(self, connection_string: str | None = None, use_sandbox: bool = False):
         settings = get_settings()
@@ -27,12 +32,15 @@ class PostgreSQLExecutor:
             self.connection_string = settings.db.target_connection_string
         
         self._engine: Engine | None = None
+        self._engine_lock = threading.Lock()
     
     @property
     def engine(self) -> Engine:
         """Get or create SQLAlchemy engine."""
         if self._engine is None:
-            self._engine = create_engine(self.connection_string)
+            with self._engine_lock:
+                if self._engine is None:
+                    self._engine = create_engine(self.connection_string)
         return self._engine
     
     def test_connection(self) -> bool:
@@ -81,6 +89,39 @@ class PostgreSQLExecutor:
         result["execution_time_ms"] = (time.time() - start_time) * 1000
         return result
     
+    def execute_many_ddl(self, statements: list[str]) -> list[dict[str, Any]]:
+        """
+        Execute independent DDL statements in one transaction on one connection.
+        If any statement fails, the transaction is rolled back and each statement
+        is run on its own with execute_ddl, so every result carries its own error.
+        
+        Locks are held until the commit: concurrent batches should only contain
+        statements that lock their own table (e.g. CREATE INDEX), not FK-bearing
+        DDL that also locks the referenced tables.
+        
+        Returns:
+            list of execute_ddl result dicts, one per statement
+        """
+        import time
+        
+        results = []
+        try:
+            with self.engine.connect() as conn:
+                for ddl in statements:
+                    start_time = time.time()
+                    conn.execute(text(ddl))
+                    results.append({
+                        "success": True,
+                        "message": "DDL executed successfully",
+                        "execution_time_ms": (time.time() - start_time) * 1000,
+                        "error": None,
+                    })
+                conn.commit()
+        except Exception:
+            return [self.execute_ddl(ddl) for ddl in statements]
+        
+        return results
+    
     def execute_query(self, query: str) -> dict[str, Any]:
         """
         Execute a query and return results.
@@ -0,0 +1,79 @@
+"""
+Table References - Finds which tables a view, trigger or routine body mentions.
+Matches are case-insensitive and must not be part of a longer identifier, so
+``film`` is not reported for SQL that only reads ``film_actor``.
+"""
+
+try:
+    import ahocorasick
+except ImportError:  # Optional: falls back to per-table substring scans
+    ahocorasick = None
+
+
+_UNDERSCORES = ("_", b"_")
+
+
+def _is_whole_word(text: str | bytes, start: int, end: int) -> bool:
+    """Check that text[start:end] is not part of a longer identifier."""
+    # One-character slices keep the str/bytes type (and are empty at the edges)
+    before = text[max(start - 1, 0):start]
+    after = text[end:end + 1]
+    return not (before.isalnum() or after.isalnum() or before in _UNDERSCORES or after in _UNDERSCORES)
+
+
+def _contains_word(text: str | bytes, word: str | bytes) -> bool:
+    """Check whether word occurs in text outside of a longer identifier."""
+    start = text.find(word)
+    while start != -1:
+        if _is_whole_word(text, start, start + len(word)):
+            return True
+        start = text.find(word, start + 1)
+    return False
+
+
+class TableReferenceFinder:
+    """Whole-word table name matcher, built once per schema and reused for every object."""
+
+    def __init__(self, table_names, use_automaton: bool = True):
+        # (name, lowered str, lowered ASCII bytes or None) per distinct table
+        self._names = [
+            (name, name.lower(), name.lower().encode("ascii") if name.isascii() else None)
+            for name in dict.fromkeys(table_names)
+        ]
+        self._automaton = None
+        if use_automaton and ahocorasick and self._names:
+            self._automaton = self._build_automaton()
+
+    def _build_automaton(self):
+        """Build an Aho-Corasick automaton over lowercased table names."""
+        automaton = ahocorasick.Automaton()
+        names_by_lower = {}
+        for name, lower, _ in self._names:
+            names_by_lower.setdefault(lower, []).append(name)
+        for lower, names in names_by_lower.items():
+            automaton.add_word(lower, (lower, tuple(names)))
+        automaton.make_automaton()
+        return automaton
+
+    def find(self, text: str | None) -> list[str]:
+        """Return the tables referenced in text, each reported once."""
+        if not text:
+            return []
+
+        if self._automaton is not None:
+            # One scan of the text; only hits get the boundary check
+            lowered = text.lower()
+            found: dict[str, None] = {}
+            for end, (lower, names) in self._automaton.iter(lowered):
+                if _is_whole_word(lowered, end - len(lower) + 1, end + 1):
+                    found.update(dict.fromkeys(names))
+            return list(found)
+
+        if text.isascii():
+            # Plain bytes search avoids the Unicode str path; non-ASCII names can't match
+            data = text.encode("ascii").lower()
+            return [name for name, _, lower_bytes in self._names
+                    if lower_bytes is not None and _contains_word(data, lower_bytes)]
+
+        lowered = text.lower()
+        return [name for name, lower, _ in self._names if _contains_word(lowered, lower)]
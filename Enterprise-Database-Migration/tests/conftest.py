@@ -7,6 +7,33 @@ import pytest
 from pathlib import Path
 
 
+class RecordingArtifactManager:
+    """Artifact manager stand-in that keeps saved artifacts in memory, keyed by file name."""
+
+    def __init__(self, artifacts_dir=Path("artifacts")):
+        self.artifacts_dir = artifacts_dir
+        self.saved = {}
+
+    def _save(self, filename, content):
+        self.saved[filename] = content
+        return self.artifacts_dir / filename
+
+    def save_sql(self, sql, filename, **kwargs):
+        return self._save(filename, sql)
+
+    def save_table_ddl(self, table_name, ddl):
+        return self._save(f"{table_name}.sql", ddl)
+
+    def save_procedure_sql(self, name, sql):
+        return self._save(f"{name}.sql", sql)
+
+    def save_json(self, data, filename):
+        return self._save(filename, data)
+
+    def save_migration_report(self, content):
+        return self._save("migration_report.md", content)
+
+
 @pytest.fixture(scope="session", autouse=True)
 def setup_test_environment():
     """Set up test environment variables."""
@@ -43,6 +70,29 @@ def artifacts_dir(tmp_path):
     return artifacts
 
 
+@pytest.fixture
+def artifact_manager(tmp_path):
+    """In-memory artifact manager rooted at a temporary directory."""
+    return RecordingArtifactManager(tmp_path)
+
+
+@pytest.fixture
+def make_agent(artifact_manager):
+    """Factory for agents built without __init__, so no LLM client or database is created."""
+    from src.config import get_settings
+
+    def make(agent_class, **attributes):
+        agent = agent_class.__new__(agent_class)
+        agent.name = agent_class.__name__
+        agent.llm_config = get_settings().llm
+        agent.artifact_manager = artifact_manager
+        for name, value in attributes.items():
+            setattr(agent, name, value)
+        return agent
+
+    return make
+
+
 @pytest.fixture
 def sample_table_metadata():
     """Sample table metadata for testing."""
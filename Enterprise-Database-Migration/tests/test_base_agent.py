@@ -0,0 +1,175 @@
+"""
+Unit tests for BaseAgent utilities.
+Tests logging and LLM plumbing without calling the Groq API.
+"""
+
+import io
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+from types import SimpleNamespace
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from src.agents import base_agent
+from src.agents.base_agent import BaseAgent
+from src.tools.api_key_manager import APIKeyManager
+from src.tools.llm_cache import LLMCache
+
+
+def make_key_manager(keys):
+    """Create a key manager over the given keys without reading the environment."""
+    manager = APIKeyManager.__new__(APIKeyManager)
+    manager.keys = list(keys)
+    manager.current_index = 0
+    manager.failed_keys = set()
+    manager._lock = threading.Lock()
+    return manager
+
+
+class TestLog:
+    """Tests for BaseAgent.log."""
+
+    def test_follows_redirected_stdout(self):
+        """Test that log lines go to the current sys.stdout, as the Streamlit app expects."""
+        agent = BaseAgent.__new__(BaseAgent)
+        agent.name = "Test Agent"
+        buffer = io.StringIO()
+
+        with redirect_stdout(buffer):
+            agent.log("hello %s", "info", "world")
+
+        assert buffer.getvalue() == "ℹ️ [Test Agent] hello world\n"
+
+
+
+def make_cached_agent(temperature=0.0):
+    """Create an agent with caching enabled and a fixed cache key."""
+    agent = BaseAgent.__new__(BaseAgent)
+    agent.name = "Test Agent"
+    agent.enable_cache = True
+    agent.llm_config = SimpleNamespace(temperature=temperature, max_retries=3)
+    agent._cache_key = lambda messages: "key"
+    return agent
+
+
+class TestCache:
+    """Tests for the LLM response cache lookups."""
+
+    def test_cache_read_errors_are_misses(self, monkeypatch):
+        """Test that a failing cache read is treated as a miss instead of failing the request."""
+        class BrokenCache:
+            def get(self, key):
+                raise OSError("database is locked")
+        monkeypatch.setattr(base_agent, "get_llm_cache", BrokenCache)
+
+        agent = make_cached_agent()
+
+        assert agent._load_cached([]) == ("key", None)
+
+    def test_sampled_responses_are_not_cached(self):
+        """Test that the cache is bypassed when the temperature is above 0."""
+        agent = make_cached_agent(temperature=0.1)
+
+        assert agent._load_cached([]) == (None, None)
+
+    def test_retries_skip_cached_response(self, monkeypatch):
+        """Test that only the first attempt may be answered from the cache."""
+        agent = make_cached_agent()
+        agent._create_llm = lambda: ("k1", None)
+        calls = []
+
+        def invoke(messages, llm, use_cache=True):
+            calls.append(use_cache)
+            if len(calls) == 1:
+                raise ValueError("bad response")
+            return "ok"
+        agent.invoke = invoke
+
+        assert agent.invoke_with_retry([]) == "ok"
+        assert calls == [True, False]
+
+    def test_request_is_sent_unchanged(self, monkeypatch):
+        """Test that message bodies reach the model as written, not in their cache-key form."""
+        monkeypatch.setattr(base_agent, "get_llm_cache", lambda: SimpleNamespace(get=lambda key: None, set=lambda key, value: None))
+        agent = make_cached_agent()
+        agent._system_message = SystemMessage(content="sys")
+        agent.system_prompt = "sys"
+        sent = []
+        llm = SimpleNamespace(invoke=lambda messages: sent.extend(messages) or AIMessage(content="ok"))
+
+        agent.invoke([HumanMessage(content='{"b": 1, "a": 2}\n')], llm)
+
+        assert sent[1].content == '{"b": 1, "a": 2}\n'
+
+    def test_discard_cached(self, monkeypatch, tmp_path):
+        """Test that a response failing validation is removed from the cache."""
+        cache = LLMCache(db_path=tmp_path / "cache.db", ttl_seconds=60)
+        cache.set("key", {"content": "not json"})
+        monkeypatch.setattr(base_agent, "get_llm_cache", lambda: cache)
+
+        make_cached_agent().discard_cached([])
+
+        assert cache.get("key") is None
+        cache.close()
+
+
+class TestLLMPool:
+    """Tests for sharing LLM instances per API key."""
+
+    def test_llm_with_tools_comes_from_pool(self, monkeypatch):
+        """Test that the tool-bound LLM is the pooled one for the current key, not a separate binding."""
+        monkeypatch.setattr(base_agent, "get_api_key_manager", lambda: make_key_manager(["k1"]))
+        agent = BaseAgent.__new__(BaseAgent)
+        agent.use_complex_model = False
+        agent.llm_config = SimpleNamespace(llm_model_fast="model")
+        agent._llm, agent._llm_with_tools = "custom", None
+        agent._llm_pool = {("k1", "model"): ("plain", "bound")}
+
+        assert agent.llm_with_tools == "bound"
+        assert agent.llm == "plain"
+
+
+class TestKeyRotation:
+    """Tests for rotating API keys from concurrent workers."""
+
+    def test_stale_failure_does_not_rotate_again(self):
+        """Test that a failure on a key another thread already rotated away from is ignored."""
+        manager = make_key_manager(["k1", "k2", "k3"])
+
+        assert manager.rotate_key("rate_limited", "k1")
+        assert manager.rotate_key("rate_limited", "k1")
+
+        assert manager.current_key == "k2"
+        assert manager.failed_keys == {"k1"}
+
+    def test_concurrent_rate_limits_rotate_once(self, monkeypatch):
+        """Test that workers rate limited on the same key rotate once and all retry on the next key."""
+        manager = make_key_manager(["k1", "k2", "k3"])
+        monkeypatch.setattr(base_agent, "get_api_key_manager", lambda: manager)
+
+        agent = BaseAgent.__new__(BaseAgent)
+        agent.name = "Test Agent"
+        agent.use_complex_model = False
+        agent.llm_config = SimpleNamespace(llm_model_fast="model", max_retries=3)
+        agent._llm_pool = {(key, "model"): (key, key) for key in manager.keys}
+        workers = 4
+        all_failed = threading.Barrier(workers)
+
+        def fake_invoke(messages, llm, use_cache=True):
+            if llm == "k1":
+                all_failed.wait()
+                raise Exception("Error code: 429 - rate limit exceeded")
+            return llm
+        agent.invoke = fake_invoke
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            used = list(pool.map(lambda _: agent.invoke_with_retry([]), range(workers)))
+
+        assert used == ["k2"] * workers
+        assert manager.failed_keys == {"k1"}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
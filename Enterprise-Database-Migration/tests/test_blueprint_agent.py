@@ -0,0 +1,148 @@
+"""
+Unit tests for the BlueprintAgent helpers.
+Tests FK cross-referencing and view/procedure mapping without touching artifacts.
+"""
+
+import json
+
+import pytest
+
+from src.agents.blueprint_agent import BlueprintAgent
+from src.state import (
+    DependencyGraph,
+    MigrationState,
+    ProcedureMetadata,
+    SchemaMetadata,
+    TableMetadata,
+    ViewMetadata,
+)
+
+
+def make_table(name, refs=()):
+    """Create a table with one FK per referenced table."""
+    return TableMetadata(
+        name=name,
+        columns=[{"name": "id", "type": "INT", "nullable": False}],
+        primary_key=["id"],
+        foreign_keys=[
+            {"name": f"fk_{name}_{ref}", "columns": [f"{ref}_id"],
+             "referred_table": ref, "referred_columns": ["id"]}
+            for ref in refs
+        ],
+    )
+
+
+class TestBlueprintHelpers:
+    """Test BlueprintAgent mapping and FK helpers."""
+
+    def setup_method(self):
+        """Create an agent instance without initializing artifacts."""
+        self.agent = BlueprintAgent.__new__(BlueprintAgent)
+        self.agent.name = "Blueprint Agent"
+
+    def test_detect_circular_fks(self):
+        """Test that mutual FKs are reported once as a sorted pair."""
+        tables = [
+            make_table("store", refs=["staff"]),
+            make_table("staff", refs=["store", "address"]),
+            make_table("address"),
+            make_table("node", refs=["node"]),  # Self-reference is not circular
+        ]
+
+        assert self.agent._detect_circular_fks(tables) == {("staff", "store")}
+
+    def test_create_table_blueprint_dependencies(self):
+        """Test that dependencies are deduplicated in order and deferred FKs flagged."""
+        table = make_table("staff", refs=["store", "address", "address"])
+
+        blueprint = self.agent._create_table_blueprint(
+            table=self.agent._normalize_table(table),
+            all_table_names=["address", "staff", "store"],
+            depended_by=["store", "store"],
+            views=[],
+            triggers=[],
+            procedures=[],
+            dep_graph={},
+            circular_pairs={("staff", "store")},
+        )
+
+        deps = blueprint["dependencies"]
+        assert deps["depends_on"] == ["store", "address"]  # FK declaration order
+        assert deps["depended_by"] == ["store"]
+        assert deps["has_circular_fk"] is True
+        assert [fk["references_table"] for fk in blueprint["foreign_keys"]["deferred"]] == ["store"]
+
+    def test_map_views_to_tables(self):
+        """Test that views map to the tables they reference as whole names."""
+        tables = [make_table("film"), make_table("film_actor"), make_table("actor")]
+        views = [ViewMetadata(name="v", definition="SELECT * FROM FILM_ACTOR")]
+
+        views_by_table = self.agent._map_views_to_tables(views, tables)
+
+        assert [v["name"] for v in views_by_table["film_actor"]] == ["v"]
+        assert views_by_table["film"] == []
+        assert views_by_table["actor"] == []
+
+    def test_map_procedures_to_tables(self):
+        """Test that procedures map to referenced tables only."""
+        tables = [make_table("rental"), make_table("payment")]
+        procs = [
+            ProcedureMetadata(name="p", type="procedure", source_code="SELECT * FROM rental"),
+            ProcedureMetadata(name="empty", type="function"),
+        ]
+
+        procs_by_table = self.agent._map_procedures_to_tables(procs, tables)
+
+        assert [p["name"] for p in procs_by_table["rental"]] == ["p"]
+        assert procs_by_table["payment"] == []
+
+
+class TestRun:
+    """Tests for generating all blueprints."""
+
+    def test_failed_tables_reported(self, make_agent, artifact_manager, monkeypatch):
+        """Test that a table whose blueprint fails is recorded in state and the rest are written."""
+        agent = make_agent(BlueprintAgent, blueprints_dir=artifact_manager.artifacts_dir / "blueprints")
+        create = agent._create_table_blueprint
+
+        def create_or_fail(table, **kwargs):
+            if table["name"] == "bad":
+                raise ValueError("unsupported column")
+            return create(table=table, **kwargs)
+        monkeypatch.setattr(agent, "_create_table_blueprint", create_or_fail)
+        schema = SchemaMetadata(database_name="sakila", database_type="mysql",
+                                tables=[make_table("film"), make_table("bad")])
+
+        state = agent.run(MigrationState(schema_metadata=schema))
+
+        assert [(e["object_name"], e["error_type"]) for e in state.errors] == [("bad", "blueprint_error")]
+        assert sorted(p.name for p in agent.blueprints_dir.iterdir()) == ["_index.json", "film.blueprint.json"]
+
+
+class TestLoadDependencyGraph:
+    """Tests for reading the dependency graph."""
+
+    @pytest.fixture(autouse=True)
+    def setup(self, make_agent, artifact_manager):
+        """Create an agent with a stale dependency graph artifact on disk."""
+        self.agent = make_agent(BlueprintAgent)
+        (artifact_manager.artifacts_dir / "dependency_graph.json").write_text(
+            json.dumps({"nodes": [], "edges": [], "migration_order": ["table:stale"]}), encoding="utf-8"
+        )
+
+    def test_state_graph_preferred(self):
+        """Test that the graph in state wins over the artifact."""
+        state = MigrationState(dependency_graph=DependencyGraph(migration_order=["table:film"]))
+
+        assert self.agent._load_dependency_graph(state)["migration_order"] == ["table:film"]
+
+    def test_artifact_read_without_touching_state(self):
+        """Test that the artifact is only a fallback and state is left as it was."""
+        state = MigrationState()
+
+        assert self.agent._load_dependency_graph(state)["migration_order"] == ["table:stale"]
+        assert state.dependency_graph is None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,207 @@
+"""
+Unit tests for the DataMigrationAgent helpers.
+Tests value converters and table layering without source or target databases.
+"""
+
+import struct
+from types import SimpleNamespace
+
+import pytest
+
+from src.agents.data_migration_agent import (
+    COUNT_SEQUENCES_SQL,
+    RESET_SEQUENCES_SQL,
+    CopyRowStream,
+    DataMigrationAgent,
+    convert_wkb_points,
+    convert_wkb_to_point,
+    to_copy_field,
+)
+
+
+def make_point_wkb(x, y, srid=0):
+    """Build MySQL's internal POINT format: SRID + WKB."""
+    return struct.pack("<IBIdd", srid, 1, 1, x, y)
+
+
+class TestConvertWkbToPoint:
+    """Tests for MySQL POINT decoding."""
+
+    def test_point(self):
+        """Test that X/Y are decoded into PostgreSQL POINT text."""
+        assert convert_wkb_to_point(make_point_wkb(1.5, -2.25)) == "(1.5, -2.25)"
+
+    def test_memoryview(self):
+        """Test that memoryview input is accepted."""
+        assert convert_wkb_to_point(memoryview(make_point_wkb(3.0, 4.0))) == "(3.0, 4.0)"
+
+    def test_null_and_short_values(self):
+        """Test that NULL and truncated values map to NULL."""
+        assert convert_wkb_to_point(None) is None
+        assert convert_wkb_to_point(b"\x00" * 10) is None
+
+    def test_batch_matches_per_row(self):
+        """Test that vectorized batch decoding matches per-row decoding."""
+        values = [make_point_wkb(1.5, 0.1), None, b"\x00" * 22, memoryview(make_point_wkb(-3.0, 1e300))]
+        assert convert_wkb_points(values) == [convert_wkb_to_point(v) for v in values]
+
+
+class TestCopyField:
+    """Tests for COPY text-format encoding."""
+
+    def test_null_and_bool(self):
+        """Test NULL marker and boolean literals."""
+        assert to_copy_field(None) == "\\N"
+        assert to_copy_field(True) == "t"
+        assert to_copy_field(False) == "f"
+
+    def test_escapes_special_characters(self):
+        """Test that delimiters and backslashes are escaped."""
+        assert to_copy_field("a\tb\nc\\d\r") == "a\\tb\\nc\\\\d\\r"
+
+    def test_bytes(self):
+        """Test that binary values use escaped bytea hex input."""
+        assert to_copy_field(b"\x00\xff") == "\\\\x00ff"
+        assert to_copy_field(memoryview(b"\x01")) == "\\\\x01"
+
+    def test_set_array(self):
+        """Test that SET values become a quoted TEXT[] literal."""
+        assert to_copy_field(["a", 'b"c']) == '{"a","b\\\\"c"}'
+        assert to_copy_field([]) == "{}"
+
+    def test_numbers(self):
+        """Test that numbers are passed through as text."""
+        assert to_copy_field(42) == "42"
+        assert to_copy_field(1.5) == "1.5"
+
+
+class TestCopyRowStream:
+    """Tests for the streaming COPY input."""
+
+    def test_chunked_reads_match_full_text(self):
+        """Test that fixed-size reads reassemble into the encoded rows."""
+        rows = [(1, "a\tb", None), (2, "ccc", True)] * 50
+        expected = "".join("\t".join(to_copy_field(v) for v in row) + "\n" for row in rows)
+
+        stream = CopyRowStream(rows)
+        chunks = []
+        while chunk := stream.read(7):
+            assert len(chunk) <= 7
+            chunks.append(chunk)
+
+        assert "".join(chunks) == expected
+        assert CopyRowStream(rows).read() == expected
+
+
+class TestComputeLayers:
+    """Tests for dependency layering of tables."""
+
+    def setup_method(self):
+        """Create an agent instance without database engines."""
+        self.agent = DataMigrationAgent.__new__(DataMigrationAgent)
+
+    def test_independent_tables_share_a_layer(self):
+        """Test that tables only depend on tables in earlier layers."""
+        order = ["country", "city", "language", "address", "film"]
+        edges = [("city", "country"), ("address", "city"), ("film", "language")]
+
+        layers = self.agent._compute_layers(order, edges)
+
+        assert layers == [["country", "language"], ["city", "film"], ["address"]]
+
+    def test_self_reference_and_unknown_tables_are_ignored(self):
+        """Test that self-references and tables outside the order don't block."""
+        layers = self.agent._compute_layers(["staff"], [("staff", "staff"), ("staff", "store")])
+        assert layers == [["staff"]]
+
+    def test_cycle_goes_last(self):
+        """Test that tables in FK cycles are appended one per layer."""
+        order = ["store", "staff", "address"]
+        edges = [("store", "staff"), ("staff", "store"), ("store", "address")]
+
+        layers = self.agent._compute_layers(order, edges)
+
+        assert layers == [["address"], ["store"], ["staff"]]
+
+
+class TestInsertBatch:
+    """Tests for per-table value conversion in _insert_batch."""
+
+    def setup_method(self):
+        """Create an agent that captures converted rows instead of loading them."""
+        self.agent = DataMigrationAgent.__new__(DataMigrationAgent)
+        self.agent._column_types = {
+            "address": {"id": "int", "location": "geometry", "active": "tinyint(1)", "tags": "set"},
+        }
+        self.agent._converters = {}
+        self.agent.use_copy = True
+        self.loaded = []
+        self.agent._copy_rows = lambda table, columns, rows, conn: self.loaded.extend(rows)
+
+    def test_converts_by_column(self):
+        """Test that converters apply per column and POINT columns decode per batch."""
+        columns = ["id", "location", "active", "tags"]
+        rows = [(1, make_point_wkb(1.0, 2.0), 1, "a,b"), (2, None, 0, "")]
+
+        self.agent._insert_batch("address", columns, rows, tgt_conn=None)
+
+        assert self.loaded == [[1, "(1.0, 2.0)", True, ["a", "b"]], [2, None, False, []]]
+
+    def test_fast_path_without_converters(self):
+        """Test that rows of tables without converters are loaded unchanged."""
+        rows = [(1, "x"), (2, None)]
+
+        self.agent._insert_batch("country", ["id", "name"], rows, tgt_conn=None)
+
+        assert self.loaded == rows
+
+
+
+class FakeSequenceConnection:
+    """Target connection whose sequence reset fails for one table with a server warning."""
+
+    def __init__(self):
+        self.connection = SimpleNamespace(dbapi_connection=SimpleNamespace(notices=["NOTICE:  earlier\n"]))
+        self.committed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, statement, params):
+        if statement.text == RESET_SEQUENCES_SQL:
+            self.connection.dbapi_connection.notices.append(
+                'WARNING:  Could not reset sequence public.film_film_id_seq (film.film_id): relation "film" does not exist\n'
+            )
+            return None
+        assert statement.text == COUNT_SEQUENCES_SQL
+        return SimpleNamespace(scalar=lambda: 3)
+
+    def commit(self):
+        self.committed = True
+
+
+class TestResetSequences:
+    """Tests for reporting per-table sequence reset failures."""
+
+    def test_failed_tables_are_logged_and_not_counted(self):
+        """Test that a table whose setval failed is reported and the rest still count."""
+        agent = DataMigrationAgent.__new__(DataMigrationAgent)
+        agent.name = "Data Migration Agent"
+        conn = FakeSequenceConnection()
+        agent._target_engine = SimpleNamespace(connect=lambda: conn)
+        logged = []
+        agent.log = lambda message, level="info": logged.append((message, level))
+
+        assert agent._reset_sequences(["actor", "film", "store"]) == 2
+        assert logged == [(
+            '  WARNING:  Could not reset sequence public.film_film_id_seq (film.film_id): relation "film" does not exist',
+            "warning",
+        )]
+        assert conn.committed
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
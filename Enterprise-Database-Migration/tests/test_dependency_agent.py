@@ -0,0 +1,109 @@
+"""
+Unit tests for the DependencyAgent helpers.
+Tests migration ordering without LLM calls.
+"""
+
+import pytest
+
+from src.agents.dependency_agent import DependencyAgent
+from src.state import DependencyEdge, DependencyNode, TableMetadata
+from src.tools import graph_kernels
+
+
+def make_node(node_id):
+    """Create a dependency node from a "type:name" id."""
+    node_type, name = node_id.split(":", 1)
+    return DependencyNode(id=node_id, name=name, type=node_type)
+
+
+def make_edge(from_id, to_id):
+    """Create a foreign key edge."""
+    return DependencyEdge(from_id=from_id, to_id=to_id, edge_type="foreign_key")
+
+
+class TestTopologicalSort:
+    """Tests for migration ordering."""
+
+    def setup_method(self):
+        """Create an agent instance without initializing the LLM."""
+        self.agent = DependencyAgent.__new__(DependencyAgent)
+
+    def test_dependencies_come_first(self):
+        """Test that referenced objects are ordered before their dependents."""
+        nodes = [make_node("table:address"), make_node("table:city"), make_node("table:country"),
+                 make_node("view:v")]
+        edges = [make_edge("table:address", "table:city"), make_edge("table:city", "table:country"),
+                 make_edge("view:v", "table:address")]
+
+        order = self.agent._topological_sort(nodes, edges)
+
+        assert order == ["table:country", "table:city", "table:address", "view:v"]
+
+    def test_cycle_members_appended_once(self):
+        """Test that nodes in a cycle are appended after the sortable nodes."""
+        nodes = [make_node("table:store"), make_node("table:staff"), make_node("table:film")]
+        edges = [make_edge("table:store", "table:staff"), make_edge("table:staff", "table:store"),
+                 make_edge("table:store", "table:missing")]
+
+        order = self.agent._topological_sort(nodes, edges)
+
+        assert order == ["table:film", "table:store", "table:staff"]
+
+    @pytest.mark.skipif(graph_kernels.np is None, reason="numpy not installed")
+    def test_array_kahn_matches_python_loop(self):
+        """Test that the array kernel (run uncompiled) gives the same order."""
+        np = graph_kernels.np
+        nodes = [make_node(f"table:t{i}") for i in range(6)]
+        edges = [make_edge("table:t0", "table:t3"), make_edge("table:t3", "table:t5"),
+                 make_edge("table:t1", "table:t2"), make_edge("table:t2", "table:t1"),
+                 make_edge("table:t4", "table:t0")]
+        ids, offsets, adjacency, in_degree = self.agent._build_csr(nodes, edges)
+
+        order = graph_kernels.kahn_order(
+            np.frombuffer(adjacency, dtype=np.int32),
+            np.frombuffer(offsets, dtype=np.int32),
+            np.array(in_degree, dtype=np.int32),
+        )
+
+        assert [ids[i] for i in order.tolist()] == self.agent._topological_sort(nodes, edges)
+
+
+class TestClassifyComplexity:
+    """Tests for table complexity buckets."""
+
+    @pytest.mark.parametrize("columns, fks, rows, expected", [
+        (5, 0, None, "low"),
+        (11, 0, 10001, "medium"),
+        (21, 0, 0, "medium"),
+        (21, 1, 10001, "high"),
+        (5, 4, 100001, "high"),
+        (10, 3, 10000, "low"),
+    ])
+    def test_thresholds(self, columns, fks, rows, expected):
+        """Test that column, FK and row-count thresholds add up to the right bucket."""
+        agent = DependencyAgent.__new__(DependencyAgent)
+        table = TableMetadata(
+            name="t",
+            columns=[{"name": f"c{i}"} for i in range(columns)],
+            foreign_keys=[{"referred_table": "x"}] * fks,
+            row_count=rows,
+        )
+        assert agent._classify_complexity(table) == expected
+
+
+class TestDedupe:
+    """Tests for duplicate node and edge removal."""
+
+    def test_keeps_first_in_order(self):
+        """Test that the first item per key is kept in original order."""
+        edges = [make_edge("table:film", "table:language"), make_edge("table:a", "table:b"),
+                 make_edge("table:film", "table:language")]
+
+        unique = DependencyAgent._dedupe(edges, lambda e: (e.from_id, e.to_id, e.edge_type))
+
+        assert unique == edges[:2]
+        assert unique[0] is edges[0]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,231 @@
+"""
+Unit tests for the ErrorFixerAgent helpers.
+Tests dependency graph lookups without LLM calls or artifacts.
+"""
+
+import os
+
+import pytest
+from langchain_core.messages import AIMessage
+
+from src.agents.error_fixer_agent import ErrorFixerAgent, _load_graph_file
+from src.state import ConvertedProcedure, MigrationState, SandboxResult, TransformedDDL
+
+
+def fk(from_table, to_table):
+    """Create a foreign key edge dict as stored in dependency_graph.json."""
+    return {"from_id": f"table:{from_table}", "to_id": f"table:{to_table}", "edge_type": "foreign_key"}
+
+
+class TestDependencyContext:
+    """Tests for circular dependency and FK context lookups."""
+
+    @pytest.fixture(autouse=True)
+    def setup(self, make_agent):
+        """Create an agent instance without initializing the LLM."""
+        self.agent = make_agent(ErrorFixerAgent)
+        self.agent.dependency_graph = {
+            "nodes": [],
+            "edges": [
+                fk("store", "staff"), fk("staff", "store"), fk("staff", "address"),
+                fk("customer", "store"), fk("node", "node"),
+                {"from_id": "view:v", "to_id": "table:staff", "edge_type": "reference"},
+            ],
+            "migration_order": [],
+        }
+        self.agent._index_fk_edges()
+
+    def test_circular_dependencies(self):
+        """Test that mutual FKs are reported once and self-references are not."""
+        assert self.agent._get_circular_dependencies() == [("table:staff", "table:store")]
+
+    def test_fk_context(self):
+        """Test that FK context lists references in both directions, FK edges only."""
+        context = self.agent._get_fk_context("staff")
+
+        assert "References (FK to): store, address" in context
+        assert "Referenced by: store\n" in context
+        assert "Referenced by: None" in self.agent._get_fk_context("customer")
+
+
+class TestLoadDependencyGraph:
+    """Tests for the shared dependency graph cache."""
+
+    def setup_method(self):
+        """Reset the module-level cache."""
+        _load_graph_file.cache_clear()
+
+    def teardown_method(self):
+        """Don't leak the temporary graph into other tests."""
+        _load_graph_file.cache_clear()
+
+    def test_reused_until_file_changes(self, tmp_path, make_agent):
+        """Test that instances share the parsed graph until its mtime changes."""
+        path = tmp_path / "dependency_graph.json"
+        path.write_text('{"nodes": [], "edges": [], "migration_order": ["table:a"]}')
+
+        first = make_agent(ErrorFixerAgent)._load_dependency_graph()
+        assert make_agent(ErrorFixerAgent)._load_dependency_graph() is first
+        assert first["migration_order"] == ["table:a"]
+
+        path.write_text('{"nodes": [], "edges": [], "migration_order": ["table:b"]}')
+        os.utime(path, ns=(0, path.stat().st_mtime_ns + 1_000_000))
+        assert make_agent(ErrorFixerAgent)._load_dependency_graph()["migration_order"] == ["table:b"]
+
+    def test_missing_file(self, make_agent):
+        """Test that a missing graph yields an empty one."""
+        assert make_agent(ErrorFixerAgent)._load_dependency_graph()["edges"] == []
+
+
+class TestCleanSql:
+    """Tests for LLM output cleanup."""
+
+    @pytest.mark.parametrize("raw", [
+        "```sql\nSELECT 1\n```",
+        "  ```SQL\nSELECT 1;```\n",
+        "```\nSELECT 1\n```",
+        "SELECT 1",
+    ])
+    def test_strips_fences_and_terminates(self, raw):
+        """Test that code fences are removed and a semicolon is ensured."""
+        agent = ErrorFixerAgent.__new__(ErrorFixerAgent)
+        assert agent._clean_sql(raw) == "SELECT 1;"
+
+
+class TestStaticFixes:
+    """Tests for rule-based fixes that skip the LLM."""
+
+    @pytest.fixture(autouse=True)
+    def setup(self, make_agent):
+        """Create an agent with a table DDL that has a POINT column."""
+        self.agent = make_agent(ErrorFixerAgent)
+        address = TransformedDDL(
+            object_name="address", object_type="table", source_ddl="",
+            target_ddl='CREATE TABLE "address" ("address_id" SERIAL, "location" POINT NOT NULL);',
+        )
+        self.agent._ddl_by_name = {"address": address}
+        self.agent._deferred_fks, self.agent._dropped_fks = [], []
+
+    def fix(self, error, ddl, object_type="index"):
+        """Run the static fixer for a single error."""
+        result = SandboxResult(object_name="x", object_type=object_type, executed=False, errors=[error])
+        return self.agent._try_static_fix(result, ddl)
+
+    def test_duplicate_index_renamed(self):
+        """Test that a duplicate index name gets the table name prefix."""
+        ddl = 'CREATE INDEX "idx_a" ON "t" ("a");\nCREATE INDEX "idx_fk_customer_id" ON "rental" ("customer_id");'
+
+        fixed = self.fix('relation "idx_fk_customer_id" already exists', ddl)
+
+        assert fixed == ('CREATE INDEX "idx_a" ON "t" ("a");\n'
+                         'CREATE INDEX "idx_rental_customer_id" ON "rental" ("customer_id");')
+
+    def test_duplicate_table_left_to_llm(self):
+        """Test that duplicate non-index relations are not handled by rules."""
+        assert self.fix('relation "actor" already exists', 'CREATE TABLE "actor" ("id" INT);', "table") is None
+
+    def test_point_index_uses_gist(self):
+        """Test that only indexes on POINT columns switch to GIST."""
+        ddl = ('CREATE INDEX "idx_address_city_id" ON "address" ("city_id");\n'
+               'CREATE INDEX "idx_address_location" ON "address" ("location");')
+
+        fixed = self.fix('data type point has no default operator class for access method "btree"', ddl)
+
+        assert fixed == ('CREATE INDEX "idx_address_city_id" ON "address" ("city_id");\n'
+                         'CREATE INDEX "idx_address_location" ON "address" USING GIST ("location");')
+
+    def test_missing_fk_target_deferred(self):
+        """Test that FKs referencing a missing table are deferred, or dropped and recorded."""
+        table_ddl = ('CREATE TABLE "staff" ("id" INT, "store_id" INT,\n'
+                     '    CONSTRAINT "fk_staff_store" FOREIGN KEY ("store_id") REFERENCES "store" ("id") '
+                     'ON DELETE RESTRICT ON UPDATE CASCADE\n);')
+        alter_ddl = ('ALTER TABLE "staff" ADD CONSTRAINT "fk_staff_store" \n'
+                     '    FOREIGN KEY ("store_id") REFERENCES "store" ("id");\n\n'
+                     'ALTER TABLE "a" ADD CONSTRAINT "fk_a_b" FOREIGN KEY ("b_id") REFERENCES "b" ("id");')
+        error = 'relation "store" does not exist'
+
+        assert self.fix(error, table_ddl, "table") == 'CREATE TABLE "staff" ("id" INT, "store_id" INT\n);'
+        assert self.agent._deferred_fks == [
+            'ALTER TABLE "staff" ADD CONSTRAINT "fk_staff_store" FOREIGN KEY ("store_id") REFERENCES "store" ("id") '
+            'ON DELETE RESTRICT ON UPDATE CASCADE;'
+        ]
+        assert self.fix(error, alter_ddl, "constraint") == (
+            'ALTER TABLE "a" ADD CONSTRAINT "fk_a_b" FOREIGN KEY ("b_id") REFERENCES "b" ("id");')
+        assert self.agent._dropped_fks == [
+            'ALTER TABLE "staff" ADD CONSTRAINT "fk_staff_store" \n    FOREIGN KEY ("store_id") REFERENCES "store" ("id");'
+        ]
+
+    def test_removed_fks_recorded_in_state(self):
+        """Test that deferred FKs join the constraint DDL and dropped ones are reported as errors."""
+        constraints = TransformedDDL(object_name="_deferred_fks", object_type="constraint",
+                                     source_ddl="", target_ddl='ALTER TABLE "a" ADD FOREIGN KEY ("b") REFERENCES "b" ("id");')
+        state = MigrationState(transformed_ddl=[constraints])
+        self.agent._deferred_fks = ['ALTER TABLE "staff" ADD FOREIGN KEY ("store_id") REFERENCES "store" ("id");']
+        self.agent._dropped_fks = ['REFERENCES "gone" ("id")']
+
+        self.agent._record_removed_fks(state)
+
+        assert constraints.target_ddl.endswith('\n\nALTER TABLE "staff" ADD FOREIGN KEY ("store_id") REFERENCES "store" ("id");')
+        assert "deferred_fks.sql" in self.agent.artifact_manager.saved
+        assert [e["error_type"] for e in state.errors] == ["dropped_foreign_key"]
+        assert 'REFERENCES "gone" ("id")' in state.errors[0]["error_message"]
+
+    def test_unmatched_errors_left_to_llm(self):
+        """Test that other errors, or missing tables outside FKs, fall through."""
+        assert self.fix('relation "staffs" does not exist', 'CREATE VIEW v AS SELECT * FROM staffs;', "view") is None
+        assert self.fix("syntax error at or near \"GROUP\"", "SELECT 1;") is None
+
+
+class TestRunFixes:
+    """Tests for concurrent LLM fixing."""
+
+    @pytest.fixture(autouse=True)
+    def setup(self, make_agent):
+        """Create an agent whose LLM echoes a fixed statement per object."""
+        self.agent = make_agent(ErrorFixerAgent)
+        self.agent.dependency_graph = {"nodes": [], "edges": [], "migration_order": []}
+        self.agent._index_fk_edges()
+        self.agent._circular_nodes = frozenset()
+        self.agent.invoke_with_retry = self.fake_llm
+
+    @staticmethod
+    def fake_llm(messages):
+        """Return the fix for the object named in the prompt."""
+        prompt = messages[-1].content
+        if "broken_proc" in prompt:
+            raise RuntimeError("boom")
+        if "good_view" in prompt:
+            return AIMessage(content="```sql\nCREATE VIEW good_view AS SELECT 1\n```")
+        return AIMessage(content="CREATE FUNCTION same_fn() RETURNS void AS $$ $$;")
+
+    def test_fixes_applied_to_state_objects(self):
+        """Test that responses update DDL objects and failures are skipped."""
+        view = TransformedDDL(object_name="good_view", object_type="view",
+                              source_ddl="", target_ddl="CREATE VIEW good_view AS SELECT")
+        proc = ConvertedProcedure(name="same_fn", procedure_type="function", source_code="",
+                                  target_code="CREATE FUNCTION same_fn() RETURNS void AS $$ $$;")
+        broken = ConvertedProcedure(name="broken_proc", procedure_type="procedure",
+                                    source_code="", target_code="CALL x;")
+        self.agent._ddl_by_name = {"good_view": view}
+        self.agent._proc_by_name = {"same_fn": proc, "broken_proc": broken}
+
+        results = [
+            SandboxResult(object_name=name, object_type=kind, executed=False, errors=["err"])
+            for name, kind in [("good_view", "view"), ("same_fn", "function"),
+                               ("broken_proc", "procedure"), ("missing", "table")]
+        ]
+        fix_requests = []
+        for result in results:
+            ddl_obj, original_ddl = self.agent._find_original_ddl(result)
+            if original_ddl:
+                messages = self.agent._build_fix_messages(result, original_ddl)
+                fix_requests.append((result, ddl_obj, original_ddl, messages))
+
+        assert len(fix_requests) == 3
+        assert self.agent._run_fixes(fix_requests) == 1
+        assert view.target_ddl == "CREATE VIEW good_view AS SELECT 1;"
+        assert list(self.agent.artifact_manager.saved) == ["good_view.sql"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
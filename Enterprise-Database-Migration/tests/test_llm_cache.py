@@ -0,0 +1,68 @@
+"""
+Tests for the LLM response cache.
+"""
+
+from langchain_core.messages import AIMessage
+
+from src.tools.llm_cache import LLMCache
+
+
+class TestLLMCache:
+    """Tests for LLMCache class."""
+
+    def test_make_key_is_deterministic(self):
+        """Test that identical requests produce the same key."""
+        args = dict(
+            model="m", temperature=0.1, max_tokens=100,
+            system_prompt="sys", messages=[("human", "hello")],
+        )
+        assert LLMCache.make_key(**args) == LLMCache.make_key(**args)
+
+    def test_make_key_changes_with_messages(self):
+        """Test that different messages produce different keys."""
+        base = dict(model="m", temperature=0.1, max_tokens=100, system_prompt="sys")
+        key_a = LLMCache.make_key(messages=[("human", "a")], **base)
+        key_b = LLMCache.make_key(messages=[("human", "b")], **base)
+        assert key_a != key_b
+
+    def test_make_key_ignores_json_key_order_and_trailing_whitespace(self):
+        """Test that equivalent message bodies share a key."""
+        base = dict(model="m", temperature=0, max_tokens=100, system_prompt="sys")
+        key_a = LLMCache.make_key(messages=[("human", '{"b": 1, "a": [2]}\n')], **base)
+        key_b = LLMCache.make_key(messages=[("human", '{"a":[2],"b":1}')], **base)
+        assert key_a == key_b
+
+    def test_set_and_get(self, tmp_path):
+        """Test storing and retrieving a response."""
+        cache = LLMCache(db_path=tmp_path / "cache.db", ttl_seconds=60)
+        cache.set("k", {"content": "CREATE TABLE t ();", "additional_kwargs": {}, "tool_calls": []})
+
+        cached = cache.get("k")
+        assert cached["content"] == "CREATE TABLE t ();"
+        assert AIMessage(**cached).content == "CREATE TABLE t ();"
+        cache.close()
+
+    def test_delete(self, tmp_path):
+        """Test that a deleted response is no longer returned."""
+        cache = LLMCache(db_path=tmp_path / "cache.db", ttl_seconds=60)
+        cache.set("k", {"content": "x"})
+        cache.set("other", {"content": "y"})
+
+        cache.delete("k")
+
+        assert cache.get("k") is None
+        assert cache.get("other") == {"content": "y"}
+        cache.close()
+
+    def test_missing_key(self, tmp_path):
+        """Test that unknown keys return None."""
+        cache = LLMCache(db_path=tmp_path / "cache.db", ttl_seconds=60)
+        assert cache.get("missing") is None
+        cache.close()
+
+    def test_expired_entry(self, tmp_path):
+        """Test that expired entries are treated as misses."""
+        cache = LLMCache(db_path=tmp_path / "cache.db", ttl_seconds=-1)
+        cache.set("k", {"content": "x"})
+        assert cache.get("k") is None
+        cache.close()
@@ -0,0 +1,263 @@
+"""
+Unit tests for the LogicAgent converters.
+Tests prompt layout and response handling with a stubbed LLM.
+"""
+
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from langchain_core.messages import AIMessage
+
+from src.agents import base_agent
+from src.agents.logic_agent import (
+    PROCEDURE_CONVERSION_RULES,
+    PROCEDURE_REQUEST,
+    TRIGGER_CONVERSION_RULES,
+    TRIGGER_REQUEST,
+    LogicAgent,
+    _strip_fence,
+)
+from src.state import MigrationState, ProcedureMetadata, SchemaMetadata, TriggerMetadata
+from src.tools.api_key_manager import APIKeyManager
+from src.tools.llm_cache import LLMCache
+
+
+class TestStripFence:
+    """Tests for markdown fence removal."""
+
+    @pytest.mark.parametrize("text, expected", [
+        ("```sql\nSELECT 1;\nSELECT 2;\n```", "SELECT 1;\nSELECT 2;"),
+        ("  ```\nSELECT 1;\n```\n", "SELECT 1;"),
+        ("```sql\nSELECT 1;", "SELECT 1;"),  # Truncated response without closing fence
+        ("SELECT '```';\n", "SELECT '```';"),
+    ])
+    def test_strip_fence(self, text, expected):
+        """Test that only a fence wrapping the whole response is removed."""
+        assert _strip_fence(text) == expected
+
+
+class TestConverters:
+    """Tests for procedure and trigger conversion requests."""
+
+    @pytest.fixture(autouse=True)
+    def setup(self, make_agent):
+        """Create an agent whose LLM records requests and echoes a fixed body."""
+        self.agent = make_agent(LogicAgent, use_complex_model=True, enable_cache=False)
+        self.requests = []
+        self.agent.invoke_with_retry = self.fake_llm
+
+    def fake_llm(self, messages):
+        """Record the request and return a converted body."""
+        self.requests.append(messages)
+        return AIMessage(content="CREATE OR REPLACE FUNCTION f() RETURNS void AS $$ $$ LANGUAGE plpgsql;")
+
+    def test_static_rules_come_first(self):
+        """Test that every request starts with the same cacheable rules block."""
+        procs = [
+            ProcedureMetadata(name="a", type="procedure", source_code="BEGIN SELECT 1; END"),
+            ProcedureMetadata(name="b", type="function", source_code="BEGIN RETURN 2; END", return_type="int"),
+        ]
+        for proc in procs:
+            self.agent._convert_procedure(proc)
+        self.agent._convert_trigger(TriggerMetadata(
+            name="t", table_name="film", timing="AFTER", event="INSERT", source_code="SET NEW.x = 1"))
+
+        (first, _), (second, _), (trigger_rules, trigger_body) = self.requests
+        assert first.content == second.content == PROCEDURE_CONVERSION_RULES
+        assert first.additional_kwargs["cache_control"] == {"type": "ephemeral"}
+        assert trigger_rules.content == TRIGGER_CONVERSION_RULES
+        assert "SET NEW.x = 1" in trigger_body.content
+        assert "BEGIN RETURN 2; END" in self.requests[1][1].content
+
+    def test_variable_fields_come_last(self):
+        """Test that object messages open with static text and end with the object's fields."""
+        proc = ProcedureMetadata(
+            name="a", type="function", source_code="BEGIN RETURN 1; END", return_type="int",
+            parameters=[{"type": "INT", "name": "p_id", "mode": "IN"}],
+        )
+        self.agent._convert_procedure(proc)
+        self.agent._convert_trigger(TriggerMetadata(
+            name="t", table_name="film", timing="AFTER", event="INSERT", source_code="SET NEW.x = 1"))
+
+        proc_body, trigger_body = self.requests[0][1].content, self.requests[1][1].content
+        assert proc_body.startswith(PROCEDURE_REQUEST + "\n\n## Type: function")
+        assert proc_body.endswith('## Params: [{"mode": "IN", "name": "p_id", "type": "INT"}]\n## Return: int')
+        assert trigger_body.startswith(TRIGGER_REQUEST + "\n\n## Trigger: t")
+
+    def test_conversion_cache(self, tmp_path, monkeypatch):
+        """Test that identical deterministic requests are answered once from the agent's response cache."""
+        cache = LLMCache(db_path=tmp_path / "cache.db", ttl_seconds=60)
+        monkeypatch.setattr(base_agent, "get_llm_cache", lambda: cache)
+        del self.agent.invoke_with_retry
+        llm = SimpleNamespace(invoke=lambda messages: self.fake_llm(messages[1:]))
+        self.agent._create_llm = lambda: ("key", llm)
+        self.agent.system_prompt, self.agent._system_message, self.agent.tools = "sys", None, []
+        self.agent.enable_cache = True
+        self.agent.llm_config = self.agent.llm_config.model_copy(update={"temperature": 0})
+        proc = ProcedureMetadata(name="a", type="procedure", source_code="BEGIN SELECT 1; END")
+
+        first = self.agent._convert_procedure(proc)
+        second = self.agent._convert_procedure(proc.model_copy(update={"name": "renamed"}))
+        self.agent._convert_procedure(proc.model_copy(update={"source_code": "BEGIN SELECT 2; END"}))
+
+        assert first == second
+        assert len(self.requests) == 2
+
+        # Sampled answers are never replayed
+        self.agent.llm_config = self.agent.llm_config.model_copy(update={"temperature": 0.1})
+        self.agent._convert_procedure(proc)
+        assert len(self.requests) == 3
+        cache.close()
+
+
+class TestBatchConversion:
+    """Tests for packing short procedures into one request."""
+
+    @pytest.fixture(autouse=True)
+    def setup(self, make_agent):
+        """Create an agent whose LLM answers batch requests with a partial JSON array."""
+        self.agent = make_agent(LogicAgent, use_complex_model=True, enable_cache=False)
+        self.requests = []
+        self.agent.invoke_with_retry = self.fake_llm
+
+    def fake_llm(self, messages):
+        """Convert only the first routine of a batch; answer single requests with SQL."""
+        self.requests.append(messages)
+        if "===PROC 1===" in messages[-1].content:
+            return AIMessage(content='```json\n[{"index": 1, "pg_code": "-- batched", "notes": "n"}]\n```')
+        return AIMessage(content="-- single")
+
+    def test_batches_respect_budget(self):
+        """Test that batches keep order and split on size and count limits."""
+        small = [ProcedureMetadata(name=f"p{i}", type="procedure", source_code="x" * 10) for i in range(10)]
+        large = ProcedureMetadata(name="big", type="procedure", source_code="x" * 10_000)
+
+        batches = self.agent._batch_procedures([*small[:3], large, *small[3:]])
+
+        assert [[p.name for p in batch] for batch in batches] == [
+            ["p0", "p1", "p2"], ["big"], ["p3", "p4", "p5", "p6", "p7", "p8", "p9"],
+        ]
+
+    def test_missing_items_fall_back_to_single_requests(self):
+        """Test that one request converts the batch and omitted routines are retried alone."""
+        procs = [
+            ProcedureMetadata(name="a", type="procedure", source_code="BEGIN SELECT 1; END"),
+            ProcedureMetadata(name="b", type="function", source_code="BEGIN RETURN 2; END"),
+        ]
+
+        results = self.agent._convert_procedure_batch(procs)
+
+        assert results == [("-- batched", "n"), ("-- single", "Converted function to PL/pgSQL function")]
+        assert len(self.requests) == 2
+        assert self.requests[0][0].content == PROCEDURE_CONVERSION_RULES
+        assert "BEGIN RETURN 2; END" in self.requests[0][1].content
+
+
+    def test_invalid_batch_response_is_discarded(self):
+        """Test that a batch answer that isn't JSON is dropped from the cache and routines retried alone."""
+        self.agent.invoke_with_retry = lambda messages: self.requests.append(messages) or AIMessage(content="oops")
+        discarded = []
+        self.agent.discard_cached = discarded.append
+        procs = [
+            ProcedureMetadata(name="a", type="procedure", source_code="BEGIN SELECT 1; END"),
+            ProcedureMetadata(name="b", type="function", source_code="BEGIN RETURN 2; END"),
+        ]
+
+        results = self.agent._convert_procedure_batch(procs)
+
+        assert discarded == [self.requests[0]]
+        assert [code for code, _ in results] == ["oops", "oops"]
+        assert len(self.requests) == 3
+
+
+class TestRun:
+    """Tests for running conversions concurrently."""
+
+    @pytest.fixture(autouse=True)
+    def setup(self, make_agent):
+        """Create an agent whose converters finish in reverse submission order."""
+        self.agent = make_agent(LogicAgent)
+        self.agent._convert_procedure_batch = lambda procs: [self.slow_convert(p.name) for p in procs]
+        self.agent._convert_trigger = lambda trigger: self.slow_convert(trigger.name)
+
+    @staticmethod
+    def slow_convert(name):
+        """Sleep longer for earlier names so results complete out of order."""
+        time.sleep(0.02 * (ord("z") - ord(name[0])) / 25)
+        return f"-- {name}", "converted"
+
+    def test_results_keep_submission_order(self):
+        """Test that artifacts and conversions follow schema order, not completion order."""
+        schema = SchemaMetadata(
+            database_name="sakila",
+            database_type="mysql",
+            procedures=[
+                ProcedureMetadata(name="a_proc", type="procedure", source_code="BEGIN END"),
+                ProcedureMetadata(name="m_func", type="function", source_code="BEGIN END"),
+            ],
+            triggers=[TriggerMetadata(name="z_trg", table_name="t", timing="BEFORE", event="INSERT")],
+        )
+        state = MigrationState(schema_metadata=schema)
+
+        state = self.agent.run(state)
+
+        assert [p.name for p in state.converted_procedures] == ["a_proc", "m_func", "z_trg"]
+        assert [p.target_code for p in state.converted_procedures] == ["-- a_proc", "-- m_func", "-- z_trg"]
+        saved = self.agent.artifact_manager.saved
+        assert list(saved) == ["a_proc.sql", "m_func.sql", "trigger_z_trg.sql", "converted_procedures.json"]
+
+        summary = json.loads(json.dumps(saved["converted_procedures.json"]))
+        assert (summary["procedures"], summary["functions"], summary["triggers"]) == (1, 1, 1)
+        assert [c["name"] for c in summary["conversions"]] == ["a_proc", "m_func", "z_trg"]
+        assert summary["conversions"][0]["status"] == "pending"
+
+
+
+class TestRunRateLimits:
+    """Tests for concurrent conversions hitting provider rate limits."""
+
+    @pytest.fixture(autouse=True)
+    def setup(self, monkeypatch, make_agent):
+        """Create an agent whose LLM rate limits every worker on the first API key at once."""
+        self.key_manager = APIKeyManager.__new__(APIKeyManager)
+        self.key_manager.keys = ["k1", "k2", "k3"]
+        self.key_manager.current_index = 0
+        self.key_manager.failed_keys = set()
+        self.key_manager._lock = threading.Lock()
+        monkeypatch.setattr(base_agent, "get_api_key_manager", lambda: self.key_manager)
+
+        self.agent = make_agent(LogicAgent, use_complex_model=True, enable_cache=False)
+        model = self.agent.model_name
+        self.agent._llm_pool = {(key, model): (key, key) for key in self.key_manager.keys}
+        self.agent.invoke = self.fake_invoke
+        self.rate_limited = threading.Barrier(3, timeout=5)
+
+    def fake_invoke(self, messages, llm, use_cache=True):
+        """Fail on k1 once all three workers have sent a request; answer with the key used."""
+        if llm == "k1":
+            self.rate_limited.wait()
+            raise Exception("Error code: 429 - rate limit exceeded")
+        return AIMessage(content=f"-- {llm}")
+
+    def test_workers_share_one_rotation(self):
+        """Test that simultaneous rate limits on one key rotate once instead of exhausting all keys."""
+        schema = SchemaMetadata(
+            database_name="sakila",
+            database_type="mysql",
+            triggers=[
+                TriggerMetadata(name=f"trg{i}", table_name="t", timing="BEFORE", event="INSERT")
+                for i in range(3)
+            ],
+        )
+
+        state = self.agent.run(MigrationState(schema_metadata=schema))
+
+        assert [p.target_code for p in state.converted_procedures] == ["-- k2"] * 3
+        assert self.key_manager.failed_keys == {"k1"}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,65 @@
+"""
+Unit tests for the PostgreSQL executor.
+Runs batched DDL against a SQLite file so transactions behave like the sandbox.
+"""
+
+import pytest
+from sqlalchemy import create_engine, event, inspect
+
+from src.tools.pg_executor import PostgreSQLExecutor
+
+
+def make_executor(db_path):
+    """Create an executor on a SQLite file whose transactions include DDL."""
+    engine = create_engine(f"sqlite:///{db_path}")
+
+    @event.listens_for(engine, "connect")
+    def disable_pysqlite_transactions(dbapi_conn, record):
+        dbapi_conn.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def emit_begin(conn):
+        conn.exec_driver_sql("BEGIN")
+
+    executor = PostgreSQLExecutor(connection_string=f"sqlite:///{db_path}")
+    executor._engine = engine
+    return executor
+
+
+class TestExecuteManyDdl:
+    """Tests for executing several DDL statements in one transaction."""
+
+    @pytest.fixture(autouse=True)
+    def sandbox(self, tmp_path):
+        """Create an executor on a fresh database and dispose it afterwards."""
+        self.executor = make_executor(tmp_path / "sandbox.db")
+        yield
+        self.executor.close()
+
+    def test_batch_succeeds(self):
+        """Test that every statement gets its own successful result."""
+        results = self.executor.execute_many_ddl(["CREATE TABLE a (id INTEGER)", "CREATE TABLE b (id INTEGER)"])
+
+        assert [r["success"] for r in results] == [True, True]
+        assert all(r["error"] is None for r in results)
+        assert set(inspect(self.executor.engine).get_table_names()) == {"a", "b"}
+
+    def test_failure_falls_back_to_single_statements(self):
+        """Test that a failing statement rolls back the batch and only fails itself."""
+        single = []
+        self.executor.execute_ddl = lambda ddl: single.append(ddl) or PostgreSQLExecutor.execute_ddl(self.executor, ddl)
+
+        results = self.executor.execute_many_ddl([
+            "CREATE TABLE a (id INTEGER)",
+            "CREATE TABLE bad (id INTEGER",
+            "CREATE TABLE b (id INTEGER)",
+        ])
+
+        assert [r["success"] for r in results] == [True, False, True]
+        assert results[1]["error"]
+        assert len(single) == 3  # "a" only succeeds again because the batch was rolled back
+        assert set(inspect(self.executor.engine).get_table_names()) == {"a", "b"}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,274 @@
+"""
+Unit tests for the ProductionDeployAgent helpers.
+Tests statement splitting and per-category deployment against in-memory SQLite.
+"""
+
+import pytest
+from sqlalchemy import create_engine, event, exc, inspect, text
+
+from src.agents.production_deploy_agent import ProductionDeployAgent, _sqlstate
+from src.state import MigrationState, TransformedDDL
+
+
+def make_sqlite_engine():
+    """Create an in-memory SQLite engine with working SAVEPOINT support."""
+    engine = create_engine("sqlite://")
+
+    @event.listens_for(engine, "connect")
+    def disable_pysqlite_transactions(dbapi_conn, record):
+        dbapi_conn.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def emit_begin(conn):
+        conn.exec_driver_sql("BEGIN")
+
+    return engine
+
+
+class TestDeployCategory:
+    """Tests for deploying one category of statements."""
+
+    def setup_method(self):
+        """Create an agent deploying to in-memory SQLite."""
+        self.agent = ProductionDeployAgent.__new__(ProductionDeployAgent)
+        self.agent.name = "Production Deploy Agent"
+        self.agent._target_engine = make_sqlite_engine()
+        self.result = {"objects_deployed": 0, "errors": []}
+
+    def teardown_method(self):
+        """Dispose the engine."""
+        self.agent._target_engine.dispose()
+
+    def test_failures_roll_back_only_their_statement(self):
+        """Test that a failing statement doesn't abort the rest of the category."""
+        self.agent._deploy_category(self.result, [
+            ("table:a", "CREATE TABLE a (id INTEGER)"),
+            ("table:a", "CREATE TABLE a (id INTEGER)"),  # Already exists: skipped silently
+            ("table:bad", "CREATE TABLE bad (id INTEGER"),
+            ("table:b", "CREATE TABLE b (id INTEGER)"),
+        ])
+
+        assert self.result["objects_deployed"] == 2
+        assert len(self.result["errors"]) == 1
+        assert self.result["errors"][0].startswith("table:bad: ")
+        assert set(inspect(self.agent._target_engine).get_table_names()) == {"a", "b"}
+
+    def test_percent_signs_reach_the_driver_unformatted(self):
+        """Test that % in a statement body isn't taken for a parameter placeholder."""
+        @event.listens_for(self.agent._target_engine, "do_execute")
+        def interpolate_like_psycopg2(cursor, statement, parameters, context):
+            """Format parameters into the SQL whenever any are passed, as psycopg2 does."""
+            cursor.execute(statement % parameters)
+            return True
+
+        self.agent._deploy_category(self.result, [
+            ("view:v", "CREATE VIEW v AS SELECT 'a%b' LIKE '%b' AS m, printf('%d%%', 5) AS pct"),
+        ])
+
+        assert self.result == {"objects_deployed": 1, "errors": []}
+
+    def test_stages_split_tables_from_dependents(self):
+        """Test that only tables deploy before the data load and indexes after it."""
+        self.agent.max_workers = 1
+        self.agent._reset_target = lambda: {}
+        state = MigrationState(transformed_ddl=[
+            TransformedDDL(object_name="a", object_type="table", source_ddl="", target_ddl="CREATE TABLE a (id INTEGER)"),
+            TransformedDDL(object_name="idx", object_type="index", source_ddl="",
+                           target_ddl='-- Indexes\nCREATE INDEX "i1" ON "a" ("id");'),
+        ])
+        engine = self.agent._target_engine
+
+        tables = self.agent._deploy_schema(state, stage="tables")
+        assert tables["success"] and tables["objects_deployed"] == 1
+        assert inspect(engine).get_indexes("a") == []
+
+        dependents = self.agent._deploy_schema(state, stage="dependents")
+        assert dependents["success"] and dependents["objects_deployed"] == 1
+        assert [i["name"] for i in inspect(engine).get_indexes("a")] == ["i1"]
+
+
+class TestSqlState:
+    """Tests for reading SQLSTATEs from wrapped driver errors."""
+
+    def test_psycopg2_pgcode(self):
+        """Test that psycopg2's pgcode is read through SQLAlchemy's wrapper."""
+        class DuplicateTable(Exception):
+            pgcode = "42P07"
+
+        error = exc.ProgrammingError("CREATE TABLE a ()", None, DuplicateTable('relation "a" already exists'))
+        assert _sqlstate(error) == "42P07"
+
+    def test_no_sqlstate(self):
+        """Test that errors without a driver SQLSTATE return None."""
+        assert _sqlstate(ValueError("boom")) is None
+        assert _sqlstate(exc.OperationalError("SELECT 1", None, Exception("x"))) is None
+
+
+class TestDeployParallel:
+    """Tests for fanning single-table statements out across workers."""
+
+    def setup_method(self):
+        """Create an agent that records which statements each worker deploys."""
+        self.agent = ProductionDeployAgent.__new__(ProductionDeployAgent)
+        self.agent.name = "Production Deploy Agent"
+        self.agent.max_workers = 2
+        self.shares = []
+        self.agent._deploy_category = self.record_share
+
+    def record_share(self, result, statements, gist_fallback=False):
+        """Pretend every statement deploys, and fail the ones labelled bad."""
+        self.shares.append(statements)
+        for label, _ in statements:
+            if label == "bad":
+                result["errors"].append("bad: error")
+            else:
+                result["objects_deployed"] += 1
+
+    def test_group_by_table(self):
+        """Test that statements group by their ON table, ignoring function bodies."""
+        trigger = (
+            "trigger:t", "CREATE FUNCTION f() RETURNS trigger AS $$ BEGIN INSERT INTO x SELECT 1 "
+            "ON CONFLICT DO NOTHING; END $$ LANGUAGE plpgsql; CREATE TRIGGER t BEFORE INSERT ON \"Film\" "
+            "FOR EACH ROW EXECUTE FUNCTION f()",
+        )
+        statements = [
+            ("index", 'CREATE INDEX "a" ON "film" ("title")'),
+            ("index", 'CREATE INDEX "b" ON actor ("name")'),
+            trigger,
+        ]
+
+        groups = ProductionDeployAgent._group_by_table(statements)
+
+        assert groups == [[statements[0], trigger], [statements[1]]]
+
+    def test_tables_stay_on_one_worker_and_results_merge(self):
+        """Test that each table's statements go to one worker and counts are summed."""
+        statements = [
+            ("index", 'CREATE INDEX "a1" ON "a" ("x")'),
+            ("index", 'CREATE INDEX "b1" ON "b" ("x")'),
+            ("bad", 'CREATE INDEX "a2" ON "a" ("y")'),
+            ("index", 'CREATE INDEX "c1" ON "c" ("x")'),
+        ]
+        result = {"objects_deployed": 0, "errors": []}
+
+        self.agent._deploy_parallel(result, statements)
+
+        assert len(self.shares) == 2
+        assert [statements[0], statements[2]] in self.shares
+        assert result == {"objects_deployed": 3, "errors": ["bad: error"]}
+
+
+class TestPrewarmPool:
+    """Tests for filling the target connection pool."""
+
+    def test_fills_pool(self, tmp_path):
+        """Test that every pooled connection is opened and returned to the pool."""
+        agent = ProductionDeployAgent.__new__(ProductionDeployAgent)
+        agent.name = "Production Deploy Agent"
+        agent.max_workers = 3
+        agent._target_engine = create_engine(f"sqlite:///{tmp_path / 'target.db'}", pool_size=3, max_overflow=0)
+
+        agent._prewarm_pool()
+
+        assert agent._target_engine.pool.checkedin() == 3
+        agent._target_engine.dispose()
+
+
+class TestValidateDeployment:
+    """Tests for comparing source and target row counts."""
+
+    def setup_method(self):
+        """Create an agent with in-memory SQLite source and target databases."""
+        self.agent = ProductionDeployAgent.__new__(ProductionDeployAgent)
+        self.agent._source_engine = create_engine("sqlite://")
+        self.agent._target_engine = create_engine("sqlite://")
+        self.fill(self.agent._source_engine, {"film": 3, "order": 2, "actor": 1})
+
+    def teardown_method(self):
+        """Dispose the engines."""
+        self.agent._close_connections()
+
+    @staticmethod
+    def fill(engine, row_counts):
+        """Create each table with the given number of rows."""
+        with engine.begin() as conn:
+            for table, rows in row_counts.items():
+                conn.execute(text(f'CREATE TABLE "{table}" (id INTEGER)'))
+                for i in range(rows):
+                    conn.execute(text(f'INSERT INTO "{table}" VALUES ({i})'))
+
+    def test_counts_all_tables(self):
+        """Test that counts are matched per table, including reserved-word names."""
+        self.fill(self.agent._target_engine, {"film": 3, "order": 1, "actor": 1})
+        state = MigrationState(tables_migrated=["film", "order", "actor"])
+
+        results = self.agent._validate_deployment(state)
+
+        assert results == [
+            {"table": "film", "source_count": 3, "target_count": 3, "match": True},
+            {"table": "order", "source_count": 2, "target_count": 1, "match": False},
+            {"table": "actor", "source_count": 1, "target_count": 1, "match": True},
+        ]
+
+    def test_missing_table_only_fails_itself(self):
+        """Test that a table missing on the target doesn't hide the other counts."""
+        self.fill(self.agent._target_engine, {"film": 3})
+        state = MigrationState(tables_migrated=["film", "actor"])
+
+        film, actor = self.agent._validate_deployment(state)
+
+        assert film == {"table": "film", "source_count": 3, "target_count": 3, "match": True}
+        assert actor["match"] is False
+        assert "actor" in actor["error"]
+
+
+class TestAddFkNotValid:
+    """Tests for deferring FK validation."""
+
+    def test_rewrites_foreign_keys(self):
+        """Test that FKs are added NOT VALID with a matching VALIDATE statement."""
+        stmt = 'ALTER TABLE "film" ADD CONSTRAINT "fk_film_language" FOREIGN KEY ("language_id") ' \
+               'REFERENCES "language" ("language_id") ON DELETE RESTRICT'
+
+        added, validate = ProductionDeployAgent._add_fk_not_valid(stmt)
+
+        assert added == f"{stmt} NOT VALID"
+        assert validate == 'ALTER TABLE "film" VALIDATE CONSTRAINT "fk_film_language"'
+        assert ProductionDeployAgent._group_by_table([("a", validate), ("b", 'CREATE INDEX "i" ON "film" ("x")')]) \
+            == [[("a", validate), ("b", 'CREATE INDEX "i" ON "film" ("x")')]]
+
+    def test_leaves_other_statements(self):
+        """Test that non-FK and already NOT VALID statements are unchanged."""
+        for stmt in (
+            'ALTER TABLE "film" ADD CONSTRAINT "chk" CHECK (rating > 0)',
+            'ALTER TABLE film ADD CONSTRAINT fk FOREIGN KEY (a) REFERENCES b (a) NOT VALID',
+        ):
+            assert ProductionDeployAgent._add_fk_not_valid(stmt) == (stmt, None)
+
+
+class TestSplitStatements:
+    """Tests for splitting concatenated DDL."""
+
+    def test_strips_comments_and_blank_statements(self):
+        """Test that comments are removed and empty fragments dropped."""
+        sql = '-- Index for t;\nCREATE INDEX "i1" ON "t" ("a");\n/* ; */;\nCREATE INDEX "i2" ON "t" ("b");\n'
+
+        assert ProductionDeployAgent._split_statements(sql) == [
+            'CREATE INDEX "i1" ON "t" ("a")',
+            'CREATE INDEX "i2" ON "t" ("b")',
+        ]
+
+    def test_semicolons_inside_quotes_and_bodies(self):
+        """Test that strings, identifiers and dollar-quoted bodies aren't split."""
+        function = "CREATE FUNCTION f() RETURNS trigger AS $fn$\nBEGIN\n  RAISE NOTICE 'a;b';\n  RETURN NEW;\nEND;\n$fn$ LANGUAGE plpgsql"
+        sql = f"""{function};\nCOMMENT ON TABLE "x;y" IS 'it''s; fine';DO $$ BEGIN NULL; END $$"""
+
+        assert ProductionDeployAgent._split_statements(sql) == [
+            function,
+            """COMMENT ON TABLE "x;y" IS 'it''s; fine'""",
+            "DO $$ BEGIN NULL; END $$",
+        ]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
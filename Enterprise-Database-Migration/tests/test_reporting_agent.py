@@ -6,6 +6,8 @@ Uses existing artifacts to generate a report.
 import sys
 from pathlib import Path
 
+import pytest
+
 # Fix encoding for Windows console
 if sys.platform == 'win32':
     sys.stdout.reconfigure(encoding='utf-8')
@@ -161,6 +163,60 @@ def test_reporting_agent():
         return False
 
 
+class TestRun:
+    """Tests for ReportingAgent.run without touching artifact files."""
+
+    @pytest.fixture(autouse=True)
+    def setup(self, make_agent):
+        """Create an agent whose loaders count how often they are called."""
+        from src.agents.reporting_agent import ReportingAgent
+
+        self.agent = make_agent(ReportingAgent)
+        self.loads = []
+        self.agent._load_data_migration_results = lambda: self.record_load("data", {"total_rows": 1234})
+        self.agent._load_token_usage = lambda: self.record_load("tokens", {"total_tokens": 99})
+
+    def record_load(self, name, value):
+        self.loads.append(name)
+        return value
+
+    def test_artifacts_loaded_once(self):
+        """Test that the report and summary share a single load of each artifact."""
+        from src.state import MigrationState
+
+        state = self.agent.run(MigrationState())
+
+        assert sorted(self.loads) == ["data", "tokens"]
+        saved = self.agent.artifact_manager.saved
+        assert saved["final_report.json"]["data_rows_migrated"] == 1234
+        assert "**Total Tokens Used:** 99" in saved["migration_report.md"]
+        assert state.artifact_paths["migration_report"] == str(self.agent.artifact_manager.artifacts_dir / "migration_report.md")
+
+
+class TestLoadArtifacts:
+    """Tests for reading optional JSON artifacts."""
+
+    @pytest.fixture(autouse=True)
+    def in_tmp_dir(self, tmp_path, monkeypatch, make_agent):
+        """Run each test from an empty directory with an artifacts folder."""
+        from src.agents.reporting_agent import ReportingAgent
+
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "artifacts").mkdir()
+        self.agent = make_agent(ReportingAgent)
+
+    def test_reads_json(self):
+        """Test that existing artifacts are parsed."""
+        Path("artifacts/data_migration_results.json").write_text('{"total_rows": 5, "note": "café"}', encoding="utf-8")
+        assert self.agent._load_data_migration_results() == {"total_rows": 5, "note": "café"}
+
+    def test_missing_or_invalid(self):
+        """Test that missing and malformed artifacts load as empty."""
+        assert self.agent._load_data_migration_results() == {}
+        Path("artifacts/token_usage.json").write_text("{not json", encoding="utf-8")
+        assert self.agent._load_token_usage() == {}
+
+
 if __name__ == "__main__":
     success = test_reporting_agent()
     print("\n" + "=" * 60)
@@ -0,0 +1,201 @@
+"""
+Unit tests for the SandboxAgent helpers.
+Tests DDL fixes and table ordering without a sandbox database.
+"""
+
+import pytest
+
+from src.agents.sandbox_agent import SandboxAgent
+from src.state import MigrationState, MigrationStatus, SchemaMetadata, TableMetadata, TransformedDDL
+
+
+def make_table(name):
+    """Create a transformed table DDL with a trivial body."""
+    return TransformedDDL(object_name=name, object_type="table", source_ddl="",
+                          target_ddl=f'CREATE TABLE "{name}" (id INTEGER)')
+
+
+def make_state(references):
+    """Create a state whose schema has the given {table: [referenced tables]} FKs."""
+    return MigrationState(schema_metadata=SchemaMetadata(
+        database_name="sakila",
+        database_type="mysql",
+        tables=[
+            TableMetadata(name=name, foreign_keys=[{"referred_table": ref} for ref in refs])
+            for name, refs in references.items()
+        ],
+    ))
+
+
+class FakeExecutor:
+    """Sandbox executor that fails DDL containing 'bad' and records every call."""
+
+    def __init__(self):
+        self.calls = []
+        self.batches = []
+
+    def execute_ddl(self, ddl):
+        self.calls.append(ddl)
+        failed = "bad" in ddl
+        return {
+            "success": not failed,
+            "message": "",
+            "execution_time_ms": 1.0,
+            "error": f"syntax error in {ddl}" if failed else None,
+        }
+
+    def execute_many_ddl(self, statements):
+        self.batches.append(statements)
+        return [self.execute_ddl(ddl) for ddl in statements]
+
+
+class TestAttemptFix:
+    """Tests for rewriting DDL after a failed sandbox execution."""
+
+    def setup_method(self):
+        """Create an agent instance without connecting to the sandbox."""
+        self.agent = SandboxAgent.__new__(SandboxAgent)
+        self.agent.name = "Sandbox Testing Agent"
+
+    @pytest.mark.parametrize("ddl, error, expected", [
+        ("CREATE TABLE `t` (id INT UNSIGNED, x int unsigned) ENGINE=InnoDB", "syntax error",
+         'CREATE TABLE "t" (id INT, x int)'),
+        ("CREATE VIEW v AS SELECT * FROM sakila.film JOIN sakila.actor", "relation does not exist",
+         "CREATE VIEW v AS SELECT * FROM film JOIN actor"),
+        ("CREATE TABLE t (a int) engine = MyISAM", 'syntax error at "engine"', "CREATE TABLE t (a int)"),
+        ("SELECT notsakila.a, sakila.b", "error", "SELECT notsakila.a, b"),
+    ])
+    def test_fixes(self, ddl, error, expected):
+        """Test that MySQL leftovers are removed from the DDL."""
+        assert self.agent._attempt_fix(ddl, error) == expected
+
+    def test_unfixable_ddl_is_unchanged(self):
+        """Test that DDL without known problems is returned as-is."""
+        ddl = 'CREATE TABLE "t" (a int)'
+        assert self.agent._attempt_fix(ddl, "permission denied") == ddl
+
+    def test_engine_fix_needs_engine_error(self):
+        """Test that lowercase engine comparisons survive unrelated errors."""
+        ddl = "CREATE TABLE `t` (engine text CHECK (engine = diesel))"
+        assert self.agent._attempt_fix(ddl, "syntax error") == 'CREATE TABLE "t" (engine text CHECK (engine = diesel))'
+
+    def test_fix_view_schema_references(self):
+        """Test that sakila. prefixes are stripped from view definitions."""
+        ddl = "CREATE VIEW v AS SELECT f.title FROM sakila.film f"
+        assert self.agent._fix_view_schema_references(ddl) == "CREATE VIEW v AS SELECT f.title FROM film f"
+
+
+class TestSortByDependency:
+    """Tests for ordering tables before execution."""
+
+    def setup_method(self):
+        """Create an agent instance without connecting to the sandbox."""
+        self.agent = SandboxAgent.__new__(SandboxAgent)
+
+    @staticmethod
+    def names(tables):
+        return [t.object_name for t in tables]
+
+    def test_simple_sort_uses_sakila_priority(self):
+        """Test that the fallback puts known Sakila tables in FK order and unknown ones last."""
+        tables = [make_table(n) for n in ("payment", "custom", "film", "actor", "rental")]
+
+        ordered = self.agent._sort_by_dependency(tables, [])
+
+        assert self.names(ordered) == ["actor", "film", "rental", "payment", "custom"]
+
+    def test_follows_dependency_order(self):
+        """Test that graph order wins, duplicates are ignored and unlisted tables keep input order."""
+        tables = [make_table(n) for n in ("rental", "extra_b", "film", "extra_a", "actor")]
+        dependency_order = ["table:actor", "view:film", "table:film", "table:actor", "table:missing", "bogus", "table:rental"]
+
+        ordered = self.agent._sort_by_dependency(tables, dependency_order)
+
+        assert self.names(ordered) == ["actor", "film", "rental", "extra_b", "extra_a"]
+
+
+class TestGroupIntoLevels:
+    """Tests for grouping tables that can be created concurrently."""
+
+    def setup_method(self):
+        """Create an agent instance without connecting to the sandbox."""
+        self.agent = SandboxAgent.__new__(SandboxAgent)
+
+    @staticmethod
+    def names(levels):
+        return [[t.object_name for t in level] for level in levels]
+
+    def test_levels_follow_foreign_keys(self):
+        """Test that each table lands one level after the deepest table it references."""
+        state = make_state({
+            "actor": [], "country": [], "city": ["country"], "address": ["city"],
+            "language": [], "film": ["language", "language"], "film_actor": ["film", "actor"], "node": ["node"],
+        })
+        tables = [make_table(n) for n in ("actor", "country", "language", "city", "film", "address", "film_actor", "node")]
+
+        levels = self.agent._group_into_levels(tables, state)
+
+        assert self.names(levels) == [["actor", "country", "language", "node"], ["city", "film"], ["address", "film_actor"]]
+
+    def test_later_references_and_unknown_tables(self):
+        """Test that deferred circular FKs don't constrain and unknown tables wait for all earlier ones."""
+        state = make_state({"address": [], "store": ["staff", "address"], "staff": ["store", "address"]})
+        tables = [make_table(n) for n in ("address", "store", "staff", "mystery", "other")]
+
+        levels = self.agent._group_into_levels(tables, state)
+
+        assert self.names(levels) == [["address"], ["store"], ["staff"], ["mystery"], ["other"]]
+
+    def test_no_schema_runs_serially(self):
+        """Test that without FK metadata every table gets its own level."""
+        tables = [make_table(n) for n in ("a", "b")]
+        assert self.names(self.agent._group_into_levels(tables, MigrationState())) == [["a"], ["b"]]
+
+
+class TestExecuteLevel:
+    """Tests for executing a dependency level concurrently."""
+
+    def setup_method(self):
+        """Create an agent with a fake sandbox executor."""
+        self.agent = SandboxAgent.__new__(SandboxAgent)
+        self.agent.name = "Sandbox Testing Agent"
+        self.agent.executor = FakeExecutor()
+        self.agent.max_workers = 2
+
+    def test_results_recorded_in_level_order(self):
+        """Test that tables run one statement each, keep the level's order and failures are retried serially."""
+        level = [make_table(n) for n in ("a", "b", "bad", "c")]
+        sandbox_results = []
+
+        self.agent._execute_level(level, MigrationState(), sandbox_results)
+
+        assert [r.object_name for r in sandbox_results] == ["a", "b", "bad", "c"]
+        assert [r.executed for r in sandbox_results] == [True, True, False, True]
+        assert sandbox_results[2].errors == ['syntax error in CREATE TABLE "bad" (id INTEGER)']
+        assert [ddl.status for ddl in level] == [
+            MigrationStatus.SUCCESS, MigrationStatus.SUCCESS, MigrationStatus.FAILED, MigrationStatus.SUCCESS,
+        ]
+        assert self.agent.executor.batches == []
+        assert len(self.agent.executor.calls) == 5
+        assert self.agent.executor.calls[-1] == 'CREATE TABLE "bad" (id INTEGER)'
+
+    def test_batched_failures_are_not_rerun(self):
+        """Test that each worker gets one batch and failed statements keep the batch fallback's result."""
+        level = [
+            TransformedDDL(object_name=n, object_type="index", source_ddl="", target_ddl=f"CREATE INDEX {n} ON t (x)")
+            for n in ("a", "b", "bad", "c")
+        ]
+        sandbox_results = []
+
+        self.agent._execute_level(level, MigrationState(), sandbox_results, batched=True)
+
+        assert [r.executed for r in sandbox_results] == [True, True, False, True]
+        assert sandbox_results[2].errors == ["syntax error in CREATE INDEX bad ON t (x)"]
+        assert sorted(self.agent.executor.batches) == [
+            ["CREATE INDEX a ON t (x)", "CREATE INDEX b ON t (x)"],
+            ["CREATE INDEX bad ON t (x)", "CREATE INDEX c ON t (x)"],
+        ]
+        assert len(self.agent.executor.calls) == 4
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
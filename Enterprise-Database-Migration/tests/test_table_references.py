@@ -0,0 +1,53 @@
+"""
+Unit tests for the whole-word table reference finder.
+Tests matching with and without the optional Aho-Corasick automaton.
+"""
+
+import pytest
+
+from src.tools import table_references
+from src.tools.table_references import TableReferenceFinder
+
+USE_AUTOMATON = [
+    False,
+    pytest.param(True, marks=pytest.mark.skipif(
+        table_references.ahocorasick is None, reason="pyahocorasick not installed")),
+]
+
+
+class TestTableReferenceFinder:
+    """Tests for finding table names in SQL text."""
+
+    def _find(self, text, use_automaton):
+        """Find references with or without the Aho-Corasick automaton."""
+        return TableReferenceFinder(["film", "film_actor", "actor"], use_automaton).find(text)
+
+    @pytest.mark.parametrize("use_automaton", USE_AUTOMATON)
+    def test_whole_word_matches_only(self, use_automaton):
+        """Test that a table name inside a longer identifier is not a reference."""
+        definition = "SELECT * FROM `sakila`.`FILM_ACTOR` fa JOIN actor a ON a.actor_id = fa.actor_id"
+        assert set(self._find(definition, use_automaton)) == {"film_actor", "actor"}
+
+    @pytest.mark.parametrize("use_automaton", USE_AUTOMATON)
+    def test_repeated_references_reported_once(self, use_automaton):
+        """Test that each table appears once even when referenced many times."""
+        definition = "SELECT film_actor_x FROM film f1, film f2"
+        assert self._find(definition, use_automaton) == ["film"]
+
+    def test_non_ascii_text(self):
+        """Test that non-ASCII text uses the str search."""
+        assert self._find("SELECT 'café' AS name FROM actor", use_automaton=False) == ["actor"]
+
+    @pytest.mark.parametrize("use_automaton", USE_AUTOMATON)
+    def test_empty_text(self, use_automaton):
+        """Test that missing or empty text references nothing."""
+        assert self._find("", use_automaton) == []
+        assert self._find(None, use_automaton) == []
+
+    def test_no_tables(self):
+        """Test that a schema without tables finds nothing."""
+        assert TableReferenceFinder([]).find("SELECT * FROM film") == []
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])